@@ -4,7 +4,8 @@ Módulo para convertir unidades de medida (masa, volumen, etc.)
 Soporta kg, g, mg, L, mL, unidades, etc.
 """
 
-from decimal import Decimal, getcontext
+from decimal import Decimal, localcontext
+from itertools import repeat
 
 class UnitConverter:
     # Factores de conversión (base: gramos para masa, litros para volumen, metros para longitud, etc.)
@@ -84,9 +85,19 @@ class UnitConverter:
         'unidad': 'conteo', 'docena': 'conteo', 'caja': 'conteo', 'paquete': 'conteo', 'rollo': 'conteo', 'resma': 'conteo',
     }
 
-    def __init__(self):
-        # Aumentar la precisión para cálculos financieros y científicos
-        getcontext().prec = 10 # Precisión decimal para cálculos (ej. 10 dígitos significativos)
+    # Matriz (unidad_origen, unidad_destino) -> factor; se rellena al final del módulo
+    FACTORES = {}
+
+    def factor(self, unidad_origen, unidad_destino) -> Decimal:
+        """
+        Devuelve el factor precalculado para convertir de unidad_origen a unidad_destino
+        (ej: factor('kg', 'g') -> 1000). Solo valida en detalle cuando el par no existe.
+        """
+        try:
+            return self.FACTORES[(unidad_origen, unidad_destino)]
+        except KeyError:
+            self._validar_par(unidad_origen, unidad_destino)
+            raise
 
     def convert(self, valor, unidad_origen, unidad_destino):
         """
@@ -100,8 +111,42 @@ class UnitConverter:
         Returns:
             Decimal: Valor convertido con precisión alta.
         """
-        valor = Decimal(str(valor))  # Asegurar que sea Decimal
-        
+        if not isinstance(valor, Decimal):
+            valor = Decimal(str(valor))  # Asegurar que sea Decimal
+        return valor * self.factor(unidad_origen, unidad_destino)
+
+    def convert_many(self, valores, unidades_origen, unidades_destino) -> list:
+        """
+        Convierte una secuencia de valores en una sola pasada.
+
+        Args:
+            valores: Secuencia de valores (Decimal/float/int).
+            unidades_origen: Una unidad (str) para todos los valores o una secuencia paralela a `valores`.
+            unidades_destino: Una unidad (str) para todos los valores o una secuencia paralela a `valores`.
+
+        Returns:
+            list[Decimal]: Valores convertidos, en el mismo orden.
+        """
+        valores = list(valores)
+        for unidades in (unidades_origen, unidades_destino):
+            if not isinstance(unidades, str) and len(unidades) != len(valores):
+                raise ValueError("Las listas de unidades deben tener la misma longitud que la lista de valores.")
+        origenes = repeat(unidades_origen) if isinstance(unidades_origen, str) else unidades_origen
+        destinos = repeat(unidades_destino) if isinstance(unidades_destino, str) else unidades_destino
+
+        factores = self.FACTORES
+        convertidos = []
+        for valor, origen, destino in zip(valores, origenes, destinos):
+            factor = factores.get((origen, destino))
+            if factor is None:
+                factor = self.factor(origen, destino)
+            if not isinstance(valor, Decimal):
+                valor = Decimal(str(valor))
+            convertidos.append(valor * factor)
+        return convertidos
+
+    def _validar_par(self, unidad_origen, unidad_destino):
+        """Lanza ValueError explicando por qué no existe conversión entre dos unidades."""
         # Validar que las unidades existan
         if unidad_origen not in self.CONVERSION_FACTORS:
             raise ValueError(f"Unidad de origen '{unidad_origen}' no soportada. Disponibles: {list(self.CONVERSION_FACTORS.keys())}")
@@ -120,16 +165,8 @@ class UnitConverter:
         if tipo_origen != tipo_destino:
             raise ValueError(f"No se puede convertir de '{unidad_origen}' ({tipo_origen}) a '{unidad_destino}' ({tipo_destino}). Las unidades deben ser del mismo tipo de magnitud.")
         
-        # Convertir a la unidad base del tipo de magnitud
-        valor_en_base = valor * self.CONVERSION_FACTORS[unidad_origen]
-        
-        # Convertir de la unidad base a la unidad de destino
         if self.CONVERSION_FACTORS[unidad_destino] == Decimal('0'):
             raise ValueError(f"Factor de conversión a cero para la unidad de destino '{unidad_destino}'.")
-            
-        valor_convertido = valor_en_base / self.CONVERSION_FACTORS[unidad_destino]
-        
-        return valor_convertido
 
     def get_valid_units(self):
         """Lista de unidades soportadas (para Combobox, por ejemplo)."""
@@ -142,3 +179,22 @@ class UnitConverter:
         """
         return [unit for unit, u_type in self.UNIT_TYPES.items() if u_type == unit_type]
 
+
+def _construir_matriz_factores(factores: dict, tipos: dict) -> dict:
+    """
+    Precalcula el factor (origen, destino) para todos los pares de unidades del mismo
+    tipo de magnitud, de modo que cada conversión sea una sola búsqueda y multiplicación.
+    """
+    matriz = {}
+    with localcontext() as ctx:
+        ctx.prec = 28 # Precisión fija, independiente del contexto global al importar
+        for origen, f_origen in factores.items():
+            for destino, f_destino in factores.items():
+                if tipos.get(origen) is None or tipos.get(origen) != tipos.get(destino) or f_destino == 0:
+                    continue
+                matriz[(origen, destino)] = Decimal('1') if origen == destino else f_origen / f_destino
+    return matriz
+
+
+# Matriz (unidad_origen, unidad_destino) -> factor, calculada una sola vez al cargar el módulo
+UnitConverter.FACTORES = _construir_matriz_factores(UnitConverter.CONVERSION_FACTORS, UnitConverter.UNIT_TYPES)
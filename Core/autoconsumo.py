@@ -1,14 +1,23 @@
 import mysql.connector
 from mysql.connector import Error
 from decimal import Decimal
+from Core.database import reintentar_transaccion
+from Core.decimal_utils import a_decimal, redondear_cantidad
+from Core.productos import Productos
 
 class Autoconsumo:
-    def __init__(self, db_connection):
+    def __init__(self, db_connection, productos_manager=None):
         self.db_connection = db_connection
+        self.productos_manager = productos_manager or Productos(db_connection)
 
+    @reintentar_transaccion()
     def registrar_autoconsumo(self, producto_id: int, cantidad: Decimal, unidad: str, motivo: str = None) -> bool:
         """
         Registra un autoconsumo de un producto.
+        El stock y el total invertido se descuentan con Productos.decrementar_stock (que anota la
+        salida en el libro de inventario) y el costo registrado es el valor que salió del inventario.
+        Todo ocurre en una sola transacción, que se reintenta completa ante deadlocks
+        o esperas de bloqueo agotadas.
         """
         if not isinstance(producto_id, int) or producto_id <= 0:
             raise ValueError("El ID del producto debe ser un entero positivo.")
@@ -17,59 +26,24 @@ class Autoconsumo:
         if not unidad or not isinstance(unidad, str):
             raise ValueError("La unidad no puede estar vacía y debe ser una cadena de texto.")
 
-        conn = self.db_connection.get_connection()
-        cursor = None
         try:
-            # Iniciar transacción
-            conn.start_transaction()
-            
-            cursor = conn.cursor()
-            
-            # Obtener el costo promedio del producto
-            cursor.execute("SELECT total_invertido, cantidad FROM productos WHERE id = %s", (producto_id,))
-            result = cursor.fetchone()
-            
-            if not result:
-                raise ValueError("Producto no encontrado.")
-                
-            total_invertido, cantidad_actual = result
-            
-            # Calcular costo promedio
-            if cantidad_actual > Decimal('0'):
-                costo_promedio = total_invertido / cantidad_actual
-            else:
-                costo_promedio = Decimal('0')
-                
-            costo_total = cantidad * costo_promedio
-            
-            # Insertar registro de autoconsumo
-            query = """
-                INSERT INTO autoconsumo (producto_id, cantidad, unidad, motivo, costo)
-                VALUES (%s, %s, %s, %s, %s)
-            """
-            cursor.execute(query, (producto_id, cantidad, unidad, motivo, costo_total))
-            
-            # Reducir la cantidad en el inventario
-            cursor.execute(
-                "UPDATE productos SET cantidad = cantidad - %s WHERE id = %s",
-                (cantidad, producto_id)
-            )
-            
-            # Confirmar transacción
-            conn.commit()
+            with self.db_connection.transaction() as conn:
+                # Descontar stock y total invertido; devuelve el valor que salió del inventario
+                costo = self.productos_manager.decrementar_stock(producto_id, cantidad, tipo_movimiento='autoconsumo')
+
+                cursor = conn.cursor()
+                try:
+                    query = """
+                        INSERT INTO autoconsumo (producto_id, cantidad, unidad, motivo, costo)
+                        VALUES (%s, %s, %s, %s, %s)
+                    """
+                    cursor.execute(query, (producto_id, redondear_cantidad(cantidad), unidad, motivo, costo))
+                finally:
+                    cursor.close()
             return True
-            
+
         except Error as e:
-            if conn:
-                conn.rollback()
-            raise e
-        except Exception as e:
-            if conn:
-                conn.rollback()
             raise e
-        finally:
-            if cursor:
-                cursor.close()
 
     def obtener_historial_autoconsumo(self, dias: int = 30) -> list:
         """
@@ -90,8 +64,8 @@ class Autoconsumo:
             
             for row in results:
                 entry_dict = dict(zip(column_names, row))
-                entry_dict['cantidad'] = Decimal(str(entry_dict['cantidad']))
-                entry_dict['costo'] = Decimal(str(entry_dict['costo']))
+                entry_dict['cantidad'] = a_decimal(entry_dict['cantidad'])
+                entry_dict['costo'] = a_decimal(entry_dict['costo'])
                 historial.append(entry_dict)
                 
             return historial
@@ -112,7 +86,7 @@ class Autoconsumo:
             result = self.db_connection.fetch_one(query, (dias,))
             
             if result and result[0] is not None:
-                return Decimal(str(result[0]))
+                return a_decimal(result[0])
             return Decimal('0.00')
             
         except Exception as e:
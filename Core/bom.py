@@ -0,0 +1,156 @@
+"""
+Matriz de explosión de materiales (BOM): recetas × ingredientes.
+
+Cada fila es una receta y cada columna una materia prima; el valor es la cantidad
+del ingrediente, ya convertida a la unidad base del producto, que consume UNA unidad
+de la receta. La matriz es dispersa (cada receta usa pocos ingredientes) y se guarda
+en formato CSR puro en Python:
+
+    indptr[i] .. indptr[i + 1]   -> rango de la fila i en `columnas` / `valores`
+    columnas[k]                  -> índice de columna (ingrediente)
+    valores[k]                   -> cantidad en micro-unidades (Cantidad, entero)
+
+Los requerimientos de materias primas para un pedido o plan de ventas
+({receta_id: unidades}) son un único producto vector × matriz con aritmética entera.
+"""
+
+from Core.decimal_utils import a_decimal
+from Core.fixed_point import Cantidad
+
+
+class MatrizBOM:
+    """Matriz dispersa (CSR) receta × ingrediente en unidades base, inmutable una vez construida."""
+
+    __slots__ = ('receta_ids', 'ingrediente_ids', '_fila_de', '_columna_de',
+                 'indptr', 'columnas', 'valores')
+
+    def __init__(self, receta_ids, ingrediente_ids, indptr, columnas, valores):
+        self.receta_ids = tuple(receta_ids)
+        self.ingrediente_ids = tuple(ingrediente_ids)
+        self._fila_de = {receta_id: i for i, receta_id in enumerate(self.receta_ids)}
+        self._columna_de = {ingrediente_id: j for j, ingrediente_id in enumerate(self.ingrediente_ids)}
+        self.indptr = tuple(indptr)
+        self.columnas = tuple(columnas)
+        self.valores = tuple(valores)
+
+    @classmethod
+    def desde_filas(cls, filas, unit_converter, invalidas: dict = None):
+        """
+        Construye la matriz desde filas (receta_id, ingrediente_id, cantidad, unidad, unidad_base)
+        ordenadas por receta_id. Todas las conversiones de unidad se hacen en una sola pasada.
+
+        Si se indica `invalidas`, las filas cuya unidad no se puede convertir a la del producto se
+        omiten y se anotan en {receta_id: [motivo, ...]}, para que una receta mal cargada no impida
+        construir la matriz de las demás; si no, se lanza ValueError.
+        """
+        receta_ids, indptr, columnas, valores = [], [0], [], []
+        ingrediente_ids, columna_de = [], {}
+        factores = unit_converter.FACTORES
+        for receta_id, ingrediente_id, cantidad, unidad, unidad_base in filas:
+            factor = factores.get((unidad, unidad_base))
+            if factor is None:
+                try:
+                    factor = unit_converter.factor(unidad, unidad_base)
+                except (ValueError, KeyError) as e:
+                    if invalidas is None:
+                        raise ValueError(f"Receta ID {receta_id}, ingrediente ID {ingrediente_id}: {e}") from e
+                    invalidas.setdefault(receta_id, []).append(
+                        f"ingrediente ID {ingrediente_id} en '{unidad}' no se puede convertir a '{unidad_base}'"
+                    )
+                    continue
+            if not receta_ids or receta_ids[-1] != receta_id:
+                if receta_ids:
+                    indptr.append(len(columnas))
+                receta_ids.append(receta_id)
+            columna = columna_de.get(ingrediente_id)
+            if columna is None:
+                columna = columna_de[ingrediente_id] = len(ingrediente_ids)
+                ingrediente_ids.append(ingrediente_id)
+            columnas.append(columna)
+            valores.append(Cantidad.desde_decimal(a_decimal(cantidad) * factor))
+        if receta_ids:
+            indptr.append(len(columnas))
+        return cls(receta_ids, ingrediente_ids, indptr, columnas, valores)
+
+    @classmethod
+    def desde_dict(cls, filas: dict):
+        """Construye la matriz desde {receta_id: {ingrediente_id: micro-unidades (int)}}."""
+        receta_ids, indptr, columnas, valores = [], [0], [], []
+        ingrediente_ids, columna_de = [], {}
+        for receta_id in sorted(filas):
+            receta_ids.append(receta_id)
+            for ingrediente_id in sorted(filas[receta_id]):
+                columna = columna_de.get(ingrediente_id)
+                if columna is None:
+                    columna = columna_de[ingrediente_id] = len(ingrediente_ids)
+                    ingrediente_ids.append(ingrediente_id)
+                columnas.append(columna)
+                valores.append(Cantidad(filas[receta_id][ingrediente_id]))
+            indptr.append(len(columnas))
+        return cls(receta_ids, ingrediente_ids, indptr, columnas, valores)
+
+    def __contains__(self, receta_id):
+        return receta_id in self._fila_de
+
+    def __len__(self):
+        return len(self.receta_ids)
+
+    def fila(self, receta_id) -> list:
+        """Ingredientes de una unidad de la receta: lista de (ingrediente_id, Cantidad). Vacía si no tiene."""
+        i = self._fila_de.get(receta_id)
+        if i is None:
+            return []
+        ids = self.ingrediente_ids
+        return [(ids[self.columnas[k]], self.valores[k]) for k in range(self.indptr[i], self.indptr[i + 1])]
+
+    def requerimientos(self, pedido: dict) -> dict:
+        """
+        Materias primas que consume un pedido o plan: vector de unidades por receta × matriz.
+
+        Args:
+            pedido: {receta_id: unidades (int)}.
+
+        Returns:
+            dict: {ingrediente_id: Cantidad} en unidades base, solo ingredientes con consumo.
+        """
+        acumulado = {}
+        columnas, valores, indptr = self.columnas, self.valores, self.indptr
+        for receta_id, unidades in pedido.items():
+            i = self._fila_de.get(receta_id)
+            if i is None or not unidades:
+                continue
+            for k in range(indptr[i], indptr[i + 1]):
+                columna = columnas[k]
+                acumulado[columna] = acumulado.get(columna, 0) + valores[k] * unidades
+        ids = self.ingrediente_ids
+        return {ids[columna]: Cantidad(total) for columna, total in acumulado.items()}
+
+    def unidades_producibles(self, stock: dict, receta_ids=None) -> dict:
+        """
+        Máximo de unidades de cada receta que cubre el stock dado, y el ingrediente que lo limita.
+
+        Args:
+            stock: {ingrediente_id: Cantidad} en unidades base (los ausentes cuentan como 0).
+            receta_ids: Recetas a evaluar (por defecto, todas las de la matriz).
+
+        Returns:
+            dict: {receta_id: (unidades: int, ingrediente_limitante_id)} solo para recetas con ingredientes.
+        """
+        resultado = {}
+        ids = self.ingrediente_ids
+        for receta_id in (self.receta_ids if receta_ids is None else receta_ids):
+            i = self._fila_de.get(receta_id)
+            if i is None:
+                continue
+            maximo, limitante = None, None
+            for k in range(self.indptr[i], self.indptr[i + 1]):
+                por_unidad = self.valores[k]
+                if por_unidad <= 0:
+                    continue
+                ingrediente_id = ids[self.columnas[k]]
+                unidades = max(0, stock.get(ingrediente_id, 0) // por_unidad)
+                if maximo is None or unidades < maximo:
+                    maximo, limitante = unidades, ingrediente_id
+            if maximo is not None:
+                resultado[receta_id] = (maximo, limitante)
+        return resultado
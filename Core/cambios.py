@@ -0,0 +1,112 @@
+"""
+Notificación de cambios entre terminales.
+
+Cada evento publicado con `publicar_al_confirmar` queda anotado en la tabla `cambios`
+en la misma transacción que el cambio (ver Core.eventos). `MonitorCambios` revisa esa
+tabla en un hilo de fondo y publica en el bus local los eventos de otras terminales,
+con lo que cachés, costeo y páginas abiertas se actualizan como ante un cambio local.
+
+La revisión es barata: `id > marca` sobre la clave primaria, sin leer tablas de datos.
+Como los id autoincrementales se asignan al insertar pero se vuelven visibles al hacer
+commit, una transacción lenta puede confirmar un id menor que otro ya visto; los id
+salteados se siguen buscando durante ESPERA_HUECOS segundos (las transacciones revertidas
+dejan huecos que nunca se llenan).
+"""
+
+import logging
+import threading
+import time
+from Core.eventos import bus_eventos, Evento, TERMINAL
+
+logger = logging.getLogger(__name__)
+
+
+class MonitorCambios:
+    INTERVALO_SEGUNDOS = 2.0
+    LOTE = 500                  # filas máximas por revisión
+    ESPERA_HUECOS = 60.0        # segundos que se espera a un id salteado
+    DIAS_RETENCION = 2          # antigüedad a partir de la cual se purga la tabla
+    PURGA_CADA_SEGUNDOS = 3600
+
+    def __init__(self, db_connection, bus=None):
+        self.db_connection = db_connection
+        self.bus = bus or bus_eventos
+        self.marca = None   # mayor id ya procesado
+        self._huecos = {}   # id salteado -> time.monotonic() en que se deja de esperar
+        self._ultima_purga = time.monotonic()
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def iniciar(self) -> None:
+        """Arranca el hilo de revisión. Solo se notifican los cambios posteriores al arranque."""
+        if self._hilo is not None:
+            return
+        if self.marca is None:
+            fila = self.db_connection.fetch_one("SELECT COALESCE(MAX(id), 0) FROM cambios")
+            self.marca = fila[0]
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._ejecutar, name="MonitorCambios", daemon=True)
+        self._hilo.start()
+        logger.info(f"Change monitor started for terminal {TERMINAL} at id {self.marca}")
+
+    def detener(self) -> None:
+        if self._hilo is None:
+            return
+        self._detener.set()
+        self._hilo.join(timeout=self.INTERVALO_SEGUNDOS * 2)
+        self._hilo = None
+
+    def _ejecutar(self):
+        while not self._detener.wait(self.INTERVALO_SEGUNDOS):
+            try:
+                self.revisar()
+                if time.monotonic() - self._ultima_purga >= self.PURGA_CADA_SEGUNDOS:
+                    self.purgar()
+            except Exception as e:
+                logger.error(f"Change monitor poll failed: {e}")
+
+    def revisar(self) -> int:
+        """
+        Publica los cambios de otras terminales confirmados desde la última revisión.
+
+        Returns:
+            int: Cantidad de eventos publicados.
+        """
+        ahora = time.monotonic()
+        self._huecos = {id_: limite for id_, limite in self._huecos.items() if limite > ahora}
+        query = "SELECT id, terminal, tipo_evento, datos FROM cambios WHERE id > %s"
+        params = [self.marca]
+        if self._huecos:
+            query += f" OR id IN ({', '.join(['%s'] * len(self._huecos))})"
+            params.extend(self._huecos)
+        query += " ORDER BY id LIMIT %s"
+        params.append(self.LOTE)
+        filas = self.db_connection.fetch_all(query, params)
+
+        publicados = 0
+        for id_, terminal, tipo_evento, datos in filas:
+            if id_ in self._huecos:
+                del self._huecos[id_]
+            elif id_ > self.marca:
+                if id_ - self.marca <= self.LOTE: # Un salto mayor no es una transacción en curso
+                    for salteado in range(self.marca + 1, id_):
+                        self._huecos[salteado] = ahora + self.ESPERA_HUECOS
+                self.marca = id_
+            if terminal == TERMINAL:
+                continue # Ya se publicó localmente al confirmar
+            try:
+                evento = Evento.desde_json(tipo_evento, datos)
+            except ValueError as e:
+                logger.warning(f"Ignoring change {id_}: {e}")
+                continue
+            self.bus.publicar(evento)
+            publicados += 1
+        return publicados
+
+    def purgar(self) -> None:
+        """Elimina los cambios con más de DIAS_RETENCION días."""
+        self._ultima_purga = time.monotonic()
+        self.db_connection.execute_update(
+            "DELETE FROM cambios WHERE fecha < NOW() - INTERVAL %s DAY",
+            (self.DIAS_RETENCION,)
+        )
@@ -0,0 +1,364 @@
+"""
+Recetas anidadas (subrecetas) y costeo incremental.
+
+Una receta puede usar otra receta como ingrediente (`receta_subrecetas`: masa -> pizza).
+Las relaciones forman un grafo dirigido acíclico; se ordena topológicamente (subrecetas
+antes que las recetas que las usan) y cada receta se costea una sola vez reutilizando
+el costo ya calculado de sus subrecetas, por lo que costear todo el menú es lineal en el
+tamaño del grafo.
+
+`CosteoRecetas` guarda esos costos y, cuando cambia el costo de alguna materia prima,
+recalcula solo las recetas que dependen de ella (directa o indirectamente). Los productos
+que cambiaron se conocen por los eventos StockCambiado/ProductoActualizado del bus
+(ver Core.eventos), así normalmente solo se releen esas filas.
+"""
+
+import threading
+import time
+from collections import deque
+from decimal import Decimal
+from Core.bom import MatrizBOM
+from Core.fixed_point import Cantidad, Dinero, MicroDinero, costo_proporcional_exacto, dividir_redondeando
+from Core.eventos import bus_eventos, StockCambiado, ProductoActualizado
+
+_ESCALA_CANTIDAD = 10 ** Cantidad.DECIMALES
+
+
+def orden_topologico(nodos, dependencias: dict) -> list:
+    """
+    Ordena las recetas de modo que cada una aparezca después de todas sus subrecetas.
+
+    Args:
+        nodos: IDs de todas las recetas.
+        dependencias: {receta_id: iterable de subreceta_id}.
+
+    Raises:
+        ValueError: Si las subrecetas forman un ciclo.
+    """
+    nodos = set(nodos)
+    for receta_id, subrecetas in dependencias.items():
+        nodos.add(receta_id)
+        nodos.update(subrecetas)
+
+    pendientes = {nodo: 0 for nodo in nodos}       # subrecetas aún sin ordenar
+    padres = {nodo: [] for nodo in nodos}          # subreceta -> recetas que la usan
+    for receta_id, subrecetas in dependencias.items():
+        for subreceta_id in subrecetas:
+            pendientes[receta_id] += 1
+            padres[subreceta_id].append(receta_id)
+
+    cola = deque(sorted(nodo for nodo, cantidad in pendientes.items() if cantidad == 0))
+    orden = []
+    while cola:
+        nodo = cola.popleft()
+        orden.append(nodo)
+        for padre in padres[nodo]:
+            pendientes[padre] -= 1
+            if pendientes[padre] == 0:
+                cola.append(padre)
+
+    if len(orden) != len(nodos):
+        en_ciclo = sorted(nodo for nodo, cantidad in pendientes.items() if cantidad > 0)
+        raise ValueError(f"Las subrecetas forman un ciclo entre las recetas: {', '.join(map(str, en_ciclo))}.")
+    return orden
+
+
+def crearia_ciclo(dependencias: dict, receta_id: int, subreceta_id: int) -> bool:
+    """Indica si usar `subreceta_id` dentro de `receta_id` cerraría un ciclo (incluida una receta en sí misma)."""
+    visitados = set()
+    pila = [subreceta_id]
+    while pila:
+        nodo = pila.pop()
+        if nodo == receta_id:
+            return True
+        if nodo in visitados:
+            continue
+        visitados.add(nodo)
+        pila.extend(dependencias.get(nodo, ()))
+    return False
+
+
+class EstructuraRecetas:
+    """
+    Foto inmutable de la composición de todas las recetas:
+
+    - `directa`: MatrizBOM con los ingredientes propios de cada receta (unidades base).
+    - `subrecetas`: {receta_id: ((subreceta_id, Cantidad), ...)} unidades de subreceta por unidad.
+    - `mano_obra`: {receta_id: centavos} costo de mano de obra por unidad.
+    - `orden`: recetas en orden topológico (subrecetas primero).
+    - `matriz`: MatrizBOM con las subrecetas ya expandidas a materias primas. No cuenta el stock de
+      los productos elaborados de las subrecetas; para descontarlo primero se usa `explotar`.
+    - `invalidas`: {receta_id: motivo} de las recetas con ingredientes cuya unidad no se puede
+      convertir a la del producto, y de las que las usan como subreceta. Sus filas incompletas no
+      se expanden en `matriz`; venderlas, costearlas o producirlas lanza ValueError (`verificar`),
+      pero el resto de las recetas se sigue usando.
+    """
+
+    __slots__ = ('directa', 'subrecetas', 'mano_obra', 'orden', 'matriz', 'invalidas',
+                 '_padres', '_recetas_de_producto')
+
+    def __init__(self, directa: MatrizBOM, subrecetas: dict, mano_obra: dict, invalidas: dict = None):
+        self.directa = directa
+        self.subrecetas = subrecetas
+        self.mano_obra = mano_obra
+        self.orden = tuple(orden_topologico(
+            set(directa.receta_ids) | set(mano_obra),
+            {receta_id: [sub for sub, _ in usos] for receta_id, usos in subrecetas.items()}
+        ))
+
+        self._padres = {}
+        for receta_id, usos in subrecetas.items():
+            for subreceta_id, _ in usos:
+                self._padres.setdefault(subreceta_id, []).append(receta_id)
+        self._recetas_de_producto = {}
+        for receta_id in directa.receta_ids:
+            for ingrediente_id, _ in directa.fila(receta_id):
+                self._recetas_de_producto.setdefault(ingrediente_id, []).append(receta_id)
+
+        # Una receta con filas inválidas invalida también a las que la usan (directa o indirectamente)
+        self.invalidas = {}
+        for receta_id in self.orden:
+            if invalidas and receta_id in invalidas:
+                self.invalidas[receta_id] = "; ".join(invalidas[receta_id])
+                continue
+            for subreceta_id, _ in subrecetas.get(receta_id, ()):
+                if subreceta_id in self.invalidas:
+                    self.invalidas[receta_id] = f"usa la subreceta ID {subreceta_id}, que no se puede usar"
+                    break
+
+        self.matriz = self._expandir() if subrecetas or self.invalidas else directa
+
+    @classmethod
+    def construir(cls, filas_ingredientes, filas_subrecetas, filas_mano_obra, unit_converter):
+        """
+        Args:
+            filas_ingredientes: (receta_id, ingrediente_id, cantidad, unidad, unidad_base) ordenadas por receta.
+            filas_subrecetas: (receta_id, subreceta_id, cantidad).
+            filas_mano_obra: (receta_id, costo_mano_obra_total).
+
+        Las filas de ingredientes con unidades incompatibles se omiten y marcan su receta en `invalidas`.
+        """
+        subrecetas = {}
+        for receta_id, subreceta_id, cantidad in filas_subrecetas:
+            subrecetas.setdefault(receta_id, []).append((subreceta_id, Cantidad.desde_decimal(cantidad)))
+        invalidas = {}
+        return cls(
+            MatrizBOM.desde_filas(filas_ingredientes, unit_converter, invalidas),
+            {receta_id: tuple(usos) for receta_id, usos in subrecetas.items()},
+            {receta_id: Dinero.desde_decimal(costo or 0) for receta_id, costo in filas_mano_obra},
+            invalidas
+        )
+
+    def verificar(self, receta_ids) -> None:
+        """Lanza ValueError si alguna de las recetas (o una de sus subrecetas) tiene ingredientes inválidos."""
+        problemas = [f"receta ID {receta_id}: {self.invalidas[receta_id]}"
+                     for receta_id in sorted(set(receta_ids)) if receta_id in self.invalidas]
+        if problemas:
+            raise ValueError("Hay recetas con unidades de ingredientes incompatibles con su producto "
+                             "(corrija la receta): " + "; ".join(problemas) + ".")
+
+    def _expandir(self) -> MatrizBOM:
+        """
+        Materias primas por unidad de cada receta, sumando las de sus subrecetas (en orden topológico).
+        Las recetas inválidas se omiten: su fila estaría incompleta.
+        """
+        expandidas = {}
+        for receta_id in self.orden:
+            if receta_id in self.invalidas:
+                continue
+            fila = {ingrediente_id: int(cantidad) for ingrediente_id, cantidad in self.directa.fila(receta_id)}
+            for subreceta_id, cantidad_sub in self.subrecetas.get(receta_id, ()):
+                for ingrediente_id, cantidad in expandidas.get(subreceta_id, {}).items():
+                    fila[ingrediente_id] = fila.get(ingrediente_id, 0) + dividir_redondeando(
+                        cantidad_sub * cantidad, _ESCALA_CANTIDAD
+                    )
+            if fila:
+                expandidas[receta_id] = fila
+        return MatrizBOM.desde_dict(expandidas)
+
+    def subarbol(self, receta_ids) -> set:
+        """Las recetas indicadas y todas las subrecetas que usan, directa o indirectamente."""
+        alcanzadas = set()
+        pila = list(receta_ids)
+        while pila:
+            receta_id = pila.pop()
+            if receta_id in alcanzadas:
+                continue
+            alcanzadas.add(receta_id)
+            pila.extend(subreceta_id for subreceta_id, _ in self.subrecetas.get(receta_id, ()))
+        return alcanzadas
+
+    def explotar(self, pedido: dict, disponibles: dict = None, unidades_enteras: bool = False):
+        """
+        Descompone un pedido en materias primas usando primero el stock de los productos elaborados
+        de las subrecetas: solo lo que falta de cada subreceta se expande a sus ingredientes. Las
+        recetas del pedido se elaboran completas. Se recorre de los consumidores hacia las subrecetas
+        (orden topológico invertido), así cada subreceta recibe la demanda de todas las recetas que la usan.
+
+        Args:
+            pedido: {receta_id: unidades (int)}.
+            disponibles: {receta_id: Cantidad} stock del producto elaborado de cada subreceta, en unidades de receta.
+            unidades_enteras: Redondear hacia arriba lo que falta de cada subreceta a unidades enteras
+                (producción); las ventas consumen la fracción exacta.
+
+        Returns:
+            tuple: (elaboradas, usados, materias) con elaboradas {receta_id: Cantidad} unidades de receta que
+            se hacen desde sus ingredientes, usados {receta_id: Cantidad} tomadas del stock elaborado y
+            materias {producto_id: Cantidad} en unidades base.
+        """
+        disponibles = disponibles or {}
+        requerido = {} # receta_id -> micro-unidades que piden las recetas que la usan
+        elaboradas, usados = {}, {}
+        for receta_id in reversed(self.orden):
+            objetivo = pedido.get(receta_id, 0) * _ESCALA_CANTIDAD
+            faltante = requerido.get(receta_id, 0)
+            if not objetivo and not faltante:
+                continue
+            usado = max(0, min(faltante, disponibles.get(receta_id, 0)))
+            if usado:
+                usados[receta_id] = Cantidad(usado)
+                faltante -= usado
+            if unidades_enteras:
+                faltante = -(-faltante // _ESCALA_CANTIDAD) * _ESCALA_CANTIDAD
+            total = objetivo + faltante
+            if not total:
+                continue
+            elaboradas[receta_id] = Cantidad(total)
+            for subreceta_id, cantidad in self.subrecetas.get(receta_id, ()):
+                requerido[subreceta_id] = requerido.get(subreceta_id, 0) + dividir_redondeando(cantidad * total, _ESCALA_CANTIDAD)
+
+        materias = {}
+        for receta_id, total in elaboradas.items():
+            for ingrediente_id, cantidad in self.directa.fila(receta_id):
+                materias[ingrediente_id] = materias.get(ingrediente_id, 0) + dividir_redondeando(cantidad * total, _ESCALA_CANTIDAD)
+        return elaboradas, usados, {producto_id: Cantidad(total) for producto_id, total in materias.items() if total}
+
+    def afectadas_por(self, productos, recetas=()) -> set:
+        """
+        Recetas que usan alguno de los productos, directamente o a través de subrecetas, y las que
+        usan como subreceta alguna de `recetas` (p. ej. cambió el stock de su producto elaborado).
+        """
+        afectadas = set()
+        pila = [receta_id for producto_id in productos for receta_id in self._recetas_de_producto.get(producto_id, ())]
+        pila.extend(padre for receta_id in recetas for padre in self._padres.get(receta_id, ()))
+        while pila:
+            receta_id = pila.pop()
+            if receta_id in afectadas:
+                continue
+            afectadas.add(receta_id)
+            pila.extend(self._padres.get(receta_id, ()))
+        return afectadas
+
+
+class CosteoRecetas:
+    """
+    Costo de materiales por unidad de cada receta, memoizado.
+
+    El costo de una receta es el de sus ingredientes (costo promedio vigente de cada producto)
+    más, por cada subreceta, su costo de materiales y de mano de obra por las unidades usadas.
+    En cada `actualizar()` se releen solo los productos marcados por eventos del bus desde la
+    última vez y se recalculan las recetas afectadas. El costo de todos los productos se vuelve
+    a leer con una sola consulta la primera vez, cuando cambia la composición de las recetas
+    (nueva EstructuraRecetas, se recalcula todo) y cada REFRESCO_COMPLETO_SEGUNDOS, por los
+    cambios que no generan eventos (p. ej. SQL manual). Los de otras terminales llegan por
+    Core.cambios.MonitorCambios.
+    """
+
+    REFRESCO_COMPLETO_SEGUNDOS = 300
+
+    def __init__(self, recetas_manager):
+        self.recetas_manager = recetas_manager
+        self._estructura = None
+        self._precios = {}  # producto_id -> (total_invertido en centavos, stock en micro-unidades)
+        self._costos = {}   # receta_id -> micro-unidades de moneda por unidad (sin redondear a centavos)
+        self._lock = threading.Lock()
+        self._cambiados = set()       # productos con eventos desde el último actualizar()
+        self._lectura_completa = None # time.monotonic() de la última lectura de todos los precios
+        self._suscrito = False
+
+    def _marcar_cambiado(self, evento):
+        with self._lock:
+            self._cambiados.update(evento.productos())
+
+    def _leer_precios(self, producto_ids=None) -> dict:
+        query = "SELECT id, total_invertido, cantidad FROM productos"
+        params = None
+        if producto_ids is not None:
+            params = list(producto_ids)
+            query += f" WHERE id IN ({', '.join(['%s'] * len(params))})"
+        filas = self.recetas_manager.db_connection.fetch_all(query, params)
+        return {fila[0]: (Dinero.desde_decimal(fila[1]), Cantidad.desde_decimal(fila[2])) for fila in filas}
+
+    def actualizar(self) -> set:
+        """
+        Sincroniza los costos con el inventario y la composición actuales.
+
+        Returns:
+            set: IDs de las recetas recalculadas.
+        """
+        if not self._suscrito:
+            # Antes de la primera lectura completa, para no perder cambios entre ambas
+            bus_eventos.suscribir(StockCambiado, self._marcar_cambiado)
+            bus_eventos.suscribir(ProductoActualizado, self._marcar_cambiado)
+            self._suscrito = True
+
+        estructura = self.recetas_manager.obtener_estructura()
+        with self._lock:
+            cambiados, self._cambiados = self._cambiados, set()
+        if (estructura is not self._estructura or self._lectura_completa is None
+                or time.monotonic() - self._lectura_completa >= self.REFRESCO_COMPLETO_SEGUNDOS):
+            self._lectura_completa = time.monotonic()
+            precios = self._leer_precios()
+        else:
+            precios = dict(self._precios)
+            if cambiados:
+                leidos = self._leer_precios(cambiados)
+                for producto_id in cambiados:
+                    if producto_id in leidos:
+                        precios[producto_id] = leidos[producto_id]
+                    else:
+                        precios.pop(producto_id, None) # Producto eliminado
+        if estructura is not self._estructura:
+            self._estructura = estructura
+            self._costos = {}
+            recalcular = set(estructura.orden)
+        else:
+            cambiados = {producto_id for producto_id in precios.keys() | self._precios.keys()
+                         if precios.get(producto_id) != self._precios.get(producto_id)}
+            recalcular = estructura.afectadas_por(cambiados)
+        self._precios = precios
+
+        if recalcular:
+            for receta_id in estructura.orden:
+                if receta_id in recalcular:
+                    self._costos[receta_id] = self._costear(estructura, receta_id)
+        return recalcular
+
+    def _costear(self, estructura: EstructuraRecetas, receta_id: int) -> int:
+        """
+        Costo de una unidad en micro-unidades de moneda; las subrecetas ya están calculadas por el
+        orden topológico. Las líneas no se redondean a centavos: eso se hace una vez, al leer el costo.
+        """
+        total = 0
+        for ingrediente_id, cantidad in estructura.directa.fila(receta_id):
+            total_invertido, stock = self._precios.get(ingrediente_id, (0, 0))
+            total += costo_proporcional_exacto(cantidad, total_invertido, stock)
+        for subreceta_id, cantidad_sub in estructura.subrecetas.get(receta_id, ()):
+            costo_sub = self._costos.get(subreceta_id, 0) + MicroDinero.desde_dinero(estructura.mano_obra.get(subreceta_id, 0))
+            total += dividir_redondeando(cantidad_sub * costo_sub, _ESCALA_CANTIDAD)
+        return total
+
+    def costo(self, receta_id: int) -> Decimal:
+        """
+        Costo de materiales por unidad de una receta según el último `actualizar()`.
+        Lanza ValueError si la receta tiene ingredientes inválidos (ver EstructuraRecetas.verificar).
+        """
+        if self._estructura is not None:
+            self._estructura.verificar((receta_id,))
+        return MicroDinero(self._costos.get(receta_id, 0)).a_dinero().a_decimal()
+
+    def costos(self) -> dict:
+        """{receta_id: Decimal} con el costo de materiales por unidad de todas las recetas, salvo las inválidas."""
+        invalidas = self._estructura.invalidas if self._estructura is not None else {}
+        return {receta_id: MicroDinero(costo).a_dinero().a_decimal()
+                for receta_id, costo in self._costos.items() if receta_id not in invalidas}
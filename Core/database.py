@@ -3,6 +3,11 @@ from mysql.connector import Error, pooling
 import sys
 import logging
 import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
 from dotenv import load_dotenv
 
 # Configure logging
@@ -15,6 +20,120 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+# Códigos de error de InnoDB que indican conflicto entre transacciones concurrentes:
+# 1213 = deadlock detectado, 1205 = tiempo de espera de bloqueo agotado
+ERRORES_REINTENTABLES = (1213, 1205)
+
+
+class MetricasReintentos:
+    """Contadores de reintentos de transacciones (seguros entre hilos)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._lock:
+            self.reintentos = 0          # re-ejecuciones realizadas
+            self.recuperadas = 0         # transacciones que terminaron bien tras reintentar
+            self.agotadas = 0            # transacciones que fallaron tras agotar los intentos
+            self.por_codigo = {}         # errno -> cantidad de conflictos vistos
+            self.espera_total = 0.0      # segundos dormidos en backoff
+
+    def registrar_conflicto(self, errno, espera):
+        with self._lock:
+            self.reintentos += 1
+            self.por_codigo[errno] = self.por_codigo.get(errno, 0) + 1
+            self.espera_total += espera
+
+    def registrar_recuperada(self):
+        with self._lock:
+            self.recuperadas += 1
+
+    def registrar_agotada(self, errno):
+        with self._lock:
+            self.agotadas += 1
+            self.por_codigo[errno] = self.por_codigo.get(errno, 0) + 1
+
+    def resumen(self) -> dict:
+        with self._lock:
+            return {
+                'reintentos': self.reintentos,
+                'recuperadas': self.recuperadas,
+                'agotadas': self.agotadas,
+                'por_codigo': dict(self.por_codigo),
+                'espera_total': self.espera_total,
+            }
+
+
+metricas_reintentos = MetricasReintentos()
+_estado_reintentos = threading.local()
+
+
+def codigo_error_reintentable(error):
+    """
+    Devuelve el errno reintentable (1213/1205) si `error` o alguna de sus causas
+    encadenadas (raise ... from e) es un conflicto de bloqueo de InnoDB; si no, None.
+    """
+    vistos = set()
+    while error is not None and id(error) not in vistos:
+        vistos.add(id(error))
+        errno = getattr(error, 'errno', None)
+        if errno in ERRORES_REINTENTABLES:
+            return errno
+        error = error.__cause__ or error.__context__
+    return None
+
+
+def reintentar_transaccion(intentos: int = 5, espera_base: float = 0.05, espera_max: float = 1.0):
+    """
+    Decorador para unidades de trabajo transaccionales (p. ej. registrar_venta).
+
+    Si la función falla por un deadlock (1213) o por espera de bloqueo agotada (1205),
+    se vuelve a ejecutar completa, hasta `intentos` veces, esperando entre intentos un
+    tiempo aleatorio entre 0 y min(espera_max, espera_base * 2**n) (backoff exponencial
+    con jitter). La función decorada debe abrir su propia transacción
+    (Database.transaction) para que cada intento empiece desde cero.
+
+    Si una función decorada se llama desde otra también decorada, solo la exterior
+    reintenta: InnoDB revierte la transacción completa, así que repetir solo la parte
+    interior no tendría sentido.
+    """
+    def decorador(funcion):
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if getattr(_estado_reintentos, 'activo', False):
+                return funcion(*args, **kwargs)
+
+            _estado_reintentos.activo = True
+            try:
+                intento = 0
+                while True:
+                    try:
+                        resultado = funcion(*args, **kwargs)
+                    except Exception as e:
+                        errno = codigo_error_reintentable(e)
+                        if errno is None:
+                            raise
+                        intento += 1
+                        if intento >= intentos:
+                            metricas_reintentos.registrar_agotada(errno)
+                            logger.error(f"{funcion.__qualname__}: conflicto {errno} tras {intento} intentos, se abandona")
+                            raise
+                        espera = random.uniform(0, min(espera_max, espera_base * (2 ** intento)))
+                        metricas_reintentos.registrar_conflicto(errno, espera)
+                        logger.warning(f"{funcion.__qualname__}: conflicto {errno}, reintento {intento} en {espera:.3f}s")
+                        time.sleep(espera)
+                        continue
+                    if intento:
+                        metricas_reintentos.registrar_recuperada()
+                    return resultado
+            finally:
+                _estado_reintentos.activo = False
+        return envoltura
+    return decorador
+
+
 class Database:
     def __init__(self):
         # Use environment variables with fallbacks
@@ -29,6 +148,8 @@ class Database:
             'autocommit': False
         }
         self.pool = None
+        # Conexión fijada por hilo mientras dura un snapshot() (ver más abajo)
+        self._local = threading.local()
         self._setup_connection_pool()
 
     def _setup_connection_pool(self):
@@ -45,7 +166,15 @@ class Database:
             raise
 
     def get_connection(self):
-        """Get connection from pool"""
+        """
+        Get connection from pool.
+        Dentro de transaction() o snapshot() devuelve la conexión fijada al hilo, de modo
+        que los métodos que "NO hacen commit" participan en la misma transacción.
+        Esa conexión la cierra el bloque que la abrió, no quien la pide.
+        """
+        fijada = self._conexion_fijada()
+        if fijada is not None:
+            return fijada
         try:
             return self.pool.get_connection()
         except Error as e:
@@ -53,80 +182,202 @@ class Database:
             raise
 
     def execute_query(self, query, params=None):
-        """Execute query with proper error handling"""
-        connection = None
-        cursor = None
+        """
+        Execute a write query and return lastrowid.
+        Dentro de transaction() se ejecuta en la conexión de la transacción y no confirma;
+        fuera de ella se confirma de inmediato (igual que execute_update).
+        """
+        return self.execute_update(query, params)
+
+    def _conexion_fijada(self):
+        """Conexión fijada al hilo actual por transaction() o snapshot(), o None"""
+        return getattr(self._local, 'conexion', None)
+
+    def _en_snapshot(self) -> bool:
+        """True si el hilo actual está dentro de un snapshot() de solo lectura"""
+        return getattr(self._local, 'solo_lectura', False)
+
+    def _verificar_escritura(self):
+        if self._en_snapshot():
+            raise RuntimeError("No se puede escribir dentro de un snapshot() de solo lectura; "
+                               "abra la transacción fuera del bloque snapshot().")
+
+    @contextmanager
+    def transaction(self):
+        """
+        Ejecuta un bloque como una única transacción en una sola conexión.
+
+        Mientras dura el bloque, get_connection() y los métodos de lectura/escritura de
+        esta clase usan esa conexión en el hilo actual. Al salir sin error se hace commit;
+        ante cualquier excepción, rollback y se relanza. Los bloques anidados se unen a la
+        transacción exterior.
+
+        Las funciones registradas con al_confirmar() se ejecutan solo después del commit.
+        No se puede abrir dentro de un snapshot(): su conexión es de solo lectura (RuntimeError).
+
+        Uso:
+            with db.transaction():
+                productos.decrementar_stock(...)
+                db.execute_query("INSERT INTO ventas ...", params)
+        """
+        if self._conexion_fijada() is not None:
+            self._verificar_escritura()
+            yield self._conexion_fijada()
+            return
+
+        connection = self.pool.get_connection()
+        self._local.conexion = connection
+        self._local.al_confirmar = []
+        confirmada = False
         try:
-            connection = self.get_connection()
-            cursor = connection.cursor(dictionary=True)
-            cursor.execute(query, params or ())
-            return cursor, connection
-        except Error as e:
-            if connection:
+            connection.start_transaction()
+            yield connection
+            connection.commit()
+            confirmada = True
+        except BaseException:
+            try:
                 connection.rollback()
-            logger.error(f"Query execution failed: {e}")
+            except Error as e:
+                logger.error(f"Rollback failed: {e}")
             raise
         finally:
-            if cursor:
-                cursor.close()
-            if connection:
-                connection.close()
+            pendientes = self._local.al_confirmar
+            self._local.conexion = None
+            self._local.al_confirmar = []
+            connection.close()
+        if confirmada:
+            for funcion in pendientes:
+                try:
+                    funcion()
+                except Exception as e:
+                    logger.error(f"Post-commit hook failed: {e}")
+
+    def al_confirmar(self, funcion):
+        """
+        Registra `funcion` para ejecutarse cuando la transacción actual se confirme.
+        Si la transacción se revierte, no se ejecuta. Fuera de una transacción se ejecuta de inmediato.
+        """
+        pendientes = getattr(self._local, 'al_confirmar', None)
+        if self._conexion_fijada() is None or pendientes is None:
+            funcion()
+        else:
+            pendientes.append(funcion)
+
+    @contextmanager
+    def snapshot(self):
+        """
+        Agrupa varias consultas de reporte en una sola conexión y una sola vista
+        consistente de los datos: START TRANSACTION WITH CONSISTENT SNAPSHOT, READ ONLY.
 
-    def fetch_one(self, query, params=None):
-        """Fetch single record"""
+        Dentro del bloque, fetch_one/fetch_all del mismo hilo usan esa conexión, por lo que
+        todos los totales corresponden al mismo instante aunque se estén registrando ventas.
+        Las lecturas no toman bloqueos. Al salir, la transacción se cierra y la conexión
+        vuelve al pool. Los bloques anidados reutilizan el snapshot exterior.
+
+        Uso:
+            with db.snapshot():
+                total_ventas = reportes.obtener_total_ventas()
+                total_costos = reportes.obtener_total_costos()
+        """
+        if self._conexion_fijada() is not None:
+            yield self
+            return
+
+        connection = self.get_connection()
         cursor = None
-        connection = None
         try:
-            cursor, connection = self.execute_query(query, params)
-            result = cursor.fetchone()
-            connection.commit()
-            return result
-        except Error as e:
-            logger.error(f"Fetch one failed: {e}")
-            raise
+            cursor = connection.cursor()
+            cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT, READ ONLY")
+            cursor.close()
+            cursor = None
+            self._local.conexion = connection
+            self._local.al_confirmar = None # Solo lectura: no admite hooks de commit
+            self._local.solo_lectura = True
+            yield self
         finally:
+            self._local.conexion = None
+            self._local.solo_lectura = False
             if cursor:
                 cursor.close()
-            if connection:
-                connection.close()
+            try:
+                connection.rollback() # Solo lectura: no hay nada que confirmar
+            except Error as e:
+                logger.error(f"Failed to close snapshot transaction: {e}")
+            connection.close()
 
-    def fetch_all(self, query, params=None):
-        """Fetch all records"""
+    def _fetch(self, query, params, uno: bool):
+        """Ejecuta una consulta de lectura y devuelve una fila o todas, como tuplas"""
+        fijada = self._conexion_fijada()
         cursor = None
         connection = None
         try:
-            cursor, connection = self.execute_query(query, params)
-            result = cursor.fetchall()
-            connection.commit()
+            connection = fijada or self.get_connection()
+            cursor = connection.cursor()
+            cursor.execute(query, params or ())
+            result = cursor.fetchone() if uno else cursor.fetchall()
+            if uno:
+                # Descartar filas restantes para poder cerrar el cursor sin error
+                cursor.fetchall()
+            if not fijada:
+                connection.commit()
             return result
         except Error as e:
-            logger.error(f"Fetch all failed: {e}")
+            if connection and not fijada:
+                connection.rollback()
+            logger.error(f"Fetch failed: {e}")
             raise
         finally:
             if cursor:
                 cursor.close()
-            if connection:
+            if connection and not fijada:
                 connection.close()
 
+    def fetch_one(self, query, params=None, modelo=None):
+        """
+        Fetch single record.
+        Si se indica `modelo` (ver Core.modelos), la fila se devuelve como instancia de ese modelo.
+        """
+        result = self._fetch(query, params, uno=True)
+        if modelo is not None:
+            return modelo.desde_fila(result)
+        return result
+
+    def fetch_all(self, query, params=None, modelo=None):
+        """
+        Fetch all records.
+        Si se indica `modelo` (ver Core.modelos), cada fila se devuelve como instancia de ese modelo.
+        """
+        result = self._fetch(query, params, uno=False)
+        if modelo is not None:
+            return [modelo(*fila) for fila in result]
+        return result
+
     def execute_update(self, query, params=None):
-        """Execute update/insert/delete with transaction support"""
+        """
+        Execute update/insert/delete with transaction support.
+        Dentro de transaction() no confirma ni revierte: lo hace el bloque de la transacción.
+        Dentro de snapshot() lanza RuntimeError.
+        """
+        self._verificar_escritura()
+        fijada = self._conexion_fijada()
         cursor = None
         connection = None
         try:
-            connection = self.get_connection()
+            connection = fijada or self.get_connection()
             cursor = connection.cursor()
             cursor.execute(query, params or ())
-            connection.commit()
+            if not fijada:
+                connection.commit()
             return cursor.lastrowid
         except Error as e:
-            if connection:
+            if connection and not fijada:
                 connection.rollback()
             logger.error(f"Update failed: {e}")
             raise
         finally:
             if cursor:
                 cursor.close()
-            if connection:
+            if connection and not fijada:
                 connection.close()
 
     def close_connection(self):
@@ -1,6 +1,31 @@
-from decimal import Decimal, InvalidOperation
+from decimal import Decimal, InvalidOperation, Context, ROUND_HALF_UP
 from functools import wraps
 
+# Contexto numérico explícito para dinero y cantidades. Se pasa a cada operación
+# de redondeo en lugar de modificar el contexto global de decimal (getcontext()),
+# que es compartido por todo el proceso y por cada hilo.
+CONTEXTO_NUMERICO = Context(prec=28, rounding=ROUND_HALF_UP)
+
+# Escalas de las columnas de la base de datos
+ESCALA_DINERO = Decimal('0.01')      # decimal(10,2): total_invertido, precios, costos
+ESCALA_CANTIDAD = Decimal('0.0001')  # decimal(10,4): cantidades y stock
+
+def a_decimal(valor) -> Decimal:
+    """Convierte un valor (Decimal, int, float o str) a Decimal sin pasar por la representación binaria del float."""
+    if isinstance(valor, Decimal):
+        return valor
+    if isinstance(valor, int):
+        return Decimal(valor)
+    return Decimal(str(valor))
+
+def redondear_dinero(valor) -> Decimal:
+    """Redondea un importe a 2 decimales (mitad hacia arriba), como se guarda en la base de datos."""
+    return a_decimal(valor).quantize(ESCALA_DINERO, context=CONTEXTO_NUMERICO)
+
+def redondear_cantidad(valor) -> Decimal:
+    """Redondea una cantidad a 4 decimales (mitad hacia arriba), como se guarda en la base de datos."""
+    return a_decimal(valor).quantize(ESCALA_CANTIDAD, context=CONTEXTO_NUMERICO)
+
 def require_decimal(*param_names):
     def decorator(func):
         @wraps(func)
@@ -12,7 +37,7 @@ def require_decimal(*param_names):
                             continue
                         if isinstance(kwargs[name], Decimal):
                             continue
-                        kwargs[name] = Decimal(str(kwargs[name]))
+                        kwargs[name] = a_decimal(kwargs[name])
                 return func(*args, **kwargs)
             except (ValueError, InvalidOperation) as e:
                 raise ValueError(f"Invalid decimal value for parameter '{name}'")
@@ -0,0 +1,173 @@
+"""
+Bus de eventos en proceso.
+
+Los managers publican eventos tipados cuando cambian los datos (stock de un producto,
+composición o precio de una receta, una venta o una compra registrada) y quien esté
+interesado (cachés, costeo, páginas abiertas) se suscribe por tipo de evento para
+actualizar solo lo que cambió, sin volver a consultar todo. Los eventos se publican
+después del commit (`publicar_al_confirmar`), así nunca se avisa de algo que luego se
+revierte.
+
+Además, cada evento se anota en la tabla `cambios` dentro de la misma transacción que el
+cambio, con la identificación de esta terminal (TERMINAL); por eso solo se publica dentro
+de `Database.transaction()`. Las demás terminales que usan
+la misma base de datos lo leen con Core.cambios.MonitorCambios y lo publican en su propio
+bus, por lo que sus cachés y páginas se actualizan igual que con un cambio local.
+
+Los suscriptores se ejecutan en el hilo que publica. Una interfaz Tkinter debe pasar
+el trabajo a su propio hilo (p. ej. con `root.after`) antes de tocar widgets.
+
+Uso:
+    cancelar = bus_eventos.suscribir(AlertaStockBajo, lambda evento: print(evento.nombre_producto))
+    ...
+    cancelar()
+"""
+
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+from decimal import Decimal
+from Core.modelos import _Fila
+
+logger = logging.getLogger(__name__)
+
+# Identifica a este proceso en la tabla `cambios` (para no volver a publicar sus propios eventos)
+TERMINAL = f"{socket.gethostname()[:30]}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class Evento(_Fila):
+    """Base de los eventos: campos en `__slots__`, construcción posicional."""
+    __slots__ = ()
+    _DECIMALES = () # Campos Decimal: viajan como texto en `cambios` y se restauran al leerlos
+
+    def a_json(self) -> str:
+        return json.dumps([str(valor) if isinstance(valor, Decimal) else valor
+                           for valor in (getattr(self, campo) for campo in self.__slots__)])
+
+    @classmethod
+    def desde_json(cls, tipo_evento: str, datos: str):
+        """Reconstruye un evento anotado en `cambios`. Lanza ValueError si el tipo no existe."""
+        tipo = _tipo_evento(tipo_evento)
+        valores = json.loads(datos)
+        for i, campo in enumerate(tipo.__slots__):
+            if campo in tipo._DECIMALES and valores[i] is not None:
+                valores[i] = Decimal(valores[i])
+        return tipo(*valores)
+
+
+def _tipo_evento(nombre: str) -> type:
+    pendientes = [Evento]
+    while pendientes:
+        tipo = pendientes.pop()
+        if tipo.__name__ == nombre:
+            return tipo
+        pendientes.extend(tipo.__subclasses__())
+    raise ValueError(f"Tipo de evento desconocido: '{nombre}'.")
+
+
+class StockCambiado(Evento):
+    """
+    Cambió la cantidad en stock (y el total invertido) de uno o varios productos.
+    Un descuento en lote (p. ej. todos los ingredientes de una venta) es un solo evento.
+    """
+    __slots__ = ('producto_ids', 'tipo_movimiento')
+
+    def productos(self) -> tuple:
+        return tuple(self.producto_ids)
+
+
+class ProductoActualizado(Evento):
+    """Se agregó, eliminó o modificó un producto del catálogo (nombre, unidad, stock mínimo...)."""
+    __slots__ = ('producto_id',)
+
+    def productos(self) -> tuple:
+        return (self.producto_id,)
+
+
+class RecetaActualizada(Evento):
+    """Cambió una receta: sus datos, ingredientes, subrecetas o mano de obra. `receta_id` None = varias."""
+    __slots__ = ('receta_id',)
+
+
+class VentaRegistrada(Evento):
+    __slots__ = ('venta_id', 'receta_id', 'cantidad_vendida', 'precio_venta')
+    _DECIMALES = ('precio_venta',)
+
+
+class CompraRegistrada(Evento):
+    __slots__ = ('producto_id', 'nombre_producto')
+
+
+class AlertaStockBajo(Evento):
+    """El stock de un producto pasó de estar en o sobre su mínimo a estar debajo."""
+    __slots__ = ('producto_id', 'nombre_producto', 'cantidad', 'stock_minimo')
+    _DECIMALES = ('cantidad', 'stock_minimo')
+
+
+class StockRepuesto(Evento):
+    """El stock de un producto que estaba debajo de su mínimo volvió a alcanzarlo."""
+    __slots__ = ('producto_id', 'nombre_producto', 'cantidad', 'stock_minimo')
+    _DECIMALES = ('cantidad', 'stock_minimo')
+
+
+class BusEventos:
+    """Suscripciones por tipo de evento (seguro entre hilos)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._suscriptores = {} # tipo de evento -> tupla de funciones
+
+    def suscribir(self, tipo_evento: type, funcion):
+        """
+        Llama a `funcion(evento)` por cada evento publicado de `tipo_evento` o de una subclase.
+
+        Returns:
+            callable: Función sin argumentos que cancela la suscripción.
+        """
+        with self._lock:
+            self._suscriptores[tipo_evento] = self._suscriptores.get(tipo_evento, ()) + (funcion,)
+        return lambda: self.desuscribir(tipo_evento, funcion)
+
+    def desuscribir(self, tipo_evento: type, funcion) -> None:
+        with self._lock:
+            restantes = tuple(f for f in self._suscriptores.get(tipo_evento, ()) if f is not funcion)
+            if restantes:
+                self._suscriptores[tipo_evento] = restantes
+            else:
+                self._suscriptores.pop(tipo_evento, None)
+
+    def publicar(self, evento: Evento) -> None:
+        """Entrega el evento a los suscriptores de su tipo y de sus clases base. Un suscriptor que falla no afecta al resto."""
+        # Las tuplas se reemplazan al (des)suscribir, así se recorren sin mantener el lock
+        suscriptores = self._suscriptores
+        for tipo in type(evento).__mro__:
+            for funcion in suscriptores.get(tipo, ()):
+                try:
+                    funcion(evento)
+                except Exception as e:
+                    logger.error(f"Event subscriber failed for {type(evento).__name__}: {e}")
+
+
+bus_eventos = BusEventos()
+
+
+def publicar_al_confirmar(db_connection, evento: Evento) -> None:
+    """
+    Anota el evento en la tabla `cambios` (en la transacción en curso, para las demás terminales)
+    y lo publica en `bus_eventos` cuando se confirme (ver Database.al_confirmar).
+
+    Raises:
+        RuntimeError: Si no hay una transacción en curso (Database.transaction()): fuera de ella
+            la fila se confirmaría sola y el evento se publicaría aunque el cambio no se confirme.
+    """
+    if db_connection._conexion_fijada() is None or db_connection._en_snapshot():
+        raise RuntimeError(f"{type(evento).__name__} debe publicarse dentro de una transacción "
+                           "(with db.transaction()), junto con el cambio que anuncia.")
+    db_connection.execute_query(
+        "INSERT INTO cambios (terminal, tipo_evento, datos) VALUES (%s, %s, %s)",
+        (TERMINAL, type(evento).__name__, evento.a_json())
+    )
+    db_connection.al_confirmar(lambda: bus_eventos.publicar(evento))
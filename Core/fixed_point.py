@@ -0,0 +1,107 @@
+"""
+Tipos de punto fijo para los cálculos más repetidos (costeo, ventas, reportes).
+
+Las cantidades se guardan como enteros de micro-unidades (1e-6) y el dinero como
+enteros de centavos (o de micro-unidades de moneda, para acumular costos unitarios
+sin redondear cada línea a centavos). Sumar, restar y multiplicar por enteros es aritmética de int
+pura: exacta y mucho más barata que Decimal. La conversión a Decimal solo se hace
+al leer o escribir las columnas decimal(10,4) y decimal(10,2).
+"""
+
+from decimal import Decimal
+from Core.decimal_utils import a_decimal, redondear_dinero, redondear_cantidad, CONTEXTO_NUMERICO
+
+
+class _PuntoFijo(int):
+    """Entero escalado por 10**DECIMALES. Las operaciones aritméticas devuelven int."""
+    __slots__ = ()
+    DECIMALES = 0
+
+    @classmethod
+    def desde_decimal(cls, valor):
+        """Convierte un Decimal/int/float/str redondeando (mitad hacia arriba) a la escala del tipo."""
+        escalado = a_decimal(valor).scaleb(cls.DECIMALES, context=CONTEXTO_NUMERICO)
+        return cls(int(escalado.to_integral_value(context=CONTEXTO_NUMERICO)))
+
+    def a_decimal(self) -> Decimal:
+        """Valor exacto como Decimal."""
+        return Decimal(int(self)).scaleb(-self.DECIMALES)
+
+    def __repr__(self):
+        return f"{type(self).__name__}('{self.a_decimal()}')"
+
+    def __str__(self):
+        return str(self.a_decimal())
+
+
+class Cantidad(_PuntoFijo):
+    """Cantidad en micro-unidades de su unidad base."""
+    __slots__ = ()
+    DECIMALES = 6
+
+    def a_columna(self) -> Decimal:
+        """Valor redondeado a 4 decimales, listo para una columna decimal(10,4)."""
+        return redondear_cantidad(self.a_decimal())
+
+
+class Dinero(_PuntoFijo):
+    """Importe en centavos. Coincide exactamente con las columnas decimal(10,2)."""
+    __slots__ = ()
+    DECIMALES = 2
+
+    def a_columna(self) -> Decimal:
+        """Valor listo para una columna decimal(10,2)."""
+        return redondear_dinero(self.a_decimal())
+
+
+class MicroDinero(_PuntoFijo):
+    """
+    Importe en micro-unidades de moneda (1e-6). Sirve para acumular costos por unidad de receta:
+    0.3 g de sal a $0.80/kg cuestan $0.00024, que redondeado a centavos por línea sería cero.
+    """
+    __slots__ = ()
+    DECIMALES = 6
+
+    @classmethod
+    def desde_dinero(cls, centavos: int):
+        return cls(int(centavos) * 10 ** (cls.DECIMALES - Dinero.DECIMALES))
+
+    def a_dinero(self) -> Dinero:
+        """Redondea (mitad hacia arriba) a centavos; se hace una sola vez, sobre el total."""
+        return Dinero(dividir_redondeando(int(self), 10 ** (self.DECIMALES - Dinero.DECIMALES)))
+
+    def a_columna(self) -> Decimal:
+        return self.a_dinero().a_columna()
+
+
+def dividir_redondeando(numerador: int, denominador: int) -> int:
+    """División entera redondeando la mitad hacia arriba (alejándose de cero), como ROUND_HALF_UP."""
+    if denominador == 0:
+        raise ZeroDivisionError("División por cero en punto fijo.")
+    negativo = (numerador < 0) != (denominador < 0)
+    cociente, resto = divmod(abs(numerador), abs(denominador))
+    if 2 * resto >= abs(denominador):
+        cociente += 1
+    return -cociente if negativo else cociente
+
+
+def costo_proporcional(cantidad: int, total_invertido: int, stock: int) -> Dinero:
+    """
+    Costo (en centavos) de `cantidad` micro-unidades de un producto cuyo stock es
+    `stock` micro-unidades con `total_invertido` centavos: cantidad * total / stock.
+    """
+    if stock <= 0:
+        return Dinero(0)
+    return Dinero(dividir_redondeando(cantidad * total_invertido, stock))
+
+
+def costo_proporcional_exacto(cantidad: int, total_invertido: int, stock: int) -> MicroDinero:
+    """Como `costo_proporcional`, pero en micro-unidades de moneda (sin redondear a centavos)."""
+    if stock <= 0:
+        return MicroDinero(0)
+    return MicroDinero(dividir_redondeando(MicroDinero.desde_dinero(cantidad * total_invertido), stock))
+
+
+def sumar_dinero(importes) -> Dinero:
+    """Suma una secuencia de importes Decimal sin acumular en Decimal."""
+    return Dinero(sum(Dinero.desde_decimal(importe) for importe in importes))
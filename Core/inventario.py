@@ -0,0 +1,360 @@
+"""
+Libro de movimientos de inventario.
+
+Cada cambio de stock (compras, ventas, producción, autoconsumo, ajustes) agrega una fila
+a `movimientos_inventario` con la variación de cantidad y de valor (total invertido).
+La tabla `productos` es una proyección materializada de ese libro: sus columnas
+`cantidad` y `total_invertido` equivalen a la suma de los movimientos de cada producto
+y pueden reconstruirse desde él en cualquier momento.
+
+Para valuar el inventario a una fecha pasada sin sumar el libro desde el principio se
+guardan cortes (`cortes_inventario` / `cortes_inventario_detalle`): el saldo de cada
+producto a una fecha dada. Una valuación parte del último corte anterior y solo suma
+los movimientos posteriores a él (rango sobre el índice `fecha`).
+
+Un corte solo puede tomarse a una fecha al menos MARGEN_CORTE_SEGUNDOS anterior al reloj de
+la base de datos. La fecha de un movimiento es la de su INSERT, no la de su commit: un corte
+tomado "ahora" dejaría fuera, para siempre, los movimientos de ese mismo segundo insertados
+después y los de transacciones todavía abiertas, que las valuaciones posteriores tampoco
+sumarían (solo suman fechas mayores que la del corte).
+
+Uso desde la línea de comandos:
+    python -m Core.inventario conciliar              # saldo inicial para datos previos al libro
+    python -m Core.inventario reconstruir [--producto ID]
+    python -m Core.inventario stock ID [--fecha AAAA-MM-DD]
+    python -m Core.inventario valuacion [--fecha AAAA-MM-DD]
+    python -m Core.inventario corte [--fecha AAAA-MM-DD]   # sin fecha: hace MARGEN_CORTE_SEGUNDOS
+    python -m Core.inventario cierre AAAA-MM      # corte al final del mes
+"""
+
+import calendar
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from mysql.connector import Error
+from Core.decimal_utils import a_decimal, redondear_dinero, redondear_cantidad
+
+TIPOS_MOVIMIENTO = ('compra', 'venta', 'produccion', 'consumo', 'autoconsumo', 'ajuste')
+
+_SQL_INSERTAR_MOVIMIENTO = """
+    INSERT INTO movimientos_inventario (producto_id, tipo, cantidad, valor, referencia_id)
+    VALUES (%s, %s, %s, %s, %s)
+"""
+
+
+def _fin_del_dia(fecha):
+    """Una date se interpreta como el final de ese día; un datetime se usa tal cual (sin microsegundos)."""
+    if isinstance(fecha, datetime):
+        return fecha.replace(microsecond=0)
+    return datetime.combine(fecha, time(23, 59, 59))
+
+
+def _validar_tipo(tipo: str):
+    if tipo not in TIPOS_MOVIMIENTO:
+        raise ValueError(f"Tipo de movimiento inválido: '{tipo}'. Debe ser uno de: {', '.join(TIPOS_MOVIMIENTO)}.")
+
+
+def registrar_movimiento(cursor, producto_id: int, tipo: str, cantidad: Decimal, valor: Decimal, referencia_id: int = None) -> None:
+    """
+    Agrega un movimiento al libro usando el cursor (y por tanto la transacción) del llamador.
+    `cantidad` y `valor` son variaciones con signo: positivas para entradas, negativas para salidas.
+    Este método NO hace commit.
+    """
+    _validar_tipo(tipo)
+    cursor.execute(_SQL_INSERTAR_MOVIMIENTO, (
+        producto_id, tipo, redondear_cantidad(cantidad), redondear_dinero(valor), referencia_id
+    ))
+
+
+def registrar_movimientos(cursor, movimientos) -> None:
+    """
+    Agrega varios movimientos al libro con un solo executemany (ver registrar_movimiento).
+    `movimientos`: iterable de (producto_id, tipo, cantidad, valor, referencia_id).
+    Este método NO hace commit.
+    """
+    filas = []
+    for producto_id, tipo, cantidad, valor, referencia_id in movimientos:
+        _validar_tipo(tipo)
+        filas.append((producto_id, tipo, redondear_cantidad(cantidad), redondear_dinero(valor), referencia_id))
+    if filas:
+        cursor.executemany(_SQL_INSERTAR_MOVIMIENTO, filas)
+
+
+class Inventario:
+    # Antigüedad mínima de un corte: más que la duración de cualquier transacción que anote
+    # movimientos (las esperas de bloqueo de InnoDB se agotan a los 50 s por defecto)
+    MARGEN_CORTE_SEGUNDOS = 600
+
+    def __init__(self, db_connection):
+        self.db_connection = db_connection
+
+    def obtener_movimientos(self, producto_id: int, desde=None, hasta=None) -> list:
+        """Devuelve los movimientos de un producto (id, tipo, cantidad, valor, referencia_id, fecha) en orden cronológico."""
+        query = """
+            SELECT id, tipo, cantidad, valor, referencia_id, fecha
+            FROM movimientos_inventario
+            WHERE producto_id = %s
+        """
+        params = [producto_id]
+        if desde is not None:
+            query += " AND fecha >= %s"
+            params.append(desde)
+        if hasta is not None:
+            query += " AND fecha <= %s"
+            params.append(hasta)
+        query += " ORDER BY fecha, id"
+        return self.db_connection.fetch_all(query, params)
+
+    def _ultimo_corte(self, fecha):
+        """Devuelve (id, fecha_corte) del último corte en o antes de `fecha`, o (None, None)."""
+        result = self.db_connection.fetch_one(
+            "SELECT id, fecha_corte FROM cortes_inventario WHERE fecha_corte <= %s ORDER BY fecha_corte DESC LIMIT 1",
+            (fecha,)
+        )
+        return (result[0], result[1]) if result else (None, None)
+
+    def stock_a_fecha(self, producto_id: int, fecha) -> tuple:
+        """
+        Cantidad y total invertido de un producto a `fecha` (datetime; una date se toma al final del día):
+        saldo del último corte más los movimientos posteriores, con el índice (producto_id, fecha).
+
+        Returns:
+            tuple: (cantidad: Decimal, total_invertido: Decimal)
+        """
+        fecha = _fin_del_dia(fecha)
+        corte_id, fecha_corte = self._ultimo_corte(fecha)
+        cantidad, valor = Decimal('0'), Decimal('0')
+        if corte_id is not None:
+            saldo = self.db_connection.fetch_one(
+                "SELECT cantidad, valor FROM cortes_inventario_detalle WHERE corte_id = %s AND producto_id = %s",
+                (corte_id, producto_id)
+            )
+            if saldo:
+                cantidad, valor = a_decimal(saldo[0]), a_decimal(saldo[1])
+
+        result = self.db_connection.fetch_one("""
+            SELECT COALESCE(SUM(cantidad), 0), COALESCE(SUM(valor), 0)
+            FROM movimientos_inventario
+            WHERE producto_id = %s AND fecha > COALESCE(%s, '1000-01-01') AND fecha <= %s
+        """, (producto_id, fecha_corte, fecha))
+        return cantidad + a_decimal(result[0]), valor + a_decimal(result[1])
+
+    def valuacion_a_fecha(self, fecha) -> list:
+        """
+        Cantidad y total invertido de cada producto a `fecha` (datetime; una date se toma al final del día).
+        Parte del último corte anterior y solo suma los movimientos del intervalo (corte, fecha].
+
+        Returns:
+            list: Tuplas (producto_id, nombre_producto, unidad, cantidad, total_invertido) ordenadas por nombre,
+                  solo de productos con saldo distinto de cero.
+        """
+        fecha = _fin_del_dia(fecha)
+        corte_id, fecha_corte = self._ultimo_corte(fecha)
+        results = self.db_connection.fetch_all("""
+            SELECT p.id, p.nombre_producto, p.unidad,
+                   COALESCE(c.cantidad, 0) + COALESCE(m.cantidad, 0) AS cantidad_a_fecha,
+                   COALESCE(c.valor, 0) + COALESCE(m.valor, 0) AS valor_a_fecha
+            FROM productos p
+            LEFT JOIN cortes_inventario_detalle c ON c.corte_id = %s AND c.producto_id = p.id
+            LEFT JOIN (
+                SELECT producto_id, SUM(cantidad) AS cantidad, SUM(valor) AS valor
+                FROM movimientos_inventario
+                WHERE fecha > COALESCE(%s, '1000-01-01') AND fecha <= %s
+                GROUP BY producto_id
+            ) m ON m.producto_id = p.id
+            HAVING cantidad_a_fecha <> 0 OR valor_a_fecha <> 0
+            ORDER BY p.nombre_producto
+        """, (corte_id, fecha_corte, fecha))
+        return [(row[0], row[1], row[2], a_decimal(row[3]), a_decimal(row[4])) for row in results]
+
+    def total_invertido_a_fecha(self, fecha) -> Decimal:
+        """Valor total del inventario a `fecha` (suma de `valuacion_a_fecha`)."""
+        return redondear_dinero(sum((fila[4] for fila in self.valuacion_a_fecha(fecha)), Decimal('0')))
+
+    def crear_corte(self, fecha=None) -> int:
+        """
+        Guarda el saldo de todos los productos a `fecha` (por defecto, hace MARGEN_CORTE_SEGUNDOS)
+        como corte, calculado a partir del corte anterior. Si ya existe un corte con esa fecha se
+        reemplaza. La fecha debe ser al menos MARGEN_CORTE_SEGUNDOS anterior a la hora de la base
+        de datos, así ya se confirmaron todos los movimientos fechados hasta ella (ver el docstring
+        del módulo).
+
+        Returns:
+            int: ID del corte creado.
+
+        Raises:
+            ValueError: Si la fecha es futura o demasiado reciente.
+        """
+        ahora = self.db_connection.fetch_one("SELECT NOW()")[0] # Reloj de la base, el que fecha los movimientos
+        limite = ahora.replace(microsecond=0) - timedelta(seconds=self.MARGEN_CORTE_SEGUNDOS)
+        fecha = _fin_del_dia(fecha) if fecha is not None else limite
+        if fecha > limite:
+            raise ValueError(f"No se puede crear un corte de inventario posterior a {limite:%Y-%m-%d %H:%M:%S}: "
+                             f"el corte debe tener al menos {self.MARGEN_CORTE_SEGUNDOS // 60} minutos de antigüedad "
+                             "para incluir todos los movimientos de su fecha.")
+
+        try:
+            with self.db_connection.transaction() as conn:
+                # Base: el corte anterior (no uno con la misma fecha, que se va a reemplazar)
+                corte_base_id, fecha_base = self._corte_anterior(fecha)
+
+                cursor = conn.cursor()
+                try:
+                    cursor.execute("DELETE FROM cortes_inventario WHERE fecha_corte = %s", (fecha,))
+                    cursor.execute("INSERT INTO cortes_inventario (fecha_corte) VALUES (%s)", (fecha,))
+                    corte_id = cursor.lastrowid
+                    cursor.execute("""
+                        INSERT INTO cortes_inventario_detalle (corte_id, producto_id, cantidad, valor)
+                        SELECT %s, p.id,
+                               COALESCE(c.cantidad, 0) + COALESCE(m.cantidad, 0),
+                               COALESCE(c.valor, 0) + COALESCE(m.valor, 0)
+                        FROM productos p
+                        LEFT JOIN cortes_inventario_detalle c ON c.corte_id = %s AND c.producto_id = p.id
+                        LEFT JOIN (
+                            SELECT producto_id, SUM(cantidad) AS cantidad, SUM(valor) AS valor
+                            FROM movimientos_inventario
+                            WHERE fecha > COALESCE(%s, '1000-01-01') AND fecha <= %s
+                            GROUP BY producto_id
+                        ) m ON m.producto_id = p.id
+                        WHERE c.producto_id IS NOT NULL OR m.producto_id IS NOT NULL
+                    """, (corte_id, corte_base_id, fecha_base, fecha))
+                finally:
+                    cursor.close()
+            return corte_id
+        except Error as e:
+            raise e
+
+    def _corte_anterior(self, fecha):
+        """Devuelve (id, fecha_corte) del último corte estrictamente anterior a `fecha`, o (None, None)."""
+        result = self.db_connection.fetch_one(
+            "SELECT id, fecha_corte FROM cortes_inventario WHERE fecha_corte < %s ORDER BY fecha_corte DESC LIMIT 1",
+            (fecha,)
+        )
+        return (result[0], result[1]) if result else (None, None)
+
+    def cerrar_mes(self, anio: int, mes: int) -> int:
+        """Crea (o rehace) el corte al último segundo del mes indicado. Devuelve el ID del corte."""
+        if not 1 <= mes <= 12:
+            raise ValueError("El mes debe estar entre 1 y 12.")
+        ultimo_dia = calendar.monthrange(anio, mes)[1]
+        return self.crear_corte(datetime(anio, mes, ultimo_dia, 23, 59, 59))
+
+    def conciliar(self) -> int:
+        """
+        Agrega un movimiento de 'ajuste' por cada producto cuyo stock no coincide con la suma
+        de su libro (p. ej. datos anteriores a la existencia del libro), de modo que después
+        `reconstruir_stock` no cambie nada.
+
+        Returns:
+            int: Cantidad de productos ajustados.
+        """
+        try:
+            with self.db_connection.transaction() as conn:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute("""
+                        INSERT INTO movimientos_inventario (producto_id, tipo, cantidad, valor)
+                        SELECT p.id, 'ajuste',
+                               p.cantidad - COALESCE(m.cantidad, 0),
+                               p.total_invertido - COALESCE(m.valor, 0)
+                        FROM productos p
+                        LEFT JOIN (
+                            SELECT producto_id, SUM(cantidad) AS cantidad, SUM(valor) AS valor
+                            FROM movimientos_inventario
+                            GROUP BY producto_id
+                        ) m ON m.producto_id = p.id
+                        WHERE p.cantidad <> COALESCE(m.cantidad, 0)
+                           OR p.total_invertido <> COALESCE(m.valor, 0)
+                    """)
+                    return cursor.rowcount
+                finally:
+                    cursor.close()
+        except Error as e:
+            raise e
+
+    def reconstruir_stock(self, producto_id: int = None) -> int:
+        """
+        Recalcula `productos.cantidad` y `productos.total_invertido` como la suma del libro
+        (de un producto o de todos).
+
+        Returns:
+            int: Cantidad de productos cuyo valor cambió.
+        """
+        query = """
+            UPDATE productos p
+            LEFT JOIN (
+                SELECT producto_id, SUM(cantidad) AS cantidad, SUM(valor) AS valor
+                FROM movimientos_inventario
+                GROUP BY producto_id
+            ) m ON m.producto_id = p.id
+            SET p.cantidad = COALESCE(m.cantidad, 0),
+                p.total_invertido = COALESCE(m.valor, 0)
+        """
+        params = ()
+        if producto_id is not None:
+            query += " WHERE p.id = %s"
+            params = (producto_id,)
+
+        try:
+            with self.db_connection.transaction() as conn:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute(query, params)
+                    return cursor.rowcount
+                finally:
+                    cursor.close()
+        except Error as e:
+            raise e
+
+
+def main(argv=None):
+    """Comandos de mantenimiento del libro de inventario."""
+    import argparse
+    from Core.database import Database
+
+    parser = argparse.ArgumentParser(prog="python -m Core.inventario", description="Mantenimiento del libro de movimientos de inventario.")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    comandos.add_parser("conciliar", help="Agrega ajustes para que el libro coincida con el stock actual.")
+    reconstruir = comandos.add_parser("reconstruir", help="Recalcula el stock de productos desde el libro.")
+    reconstruir.add_argument("--producto", type=int, default=None, help="ID del producto (por defecto, todos).")
+    stock = comandos.add_parser("stock", help="Muestra el stock de un producto a una fecha.")
+    stock.add_argument("producto", type=int, help="ID del producto.")
+    stock.add_argument("--fecha", default=None, help="Fecha AAAA-MM-DD (por defecto, hoy).")
+    valuacion = comandos.add_parser("valuacion", help="Muestra la valuación del inventario a una fecha.")
+    valuacion.add_argument("--fecha", default=None, help="Fecha AAAA-MM-DD (por defecto, hoy).")
+    corte = comandos.add_parser("corte", help="Guarda un corte de inventario al final de una fecha (o reciente).")
+    corte.add_argument("--fecha", default=None,
+                       help=f"Fecha AAAA-MM-DD (por defecto, hace {Inventario.MARGEN_CORTE_SEGUNDOS // 60} minutos).")
+    cierre = comandos.add_parser("cierre", help="Guarda el corte de cierre de un mes.")
+    cierre.add_argument("mes", help="Mes AAAA-MM.")
+    args = parser.parse_args(argv)
+    fecha = datetime.strptime(args.fecha, '%Y-%m-%d').date() if getattr(args, "fecha", None) else None
+
+    db = Database()
+    try:
+        inventario = Inventario(db)
+        if args.comando == "conciliar":
+            print(f"Productos ajustados: {inventario.conciliar()}")
+        elif args.comando == "reconstruir":
+            print(f"Productos actualizados: {inventario.reconstruir_stock(args.producto)}")
+        elif args.comando == "stock":
+            dia = fecha or datetime.now().date()
+            cantidad, valor = inventario.stock_a_fecha(args.producto, dia)
+            print(f"Producto {args.producto} al {dia}: cantidad {cantidad:.4f}, total invertido ${valor:.2f}")
+        elif args.comando == "valuacion":
+            dia = fecha or datetime.now().date()
+            filas = inventario.valuacion_a_fecha(dia)
+            for _, nombre, unidad, cantidad, valor in filas:
+                print(f"{nombre:<40} {cantidad:>14.4f} {unidad:<10} ${valor:>12.2f}")
+            total = redondear_dinero(sum((fila[4] for fila in filas), Decimal('0')))
+            print(f"Total invertido al {dia}: ${total:.2f}")
+        elif args.comando == "corte":
+            print(f"Corte creado: {inventario.crear_corte(fecha)}")
+        elif args.comando == "cierre":
+            anio, mes = (int(parte) for parte in args.mes.split('-'))
+            print(f"Corte de cierre creado: {inventario.cerrar_mes(anio, mes)}")
+    finally:
+        db.close_connection()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,13 @@
 import mysql.connector
 from mysql.connector import Error
 from decimal import Decimal # Importar Decimal
+from Core.decimal_utils import redondear_dinero
+from Core.inventario import Inventario
 
 class Inversiones:
-    def __init__(self, db_connection):
+    def __init__(self, db_connection, inventario=None):
         self.db_connection = db_connection
+        self.inventario = inventario or Inventario(db_connection)
 
     def calcular_inversion_total(self):
         """Calcula la inversión total en productos."""
@@ -16,7 +19,7 @@ class Inversiones:
                 SELECT SUM(total_invertido) FROM productos
             """)
             result = cursor.fetchone()[0]
-            return Decimal(str(result)) if result is not None else Decimal('0.00')
+            return redondear_dinero(result) if result is not None else Decimal('0.00')
         except Error as e:
             print(f"Error al calcular inversión total: {e}")
             return None
@@ -24,6 +27,21 @@ class Inversiones:
             if cursor:
                 cursor.close()
 
+    def calcular_inversion_a_fecha(self, fecha):
+        """
+        Calcula la inversión total en productos a una fecha pasada (date o datetime),
+        a partir del último corte de inventario y los movimientos posteriores.
+        """
+        try:
+            return self.inventario.total_invertido_a_fecha(fecha)
+        except Error as e:
+            print(f"Error al calcular inversión a fecha {fecha}: {e}")
+            return None
+
+    def cerrar_mes(self, anio: int, mes: int):
+        """Guarda el corte de inventario de fin de mes para que las consultas posteriores partan de él."""
+        return self.inventario.cerrar_mes(anio, mes)
+
     def calcular_ganancias_totales(self):
         """Calcula las ganancias totales a partir de las ventas."""
         try:
@@ -39,7 +57,7 @@ class Inversiones:
             """)
             # Nota: Usamos el costo_mano_obra_total de las recetas para calcular las ganancias.
             result = cursor.fetchone()[0]
-            return Decimal(str(result)) if result is not None else Decimal('0.00')
+            return redondear_dinero(result) if result is not None else Decimal('0.00')
         except Error as e:
             print(f"Error al calcular ganancias totales: {e}")
             return None
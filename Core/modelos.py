@@ -0,0 +1,121 @@
+"""
+Modelos de fila compactos para los resultados de consultas.
+
+Cada clase declara sus columnas en `__slots__` (en el mismo orden del SELECT que
+la produce), por lo que una instancia no lleva `__dict__` y ocupa bastante menos
+memoria que un diccionario por fila. Los valores se leen por atributo
+(`producto.nombre_producto`) en lugar de por posición (`producto[1]`).
+
+Se construyen directamente desde la tupla devuelta por el cursor usando
+`Database.fetch_one(..., modelo=Producto)` / `Database.fetch_all(..., modelo=Producto)`.
+"""
+
+
+class _Fila:
+    """Base de los modelos de fila: construcción posicional desde el cursor."""
+    __slots__ = ()
+
+    def __init__(self, *valores):
+        if len(valores) != len(self.__slots__):
+            raise ValueError(
+                f"{type(self).__name__} espera {len(self.__slots__)} columnas y recibió {len(valores)}."
+            )
+        for campo, valor in zip(self.__slots__, valores):
+            setattr(self, campo, valor)
+
+    @classmethod
+    def desde_fila(cls, fila):
+        """Crea una instancia a partir de una tupla del cursor (o None si no hay fila)."""
+        if fila is None:
+            return None
+        return cls(*fila)
+
+    def a_dict(self) -> dict:
+        """Devuelve los valores como diccionario (p. ej. para serializar en caché)."""
+        return {campo: getattr(self, campo) for campo in self.__slots__}
+
+    def __eq__(self, otro):
+        if type(otro) is not type(self):
+            return NotImplemented
+        return all(getattr(self, campo) == getattr(otro, campo) for campo in self.__slots__)
+
+    __hash__ = None
+
+    def __repr__(self):
+        valores = ", ".join(f"{campo}={getattr(self, campo)!r}" for campo in self.__slots__)
+        return f"{type(self).__name__}({valores})"
+
+
+class Producto(_Fila):
+    """Fila de `productos` (SELECT id, nombre_producto, cantidad, unidad, total_invertido, notas, stock_minimo, unidad_display, proveedor)."""
+    __slots__ = ('id', 'nombre_producto', 'cantidad', 'unidad', 'total_invertido',
+                 'notas', 'stock_minimo', 'unidad_display', 'proveedor')
+
+
+class Receta(_Fila):
+    """Fila de `recetas` (SELECT id, nombre, categoria, precio_venta, costo_mano_obra_total)."""
+    __slots__ = ('id', 'nombre', 'categoria', 'precio_venta', 'costo_mano_obra_total')
+
+
+class IngredienteReceta(_Fila):
+    """Ingrediente de una receta junto con los datos de inventario del producto."""
+    __slots__ = ('ingrediente_id', 'cantidad', 'unidad', 'nombre_ingrediente',
+                 'unidad_base_ingrediente', 'total_invertido', 'stock_actual_ingrediente')
+
+
+class Producibilidad(_Fila):
+    """Máximo de unidades vendibles de una receta con el stock actual y el ingrediente que lo limita."""
+    __slots__ = ('receta_id', 'unidades', 'ingrediente_limitante_id', 'nombre_ingrediente_limitante')
+
+
+class ProductoElaborado(_Fila):
+    """
+    Producto del inventario con el nombre de una receta (su producto elaborado). `disponible` es su
+    stock en unidades de receta (Cantidad), o None si no se mide en unidades de conteo.
+    """
+    __slots__ = ('receta_id', 'producto_id', 'nombre_producto', 'unidad', 'disponible')
+
+
+class ResumenMargen(_Fila):
+    """Distribución del margen por unidad de una receta sobre los escenarios simulados (ver Core.simulador)."""
+    __slots__ = ('receta_id', 'nombre', 'precio_venta', 'margen_actual', 'margen_medio',
+                 'margen_p5', 'margen_p50', 'margen_p95', 'probabilidad_perdida')
+
+
+class SugerenciaCompra(_Fila):
+    """Punto de reorden y compra sugerida de un producto, en su unidad base (ver Core.reabastecimiento)."""
+    __slots__ = ('producto_id', 'nombre_producto', 'unidad', 'unidad_display', 'proveedor', 'stock_actual',
+                 'consumo_diario', 'punto_reorden', 'cantidad_sugerida', 'costo_estimado')
+
+
+class CorridaProduccion(_Fila):
+    """Corrida de un plan de producción: `objetivo` pedido y `unidades` a producir (incluye lo que piden otras recetas)."""
+    __slots__ = ('receta_id', 'nombre_receta', 'objetivo', 'unidades')
+
+
+class FaltanteMaterial(_Fila):
+    """Materia prima que no alcanza para un pedido o plan de producción, en su unidad base (ver Core.planificacion)."""
+    __slots__ = ('producto_id', 'nombre_producto', 'unidad', 'requerido', 'disponible', 'faltante')
+
+
+class Compra(_Fila):
+    """Fila del historial de compras (con el nombre del producto y el total calculado)."""
+    __slots__ = ('fecha_compra', 'nombre_producto', 'cantidad', 'unidad', 'precio_unitario',
+                 'precio_total', 'tipo_compra', 'proveedor', 'notas', 'peso_por_paquete',
+                 'unidades_por_paquete')
+
+
+class Venta(_Fila):
+    """Fila de una venta con el nombre de la receta vendida."""
+    __slots__ = ('id', 'nombre_receta', 'cantidad_vendida', 'precio_venta',
+                 'cliente_nombre', 'fecha_venta')
+
+
+class Dashboard(_Fila):
+    """Resultado agregado del panel de flujo de caja (ver Reportes.cargar_dashboard)."""
+    __slots__ = ('total_ventas', 'total_costos', 'total_autoconsumo',
+                 'ventas_semanales', 'ganancias_por_receta', 'ventas_por_producto')
+
+    @property
+    def total_ganancias(self):
+        return self.total_ventas - self.total_costos - self.total_autoconsumo
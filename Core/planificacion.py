@@ -0,0 +1,185 @@
+"""
+Planificación de la producción de varias recetas a la vez.
+
+El plan produce cada subreceta como un producto elaborado (con el nombre de la receta) y las
+recetas que la usan consumen ese producto. `Produccion.producir_desde_receta` es un plan de
+una sola receta y las ventas usan el mismo modelo (EstructuraRecetas.explotar), así que todos
+los caminos descuentan el inventario de la misma manera:
+
+    1. Se recorren las recetas de los consumidores hacia las subrecetas (orden topológico
+       invertido). Las unidades de cada subreceta que piden sus consumidores se descuentan
+       del stock existente de su producto elaborado y lo que falta se redondea hacia arriba
+       a unidades enteras, que se suman a su objetivo (una venta consume la fracción exacta).
+    2. Las materias primas de todas las corridas se agregan con la matriz de materiales
+       directa (sin expandir) y se comparan con el stock para informar los faltantes.
+    3. Las corridas se ejecutan en orden topológico (subrecetas primero), todas en una
+       transacción.
+
+`planificar` calcula el plan completo en memoria con una lectura de los productos elaborados,
+otra del inventario y la estructura de recetas; `ejecutar` lo aplica. Cantidades en la unidad base de cada producto.
+
+Las recetas se producen en unidades enteras: un producto elaborado que ya existe debe medirse
+en unidades de conteo ('unidad', 'docena'...). Si alguno de los que intervienen en el plan está
+en masa o volumen, `planificar` lo rechaza antes de calcular nada (ver Produccion._producir).
+"""
+
+from decimal import Decimal
+from mysql.connector import Error
+from Core.database import reintentar_transaccion
+from Core.fixed_point import Cantidad
+from Core.modelos import CorridaProduccion, FaltanteMaterial
+
+_ESCALA_CANTIDAD = 10 ** Cantidad.DECIMALES
+
+
+class PlanProduccion:
+    """
+    Resultado de `PlanificadorProduccion.planificar`.
+
+    - `corridas`: CorridaProduccion en el orden en que se ejecutan (subrecetas primero).
+    - `requerimientos`: {producto_id: Cantidad} materias primas de todo el plan.
+    - `faltantes`: FaltanteMaterial de las materias primas que no alcanzan.
+    - `consumos`: {receta_id: (Receta, {producto_id: Cantidad}, {subreceta_id: Cantidad})} por corrida;
+      las subrecetas en unidades de receta.
+    - `productos_elaborados`: {receta_id: (producto_id, unidad)} de los productos elaborados que ya existen.
+    """
+
+    __slots__ = ('corridas', 'requerimientos', 'faltantes', 'consumos', 'productos_elaborados')
+
+    def __init__(self, corridas, requerimientos: dict, faltantes, consumos: dict, productos_elaborados: dict):
+        self.corridas = tuple(corridas)
+        self.requerimientos = requerimientos
+        self.faltantes = tuple(faltantes)
+        self.consumos = consumos
+        self.productos_elaborados = productos_elaborados
+
+    @property
+    def factible(self) -> bool:
+        return bool(self.corridas) and not self.faltantes
+
+
+class PlanificadorProduccion:
+    def __init__(self, db_connection, recetas_manager, produccion):
+        self.db_connection = db_connection
+        self.recetas_manager = recetas_manager
+        self.produccion = produccion
+        self.unit_converter = produccion.unit_converter
+
+    def planificar(self, objetivos: dict) -> PlanProduccion:
+        """
+        Calcula las corridas, los requerimientos agregados y los faltantes para producir los objetivos.
+        No modifica la base de datos.
+
+        Args:
+            objetivos: {receta_id: unidades (int)} a producir de cada receta.
+
+        Raises:
+            ValueError: Si los objetivos son inválidos, alguna receta no existe o no tiene ingredientes,
+                alguna corrida tiene ingredientes en unidades incompatibles con su producto, o el producto
+                elaborado de alguna corrida existe con una unidad que no es de conteo.
+        """
+        if not isinstance(objetivos, dict) or not objetivos:
+            raise ValueError("Debe indicar al menos una receta a producir.")
+        if any(not isinstance(unidades, int) or unidades <= 0 for unidades in objetivos.values()):
+            raise ValueError("Las unidades a producir deben ser enteros positivos.")
+
+        estructura = self.recetas_manager.obtener_estructura()
+        recetas = {receta.id: receta for receta in self.recetas_manager.obtener_todas_las_recetas()}
+        estructura.verificar(objetivos)
+        for receta_id in objetivos:
+            if receta_id not in recetas:
+                raise ValueError(f"Receta con ID {receta_id} no encontrada.")
+            if receta_id not in estructura.directa and receta_id not in estructura.subrecetas:
+                raise ValueError(f"La receta '{recetas[receta_id].nombre}' no tiene ingredientes definidos.")
+
+        # 1. Unidades a producir, de los consumidores hacia sus subrecetas, descontando el stock elaborado
+        elaborados = self.recetas_manager.obtener_productos_elaborados(estructura.subarbol(objetivos))
+        no_conteo = [(e.nombre_producto, e.unidad) for _, e in sorted(elaborados.items()) if e.disponible is None]
+        if no_conteo:
+            raise ValueError(self.produccion.mensaje_unidad_no_conteo(no_conteo))
+        productos_elaborados = {receta_id: (e.producto_id, e.unidad) for receta_id, e in elaborados.items()}
+        elaboradas, _, _ = estructura.explotar(
+            objetivos, {receta_id: e.disponible for receta_id, e in elaborados.items()}, unidades_enteras=True
+        )
+        unidades = {receta_id: total // _ESCALA_CANTIDAD for receta_id, total in elaboradas.items()}
+
+        productos = self.db_connection.fetch_all("SELECT id, nombre_producto, cantidad, unidad FROM productos")
+        stock = {fila[0]: Cantidad.desde_decimal(fila[2]) for fila in productos}
+
+        estructura.verificar(unidades) # Recetas con ingredientes en unidades incompatibles
+
+        # 2. Consumos de cada corrida y materias primas agregadas
+        corridas, consumos, requerimientos = [], {}, {}
+        producido = {} # producto_id -> Cantidad que agregan las corridas a productos existentes
+        for receta_id in estructura.orden:
+            total = unidades.get(receta_id)
+            if not total:
+                continue
+            materias = estructura.directa.requerimientos({receta_id: total})
+            subrecetas = {subreceta_id: Cantidad(cantidad * total)
+                          for subreceta_id, cantidad in estructura.subrecetas.get(receta_id, ())}
+            consumos[receta_id] = (recetas[receta_id], materias, subrecetas)
+            corridas.append(CorridaProduccion(receta_id, recetas[receta_id].nombre, objetivos.get(receta_id, 0), total))
+            for producto_id, cantidad in materias.items():
+                requerimientos[producto_id] = Cantidad(requerimientos.get(producto_id, 0) + cantidad)
+            if receta_id in productos_elaborados:
+                producto_id, unidad = productos_elaborados[receta_id]
+                producido[producto_id] = producido.get(producto_id, 0) + Cantidad.desde_decimal(
+                    self.unit_converter.convert(Decimal(total), 'unidad', unidad)
+                )
+
+        # 3. Faltantes contra el stock leído (más lo que el mismo plan produce)
+        datos = {fila[0]: fila for fila in productos}
+        faltantes = []
+        for producto_id in sorted(requerimientos):
+            requerido = requerimientos[producto_id]
+            disponible = Cantidad(stock.get(producto_id, 0) + producido.get(producto_id, 0))
+            if requerido > disponible:
+                nombre, unidad = (datos[producto_id][1], datos[producto_id][3]) if producto_id in datos else (f"ID {producto_id}", None)
+                faltantes.append(FaltanteMaterial(
+                    producto_id, nombre, unidad, requerido.a_decimal(), disponible.a_decimal(),
+                    Cantidad(requerido - disponible).a_decimal()
+                ))
+
+        return PlanProduccion(corridas, requerimientos, faltantes, consumos, productos_elaborados)
+
+    @reintentar_transaccion()
+    def ejecutar(self, plan: PlanProduccion) -> dict:
+        """
+        Ejecuta todas las corridas del plan en una sola transacción (ver Produccion._producir).
+        El stock se vuelve a validar al descontar cada corrida; si algo cambió desde que se calculó
+        el plan y ya no alcanza, se revierte todo.
+
+        Returns:
+            dict: {receta_id: producto_id} del producto elaborado de cada corrida.
+
+        Raises:
+            ValueError: Si el plan está vacío, tiene faltantes o falta stock al ejecutarlo.
+        """
+        if not plan.corridas:
+            raise ValueError("El plan no tiene corridas de producción.")
+        if plan.faltantes:
+            raise ValueError("No alcanza el stock de: " + ", ".join(f.nombre_producto for f in plan.faltantes) + ".")
+
+        try:
+            producidos = {}
+            with self.db_connection.transaction():
+                for corrida in plan.corridas:
+                    receta, materias, subrecetas = plan.consumos[corrida.receta_id]
+                    consumos = {producto_id: cantidad.a_decimal() for producto_id, cantidad in materias.items()}
+                    for subreceta_id, cantidad in subrecetas.items():
+                        producto_id, unidad = plan.productos_elaborados.get(subreceta_id, (None, 'unidad'))
+                        producto_id = producidos.get(subreceta_id, producto_id)
+                        if producto_id is None:
+                            raise ValueError(f"No hay stock del producto elaborado de la subreceta ID {subreceta_id}.")
+                        consumos[producto_id] = consumos.get(producto_id, Decimal('0')) + \
+                            self.unit_converter.convert(cantidad.a_decimal(), 'unidad', unidad)
+                    producidos[corrida.receta_id] = self.produccion._producir(receta, corrida.unidades, consumos)
+            return producidos # La transacción ya se confirmó al salir del bloque
+
+        except Error as e:
+            raise Exception(f"Error de base de datos al ejecutar el plan de producción: {str(e)}") from e
+        except ValueError as e:
+            raise ValueError(str(e)) from e
+        except Exception as e:
+            raise Exception(str(e)) from e
@@ -4,17 +4,27 @@ from decimal import Decimal
 from datetime import datetime
 from mysql.connector import Error
 from Core.productos import Productos
+from Core.recetas import RecetasManager
+from Core.database import reintentar_transaccion
 from Core.UnitConverter import UnitConverter
+from Core.decimal_utils import a_decimal, redondear_dinero, redondear_cantidad
+from Core.fixed_point import sumar_dinero
+from Core.planificacion import PlanificadorProduccion
 
 class Produccion:
-    def __init__(self, db_connection):
+    def __init__(self, db_connection, productos_manager: Productos = None, unit_converter: UnitConverter = None,
+                 recetas_manager: RecetasManager = None):
         self.db_connection = db_connection
-        self.productos_manager = Productos(db_connection)
-        self.unit_converter = UnitConverter()
+        self.productos_manager = productos_manager or Productos(db_connection)
+        self.unit_converter = unit_converter or UnitConverter()
+        self.recetas_manager = recetas_manager or RecetasManager(db_connection, unit_converter=self.unit_converter)
 
+    @reintentar_transaccion()
     def registrar_produccion(self, nombre_producto_elaborado: str, ingredientes: list, cantidad_producida: Decimal, unidad_producida: str) -> int:
         """
         Registra la producción de un producto elaborado ad-hoc con soporte para unidades específicas.
+        Todo ocurre en una sola transacción, que se reintenta completa ante deadlocks
+        o esperas de bloqueo agotadas.
         
         Args:
             nombre_producto_elaborado: Nombre del producto creado
@@ -36,68 +46,153 @@ class Produccion:
             raise ValueError("La unidad de medida es obligatoria.")
 
         try:
-            # 1. Calcular el costo total de los ingredientes
-            costo_total_ingredientes_produccion = Decimal('0.00')
-            ingredientes_a_consumir_en_base = []
+            with self.db_connection.transaction():
+                # 1. Calcular el costo total de los ingredientes
+                costo_total_ingredientes_produccion = Decimal('0.00')
+                ingredientes_a_consumir_en_base = []
 
-            for ingrediente_id_raw, cantidad_total_usada_raw, unidad_ingrediente in ingredientes:
-                ingrediente_id = int(ingrediente_id_raw)
-                cantidad_total_usada = Decimal(str(cantidad_total_usada_raw))
+                for ingrediente_id_raw, cantidad_total_usada_raw, unidad_ingrediente in ingredientes:
+                    ingrediente_id = int(ingrediente_id_raw)
+                    cantidad_total_usada = a_decimal(cantidad_total_usada_raw)
 
-                if cantidad_total_usada <= Decimal('0'):
-                    raise ValueError(f"La cantidad usada para el ingrediente ID {ingrediente_id} debe ser positiva.")
+                    if cantidad_total_usada <= Decimal('0'):
+                        raise ValueError(f"La cantidad usada para el ingrediente ID {ingrediente_id} debe ser positiva.")
 
-                # Obtener el costo promedio de la materia prima
-                costo_promedio_ingrediente = self.productos_manager.obtener_costo_promedio(ingrediente_id)
+                    # Obtener el costo promedio de la materia prima
+                    costo_promedio_ingrediente = self.productos_manager.obtener_costo_promedio(ingrediente_id)
 
-                # Obtener la unidad base del ingrediente
-                ingrediente_data = self.productos_manager.obtener_producto(ingrediente_id)
-                if not ingrediente_data:
-                    raise ValueError(f"Materia prima con ID {ingrediente_id} no encontrada.")
-                unidad_interna_base_ingrediente = ingrediente_data[3]
+                    # Obtener la unidad base del ingrediente
+                    ingrediente_data = self.productos_manager.obtener_producto(ingrediente_id)
+                    if not ingrediente_data:
+                        raise ValueError(f"Materia prima con ID {ingrediente_id} no encontrada.")
+                    unidad_interna_base_ingrediente = ingrediente_data.unidad
 
-                # Convertir la cantidad a la unidad base
-                cantidad_en_base = self.unit_converter.convert(
-                    cantidad_total_usada, unidad_ingrediente, unidad_interna_base_ingrediente
+                    # Convertir la cantidad a la unidad base
+                    cantidad_en_base = self.unit_converter.convert(
+                        cantidad_total_usada, unidad_ingrediente, unidad_interna_base_ingrediente
+                    )
+
+                    # Acumular el costo total
+                    costo_total_ingredientes_produccion += costo_promedio_ingrediente * cantidad_en_base
+                    ingredientes_a_consumir_en_base.append((ingrediente_id, cantidad_en_base))
+
+                # Calcular el costo por unidad
+                costo_por_unidad = Decimal('0')
+                if cantidad_producida > Decimal('0'):
+                    costo_por_unidad = costo_total_ingredientes_produccion / cantidad_producida
+
+                # 3. Registrar el producto
+                producto_id = self.productos_manager.agregar_o_actualizar_producto(
+                    nombre_producto=nombre_producto_elaborado,
+                    cantidad_compra=cantidad_producida,
+                    unidad_interna_base=unidad_producida,
+                    precio_unitario_compra_por_unidad_interna_base=costo_por_unidad,
+                    stock_minimo=Decimal('0'),
+                    unidad_display=unidad_producida,
+                    proveedor="Producción Interna",
+                    tipo_movimiento='produccion'
                 )
 
-                # Acumular el costo total
-                costo_total_ingredientes_produccion += costo_promedio_ingrediente * cantidad_en_base
-                ingredientes_a_consumir_en_base.append((ingrediente_id, cantidad_en_base))
-
-            # Calcular el costo por unidad
-            costo_por_unidad = Decimal('0')
-            if cantidad_producida > Decimal('0'):
-                costo_por_unidad = costo_total_ingredientes_produccion / cantidad_producida
-
-            # 3. Registrar el producto
-            producto_id = self.productos_manager.agregar_o_actualizar_producto(
-                nombre_producto=nombre_producto_elaborado,
-                cantidad_compra=cantidad_producida,
-                unidad_interna_base=unidad_producida,
-                precio_unitario_compra_por_unidad_interna_base=costo_por_unidad,
-                stock_minimo=Decimal('0'),
-                unidad_display=unidad_producida,
-                proveedor="Producción Interna"
-            )
-
-            # 4. Consumir ingredientes
-            for ing_id, cantidad in ingredientes_a_consumir_en_base:
-                self.productos_manager.decrementar_stock(ing_id, cantidad)
-
-            # 5. Registrar en produccion_registro
-            query = """
-                INSERT INTO produccion_registro (producto_id, cantidad_producida, fecha_produccion, costo_por_unidad_elaborado)
-                VALUES (%s, %s, %s, %s)
-            """
-            params = (producto_id, cantidad_producida, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), costo_por_unidad)
-            self.db_connection.execute_query(query, params)
-
-            return producto_id
+                # 4. Consumir ingredientes
+                for ing_id, cantidad in ingredientes_a_consumir_en_base:
+                    self.productos_manager.decrementar_stock(ing_id, cantidad, tipo_movimiento='consumo')
+
+                # 5. Registrar en produccion_registro
+                query = """
+                    INSERT INTO produccion_registro (producto_id, cantidad_producida, fecha_produccion, costo_por_unidad_elaborado)
+                    VALUES (%s, %s, %s, %s)
+                """
+                params = (producto_id, redondear_cantidad(cantidad_producida), datetime.now().strftime('%Y-%m-%d %H:%M:%S'), redondear_dinero(costo_por_unidad))
+                self.db_connection.execute_query(query, params)
+            return producto_id # La transacción ya se confirmó al salir del bloque
 
         except Error as e:
-            raise Exception(f"Error de base de datos al registrar producción: {str(e)}")
+            raise Exception(f"Error de base de datos al registrar producción: {str(e)}") from e
         except ValueError as e:
-            raise ValueError(str(e))
+            raise ValueError(str(e)) from e
         except Exception as e:
-            raise Exception(str(e))
+            raise Exception(str(e)) from e
+
+    def producir_desde_receta(self, receta_id: int, lotes: int) -> int:
+        """
+        Produce `lotes` unidades de una receta y suma el producto elaborado (con el nombre de la
+        receta) al inventario.
+
+        Es un plan de producción de una sola receta (ver Core.planificacion): las subrecetas se
+        consumen como productos elaborados y lo que falta de ellas se produce antes, desde sus
+        materias primas, en la misma transacción. El inventario y los costos quedan igual que al
+        ejecutar el mismo objetivo desde el Plan de Producción. La transacción se reintenta
+        completa ante deadlocks o esperas de bloqueo agotadas (ver PlanificadorProduccion.ejecutar).
+
+        Args:
+            receta_id: ID de la receta a producir
+            lotes: Unidades de la receta a producir
+
+        Returns:
+            int: ID del producto elaborado
+
+        Raises:
+            ValueError: Si la receta no existe, no tiene ingredientes, su producto elaborado (o el
+                de una subreceta) no se mide en unidades de conteo o falta stock de algún ingrediente.
+        """
+        if not isinstance(receta_id, int) or receta_id <= 0:
+            raise ValueError("El ID de la receta debe ser un entero positivo.")
+        if not isinstance(lotes, int) or lotes <= 0:
+            raise ValueError("La cantidad de lotes debe ser un entero positivo.")
+
+        planificador = PlanificadorProduccion(self.db_connection, self.recetas_manager, self)
+        plan = planificador.planificar({receta_id: lotes})
+        return planificador.ejecutar(plan)[receta_id]
+
+    def _producir(self, receta, unidades: int, consumos: dict) -> int:
+        """
+        Descuenta `consumos` ({producto_id: Decimal en unidad base}) en un solo lote de sentencias,
+        suma `unidades` del producto elaborado y anota la producción en produccion_registro.
+        Si el producto elaborado ya existe se conservan su unidad (las unidades de receta se convierten
+        a ella), stock mínimo y unidad de visualización; si no, se crea en 'unidad'.
+        Este método NO hace commit. Se espera que el llamador maneje la transacción.
+
+        Returns:
+            int: ID del producto elaborado
+
+        Raises:
+            ValueError: Si el producto elaborado existe con una unidad que no es de conteo
+                (se valida antes de descontar stock).
+        """
+        existente = self.productos_manager.obtener_producto_por_nombre(receta.nombre)
+        unidad = existente.unidad if existente else 'unidad'
+        if not self.recetas_manager.es_unidad_de_conteo(unidad):
+            raise ValueError(self.mensaje_unidad_no_conteo([(receta.nombre, unidad)]))
+        cantidad = self.unit_converter.convert(Decimal(unidades), 'unidad', unidad) # p. ej. docenas
+
+        costos = self.productos_manager.decrementar_stock_lote(consumos, tipo_movimiento='consumo')
+        costo_total = sumar_dinero(costos.values()).a_decimal()
+        costo_por_unidad = costo_total / cantidad
+
+        producto_id = self.productos_manager.agregar_o_actualizar_producto(
+            nombre_producto=receta.nombre,
+            cantidad_compra=cantidad,
+            unidad_interna_base=unidad,
+            precio_unitario_compra_por_unidad_interna_base=costo_por_unidad,
+            stock_minimo=a_decimal(existente.stock_minimo) if existente else Decimal('0'),
+            unidad_display=(existente.unidad_display or unidad) if existente else unidad,
+            proveedor="Producción Interna",
+            tipo_movimiento='produccion'
+        )
+
+        query = """
+            INSERT INTO produccion_registro (producto_id, cantidad_producida, fecha_produccion, costo_por_unidad_elaborado, unidad)
+            VALUES (%s, %s, %s, %s, %s)
+        """
+        params = (producto_id, redondear_cantidad(cantidad), datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                  redondear_dinero(costo_por_unidad), unidad)
+        self.db_connection.execute_query(query, params)
+        return producto_id
+
+    @staticmethod
+    def mensaje_unidad_no_conteo(productos) -> str:
+        """Mensaje de error para productos elaborados [(nombre, unidad)] que no se miden en unidades de conteo."""
+        detalle = ", ".join(f"'{nombre}' ({unidad})" for nombre, unidad in productos)
+        return (f"No se puede producir desde receta: {detalle} ya existe como producto con una unidad "
+                "de masa o volumen y las recetas se producen en unidades. Cambie la unidad del producto "
+                "o el nombre de la receta.")
@@ -1,10 +1,19 @@
 import mysql.connector
 from mysql.connector import Error
 from decimal import Decimal
+from Core.search_index import SearchIndex
+from Core.modelos import Producto
+from Core.inventario import registrar_movimiento, registrar_movimientos
+from Core.fixed_point import Cantidad, Dinero, costo_proporcional
+from Core.eventos import (bus_eventos, publicar_al_confirmar, AlertaStockBajo, StockRepuesto, StockCambiado,
+                          ProductoActualizado)
+from Core.decimal_utils import a_decimal, redondear_dinero, redondear_cantidad
 
 class Productos:
     def __init__(self, db_connection):
         self.db_connection = db_connection
+        self._indice_busqueda = None # Índice de nombres compartido por los selectores de productos
+        self._suscrito = False
 
     def agregar_producto(self, nombre_producto: str, unidad: str, stock_minimo: Decimal = Decimal('0.0000'), notas: str = None, unidad_display: str = None, proveedor: str = None) -> int:
         """
@@ -33,9 +42,10 @@ class Productos:
                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
             """
             cursor = conn.cursor()
-            cursor.execute(query, (nombre_producto, Decimal('0.0000'), unidad, Decimal('0.00'), stock_minimo, notas, unidad_display, proveedor))
+            cursor.execute(query, (nombre_producto, Decimal('0.0000'), unidad, Decimal('0.00'), redondear_cantidad(stock_minimo), notas, unidad_display, proveedor))
             # No commit aquí, se espera que el llamador maneje la transacción si es parte de una mayor.
             # Si se llama directamente, el llamador debe hacer commit.
+            self._producto_actualizado(cursor.lastrowid)
             return cursor.lastrowid
         except Error as e:
             # print(f"Error al agregar producto: {e}") # Para depuración
@@ -43,32 +53,49 @@ class Productos:
         finally:
             if cursor: cursor.close()
 
-    def obtener_producto(self, producto_id: int) -> tuple:
+    def obtener_producto(self, producto_id: int) -> Producto:
         """Obtiene los datos de un producto por su ID."""
         # No es necesario obtener la conexión y el cursor manualmente si usamos fetch_one
         return self.db_connection.fetch_one("""
             SELECT id, nombre_producto, cantidad, unidad, total_invertido, notas, stock_minimo, unidad_display, proveedor 
             FROM productos WHERE id = %s
-        """, (producto_id,))
+        """, (producto_id,), modelo=Producto)
 
     def obtener_todos_los_productos(self) -> list:
-        """Obtiene todos los productos registrados."""
+        """Obtiene todos los productos registrados (lista de Producto)."""
         # No es necesario obtener la conexión y el cursor manualmente si usamos fetch_all
-        return self.db_connection.fetch_all("SELECT id, nombre_producto, cantidad, unidad, total_invertido, notas, stock_minimo, unidad_display, proveedor FROM productos ORDER BY nombre_producto")
+        return self.db_connection.fetch_all(
+            "SELECT id, nombre_producto, cantidad, unidad, total_invertido, notas, stock_minimo, unidad_display, proveedor FROM productos ORDER BY nombre_producto",
+            modelo=Producto
+        )
+
+    def obtener_productos_por_ids(self, producto_ids) -> list:
+        """Obtiene los productos con los IDs dados en una sola consulta (los que no existen se omiten)."""
+        producto_ids = list(producto_ids)
+        if not producto_ids:
+            return []
+        marcadores = ", ".join(["%s"] * len(producto_ids))
+        return self.db_connection.fetch_all(
+            "SELECT id, nombre_producto, cantidad, unidad, total_invertido, notas, stock_minimo, unidad_display, proveedor "
+            f"FROM productos WHERE id IN ({marcadores})",
+            producto_ids,
+            modelo=Producto
+        )
 
     def obtener_productos(self) -> list:
         """Devuelve una lista de productos formateada para Combobox (ID - Nombre)."""
         productos_data = self.obtener_todos_los_productos()
-        return [f"{p[0]} - {p[1]}" for p in productos_data]
+        return [f"{p.id} - {p.nombre_producto}" for p in productos_data]
 
     def obtener_producto_id_por_nombre(self, nombre_producto: str) -> int:
         """Obtiene el ID de un producto por su nombre (insensible a mayúsculas)."""
         result = self.db_connection.fetch_one("SELECT id FROM productos WHERE LOWER(nombre_producto) = LOWER(%s)", (nombre_producto,))
         return result[0] if result else None
 
-    def actualizar_stock_y_costo(self, producto_id: int, cantidad_adicional: Decimal, costo_adicional: Decimal) -> bool:
+    def actualizar_stock_y_costo(self, producto_id: int, cantidad_adicional: Decimal, costo_adicional: Decimal,
+                                 tipo_movimiento: str = 'ajuste', referencia_id: int = None) -> bool:
         """
-        Actualiza el stock y el total invertido de un producto.
+        Actualiza el stock y el total invertido de un producto y lo anota en el libro de inventario.
         Este método NO hace commit. Se espera que el llamador maneje la transacción.
         """
         if not isinstance(cantidad_adicional, Decimal) or cantidad_adicional < Decimal('0'):
@@ -80,17 +107,17 @@ class Productos:
         cursor = None
         try:
             # Usar FOR UPDATE para bloquear la fila durante la actualización
-            query_select_for_update = "SELECT cantidad, total_invertido FROM productos WHERE id = %s FOR UPDATE"
+            query_select_for_update = "SELECT cantidad, total_invertido, stock_minimo, nombre_producto FROM productos WHERE id = %s FOR UPDATE"
             cursor = conn.cursor()
             cursor.execute(query_select_for_update, (producto_id,))
             result = cursor.fetchone()
             if not result:
                 raise ValueError(f"Producto con ID {producto_id} no encontrado para actualización de stock y costo.")
 
-            stock_actual, total_invertido_actual = Decimal(str(result[0])), Decimal(str(result[1]))
+            stock_actual, total_invertido_actual = a_decimal(result[0]), a_decimal(result[1])
             
-            nueva_cantidad = stock_actual + cantidad_adicional
-            nuevo_total_invertido = total_invertido_actual + costo_adicional
+            nueva_cantidad = redondear_cantidad(stock_actual + cantidad_adicional)
+            nuevo_total_invertido = redondear_dinero(total_invertido_actual + costo_adicional)
 
             query_update = """
                 UPDATE productos
@@ -98,6 +125,10 @@ class Productos:
                 WHERE id = %s
             """
             cursor.execute(query_update, (nueva_cantidad, nuevo_total_invertido, producto_id))
+            registrar_movimiento(cursor, producto_id, tipo_movimiento,
+                                 nueva_cantidad - stock_actual, nuevo_total_invertido - total_invertido_actual, referencia_id)
+            self._stock_cambiado((producto_id,), tipo_movimiento)
+            self._notificar_cruce_minimo(producto_id, result[3], stock_actual, nueva_cantidad, a_decimal(result[2]))
             return True
         except Error as e:
             # print(f"Error al actualizar stock y costo del producto {producto_id}: {e}")
@@ -107,9 +138,10 @@ class Productos:
 
     def agregar_o_actualizar_producto(self, nombre_producto: str, cantidad_compra: Decimal, unidad_interna_base: str, 
                                       precio_unitario_compra_por_unidad_interna_base: Decimal, stock_minimo: Decimal, 
-                                      unidad_display: str, proveedor: str = None) -> int:
+                                      unidad_display: str, proveedor: str = None, tipo_movimiento: str = 'compra') -> int:
         """
         Agrega un producto si no existe, o actualiza su stock y total invertido si ya existe.
+        La entrada se anota en el libro de inventario con `tipo_movimiento` ('compra' o 'produccion').
         Este método NO hace commit. Se espera que el llamador maneje la transacción.
         """
         if not nombre_producto or not isinstance(nombre_producto, str):
@@ -137,8 +169,8 @@ class Productos:
 
             if producto_existente:
                 producto_id = producto_existente[0]
-                stock_actual = Decimal(str(producto_existente[1]))
-                total_invertido_actual = Decimal(str(producto_existente[2]))
+                stock_actual = a_decimal(producto_existente[1])
+                total_invertido_actual = a_decimal(producto_existente[2])
                 
                 # Actualizar solo si los valores son diferentes o si se fuerza la actualización
                 # Mantener la unidad base y display existentes a menos que se especifique lo contrario
@@ -148,23 +180,32 @@ class Productos:
                 unidad_display_existente = producto_existente[5]
                 proveedor_existente = producto_existente[6]
 
-                nueva_cantidad = stock_actual + cantidad_compra
-                nuevo_total_invertido = total_invertido_actual + costo_compra_actual
+                nueva_cantidad = redondear_cantidad(stock_actual + cantidad_compra)
+                nuevo_total_invertido = redondear_dinero(total_invertido_actual + costo_compra_actual)
 
                 query_update = """
                     UPDATE productos
                     SET cantidad = %s, total_invertido = %s, unidad = %s, stock_minimo = %s, unidad_display = %s, proveedor = %s
                     WHERE id = %s
                 """
-                cursor.execute(query_update, (nueva_cantidad, nuevo_total_invertido, unidad_interna_base, stock_minimo, unidad_display, proveedor, producto_id))
+                cursor.execute(query_update, (nueva_cantidad, nuevo_total_invertido, unidad_interna_base, redondear_cantidad(stock_minimo), unidad_display, proveedor, producto_id))
+                registrar_movimiento(cursor, producto_id, tipo_movimiento,
+                                     nueva_cantidad - stock_actual, nuevo_total_invertido - total_invertido_actual)
+                self._stock_cambiado((producto_id,), tipo_movimiento)
+                self._notificar_cruce_minimo(producto_id, nombre_producto, stock_actual, nueva_cantidad,
+                                             a_decimal(stock_minimo_existente), redondear_cantidad(stock_minimo))
                 return producto_id
             else:
                 query_insert = """
                     INSERT INTO productos (nombre_producto, cantidad, unidad, total_invertido, stock_minimo, unidad_display, proveedor)
                     VALUES (%s, %s, %s, %s, %s, %s, %s)
                 """
-                cursor.execute(query_insert, (nombre_producto, cantidad_compra, unidad_interna_base, costo_compra_actual, stock_minimo, unidad_display, proveedor))
-                return cursor.lastrowid
+                cursor.execute(query_insert, (nombre_producto, redondear_cantidad(cantidad_compra), unidad_interna_base, redondear_dinero(costo_compra_actual), redondear_cantidad(stock_minimo), unidad_display, proveedor))
+                producto_id = cursor.lastrowid
+                registrar_movimiento(cursor, producto_id, tipo_movimiento, cantidad_compra, costo_compra_actual)
+                self._producto_actualizado(producto_id)
+                self._stock_cambiado((producto_id,), tipo_movimiento)
+                return producto_id
         except Error as e:
             # print(f"Error en agregar_o_actualizar_producto: {e}")
             raise e
@@ -173,7 +214,8 @@ class Productos:
 
     def actualizar_stock_minimo(self, producto_id: int, nuevo_stock_minimo: Decimal) -> bool:
         """
-        Actualiza el stock mínimo de un producto.
+        Actualiza el stock mínimo de un producto. Si con el nuevo mínimo el stock actual pasa a estar
+        debajo (o deja de estarlo), publica AlertaStockBajo/StockRepuesto como cualquier movimiento.
         Este método NO hace commit. Se espera que el llamador maneje la transacción.
         """
         if not isinstance(nuevo_stock_minimo, Decimal) or nuevo_stock_minimo < Decimal('0'):
@@ -183,8 +225,18 @@ class Productos:
         cursor = None
         try:
             cursor = conn.cursor()
+            cursor.execute("SELECT cantidad, stock_minimo, nombre_producto FROM productos WHERE id = %s FOR UPDATE", (producto_id,))
+            result = cursor.fetchone()
+            if not result:
+                raise ValueError(f"Producto con ID {producto_id} no encontrado.")
+            stock_actual, stock_minimo_anterior = a_decimal(result[0]), a_decimal(result[1])
+
+            stock_minimo_nuevo = redondear_cantidad(nuevo_stock_minimo)
             query = "UPDATE productos SET stock_minimo = %s WHERE id = %s"
-            cursor.execute(query, (nuevo_stock_minimo, producto_id))
+            cursor.execute(query, (stock_minimo_nuevo, producto_id))
+            self._producto_actualizado(producto_id)
+            self._notificar_cruce_minimo(producto_id, result[2], stock_actual, stock_actual, stock_minimo_anterior,
+                                         stock_minimo_nuevo=stock_minimo_nuevo)
             return True
         except Error as e:
             # print(f"Error al actualizar stock mínimo del producto {producto_id}: {e}")
@@ -192,9 +244,10 @@ class Productos:
         finally:
             if cursor: cursor.close()
 
-    def incrementar_stock(self, producto_id: int, cantidad_a_incrementar: Decimal) -> bool:
+    def incrementar_stock(self, producto_id: int, cantidad_a_incrementar: Decimal,
+                          tipo_movimiento: str = 'ajuste', referencia_id: int = None) -> bool:
         """
-        Incrementa el stock de un producto.
+        Incrementa el stock de un producto (sin cambiar el total invertido) y lo anota en el libro de inventario.
         Este método NO hace commit. Se espera que el llamador maneje la transacción.
         """
         if not isinstance(cantidad_a_incrementar, Decimal) or cantidad_a_incrementar < Decimal('0'):
@@ -207,14 +260,17 @@ class Productos:
                 producto_id = int(producto_id.split(' - ')[0])
 
             cursor = conn.cursor()
-            cursor.execute("SELECT cantidad FROM productos WHERE id = %s FOR UPDATE", (producto_id,))
+            cursor.execute("SELECT cantidad, stock_minimo, nombre_producto FROM productos WHERE id = %s FOR UPDATE", (producto_id,))
             result = cursor.fetchone()
             if not result:
                 raise ValueError(f"Producto con ID {producto_id} no encontrado.")
-            stock_actual = Decimal(str(result[0]))
+            stock_actual = a_decimal(result[0])
 
-            nueva_cantidad = stock_actual + cantidad_a_incrementar
+            nueva_cantidad = redondear_cantidad(stock_actual + cantidad_a_incrementar)
             cursor.execute("UPDATE productos SET cantidad = %s WHERE id = %s", (nueva_cantidad, producto_id))
+            registrar_movimiento(cursor, producto_id, tipo_movimiento, nueva_cantidad - stock_actual, Decimal('0'), referencia_id)
+            self._stock_cambiado((producto_id,), tipo_movimiento)
+            self._notificar_cruce_minimo(producto_id, result[2], stock_actual, nueva_cantidad, a_decimal(result[1]))
             return True
         except Error as e:
             # print(f"Error al incrementar stock del producto {producto_id}: {e}")
@@ -222,14 +278,32 @@ class Productos:
         finally:
             if cursor: cursor.close()
 
-    def decrementar_stock(self, producto_id: int, cantidad_a_decrementar: Decimal) -> bool:
+    def decrementar_stock(self, producto_id: int, cantidad_a_decrementar: Decimal,
+                          tipo_movimiento: str = 'consumo', referencia_id: int = None) -> Decimal:
         """
         Decrementa el stock de un producto y ajusta el total invertido proporcionalmente.
+        La salida se anota en el libro de inventario con `tipo_movimiento` ('venta', 'consumo', 'autoconsumo'...).
         Este método NO hace commit. Se espera que el llamador maneje la transacción.
+
+        El descuento se hace en un único UPDATE condicional (sin leer antes la fila), así el
+        bloqueo de la fila se toma en una sola sentencia. total_invertido se asigna antes que
+        cantidad, así su expresión usa la cantidad anterior (costo promedio vigente) tanto con
+        evaluación del SET de izquierda a derecha como con SIMULTANEOUS_ASSIGNMENT.
+        El valor que sale se calcula en la misma sentencia y se devuelve en centavos con
+        LAST_INSERT_ID(expr), que el cliente recibe como lastrowid (sin variables de sesión).
+        Si no se actualiza ninguna fila, el producto no existe o no tiene stock suficiente, y solo
+        entonces se consulta para informar el motivo. Si el descuento deja el producto debajo de
+        su stock mínimo se publica AlertaStockBajo al confirmar la transacción.
+
+        Returns:
+            Decimal: Valor (total invertido) que salió del inventario, al costo promedio vigente.
         """
         if not isinstance(cantidad_a_decrementar, Decimal) or cantidad_a_decrementar < Decimal('0'):
             raise ValueError("La cantidad a decrementar debe ser un número decimal no negativo.")
 
+        # Se redondea a la escala de la columna; así toda cantidad positiva modifica la fila
+        cantidad_a_decrementar = redondear_cantidad(cantidad_a_decrementar)
+
         conn = self.db_connection.get_connection()
         cursor = None
         try:
@@ -237,44 +311,160 @@ class Productos:
                 producto_id = int(producto_id.split(' - ')[0])
 
             cursor = conn.cursor()
-            # Obtener cantidad y total_invertido para calcular el costo promedio actual
-            cursor.execute("SELECT cantidad, total_invertido FROM productos WHERE id = %s FOR UPDATE", (producto_id,))
+            if cantidad_a_decrementar > Decimal('0'):
+                query_update = """
+                    UPDATE productos
+                    SET total_invertido = total_invertido - LAST_INSERT_ID(
+                            LEAST(ROUND(total_invertido * 100), ROUND(total_invertido * 100 * %s / cantidad))
+                        ) / 100,
+                        cantidad = cantidad - %s
+                    WHERE id = %s AND cantidad >= %s
+                """
+                cursor.execute(query_update, (cantidad_a_decrementar, cantidad_a_decrementar, producto_id, cantidad_a_decrementar))
+                if cursor.rowcount == 1:
+                    costo_salida = Dinero(int(cursor.lastrowid or 0)).a_decimal()
+                    registrar_movimiento(cursor, producto_id, tipo_movimiento, -cantidad_a_decrementar, -costo_salida, referencia_id)
+                    # Lectura por clave de la fila ya bloqueada por el UPDATE: sin nuevas esperas de bloqueo
+                    cursor.execute("SELECT cantidad, stock_minimo, nombre_producto FROM productos WHERE id = %s", (producto_id,))
+                    stock_nuevo, stock_minimo, nombre_producto = cursor.fetchall()[0]
+                    stock_nuevo = a_decimal(stock_nuevo)
+                    self._stock_cambiado((producto_id,), tipo_movimiento)
+                    self._notificar_cruce_minimo(producto_id, nombre_producto, stock_nuevo + cantidad_a_decrementar,
+                                                 stock_nuevo, a_decimal(stock_minimo))
+                    return costo_salida
+
+            # Cantidad cero o ninguna fila actualizada: averiguar si falta el producto o el stock
+            cursor.execute("SELECT cantidad FROM productos WHERE id = %s", (producto_id,))
             result = cursor.fetchone()
             if not result:
                 raise ValueError(f"Producto con ID {producto_id} no encontrado.")
-            
-            stock_actual = Decimal(str(result[0]))
-            total_invertido_actual = Decimal(str(result[1]))
+            if cantidad_a_decrementar == Decimal('0'):
+                return Decimal('0.00') # Nada que descontar
+            stock_actual = a_decimal(result[0])
+            raise ValueError(f"Stock insuficiente para el producto {producto_id}. Disponible: {stock_actual:.4f}, Requerido: {cantidad_a_decrementar:.4f}")
+        except Error as e:
+            # print(f"Error al decrementar stock del producto {producto_id}: {e}")
+            raise e
+        finally:
+            if cursor: cursor.close()
 
-            if stock_actual < cantidad_a_decrementar:
-                raise ValueError(f"Stock insuficiente para el producto {producto_id}. Disponible: {stock_actual:.4f}, Requerido: {cantidad_a_decrementar:.4f}")
+    @staticmethod
+    def _calcular_salida(cantidad, total_invertido, cantidad_salida: Decimal) -> tuple:
+        """
+        Nueva cantidad, nuevo total invertido y valor de una salida al costo promedio vigente
+        (nunca mayor que el total invertido), a partir de los valores actuales de la fila.
+        """
+        stock = Cantidad.desde_decimal(cantidad)
+        total = Dinero.desde_decimal(total_invertido)
+        costo = Dinero(min(total, costo_proporcional(Cantidad.desde_decimal(cantidad_salida), total, stock)))
+        return a_decimal(cantidad) - cantidad_salida, Dinero(total - costo).a_columna(), costo.a_decimal()
 
-            # Calcular el costo promedio por unidad antes de la reducción
-            costo_promedio_por_unidad = Decimal('0.00')
-            if stock_actual > Decimal('0'):
-                costo_promedio_por_unidad = total_invertido_actual / stock_actual
-            
-            # Calcular el nuevo total invertido
-            nuevo_total_invertido = total_invertido_actual - (cantidad_a_decrementar * costo_promedio_por_unidad)
-            # Asegurarse de que total_invertido no sea negativo (puede ocurrir por pequeñas imprecisiones de Decimal si el stock es muy bajo)
-            if nuevo_total_invertido < Decimal('0'):
-                nuevo_total_invertido = Decimal('0')
+    def decrementar_stock_lote(self, consumos: dict, tipo_movimiento: str = 'consumo', referencia_id: int = None) -> dict:
+        """
+        Descuenta varios productos a la vez (p. ej. todos los ingredientes de una producción).
+        Valida la disponibilidad de todos antes de modificar alguno y lo anota en el libro de inventario.
+        Este método NO hace commit. Se espera que el llamador maneje la transacción.
 
-            nueva_cantidad = stock_actual - cantidad_a_decrementar
-            
-            query_update = """
-                UPDATE productos
-                SET cantidad = %s, total_invertido = %s
-                WHERE id = %s
-            """
-            cursor.execute(query_update, (nueva_cantidad, nuevo_total_invertido, producto_id))
-            return True
+        Se usan sentencias agrupadas: un SELECT ... FOR UPDATE de todas las filas (en orden de id),
+        un único UPDATE con CASE y un executemany para el libro, en lugar de dos o tres viajes por
+        producto. El valor de cada salida es el costo promedio vigente, igual que decrementar_stock.
+        Se publica un solo StockCambiado con todos los productos (y las alertas de stock mínimo
+        solo de los que cruzan su mínimo).
+
+        Args:
+            consumos: {producto_id: Decimal} cantidades en la unidad base de cada producto.
+
+        Returns:
+            dict: {producto_id: Decimal} valor (total invertido) que salió de cada producto.
+
+        Raises:
+            ValueError: Si falta algún producto o no alcanza el stock (se informan todos).
+        """
+        consumos = {int(pid): redondear_cantidad(cantidad) for pid, cantidad in consumos.items()}
+        if any(cantidad < Decimal('0') for cantidad in consumos.values()):
+            raise ValueError("Las cantidades a decrementar deben ser números decimales no negativos.")
+        consumos = {pid: cantidad for pid, cantidad in consumos.items() if cantidad > Decimal('0')}
+        if not consumos:
+            return {}
+
+        conn = self.db_connection.get_connection()
+        cursor = None
+        try:
+            ids = sorted(consumos)
+            marcadores = ", ".join(["%s"] * len(ids))
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT id, nombre_producto, cantidad, total_invertido, stock_minimo "
+                f"FROM productos WHERE id IN ({marcadores}) ORDER BY id FOR UPDATE",
+                ids
+            )
+            filas = {fila[0]: fila for fila in cursor.fetchall()}
+
+            faltantes = [f"ID {pid} no encontrado" for pid in ids if pid not in filas]
+            faltantes += [
+                f"{filas[pid][1]} (disponible {a_decimal(filas[pid][2]):.4f}, requerido {consumos[pid]:.4f})"
+                for pid in ids if pid in filas and a_decimal(filas[pid][2]) < consumos[pid]
+            ]
+            if faltantes:
+                raise ValueError("Stock insuficiente: " + "; ".join(faltantes) + ".")
+
+            # producto_id -> (cantidad, total_invertido, costo de salida)
+            nuevos = {pid: self._calcular_salida(filas[pid][2], filas[pid][3], consumos[pid]) for pid in ids}
+
+            casos = " ".join(["WHEN %s THEN %s"] * len(ids))
+            cursor.execute(
+                f"UPDATE productos SET cantidad = CASE id {casos} END, total_invertido = CASE id {casos} END "
+                f"WHERE id IN ({marcadores})",
+                [valor for pid in ids for valor in (pid, nuevos[pid][0])]
+                + [valor for pid in ids for valor in (pid, nuevos[pid][1])]
+                + ids
+            )
+            registrar_movimientos(cursor, (
+                (pid, tipo_movimiento, -consumos[pid], -nuevos[pid][2], referencia_id) for pid in ids
+            ))
+
+            self._stock_cambiado(ids, tipo_movimiento) # Un solo evento para todo el lote
+            for pid in ids:
+                self._notificar_cruce_minimo(pid, filas[pid][1], a_decimal(filas[pid][2]), nuevos[pid][0],
+                                             a_decimal(filas[pid][4]))
+            return {pid: nuevos[pid][2] for pid in ids}
         except Error as e:
-            # print(f"Error al decrementar stock del producto {producto_id}: {e}")
             raise e
         finally:
             if cursor: cursor.close()
 
+    def _notificar_cruce_minimo(self, producto_id: int, nombre_producto: str, stock_anterior: Decimal,
+                                stock_nuevo: Decimal, stock_minimo: Decimal, stock_minimo_nuevo: Decimal = None) -> None:
+        """
+        Publica AlertaStockBajo si el producto quedó debajo de su stock mínimo (y antes no lo estaba),
+        o StockRepuesto si lo alcanzó de nuevo. Se publica al confirmar la transacción en curso.
+        """
+        if stock_minimo_nuevo is None:
+            stock_minimo_nuevo = stock_minimo
+        estaba_bajo = stock_anterior < stock_minimo
+        queda_bajo = stock_nuevo < stock_minimo_nuevo
+        if estaba_bajo == queda_bajo:
+            return
+        tipo_evento = AlertaStockBajo if queda_bajo else StockRepuesto
+        publicar_al_confirmar(self.db_connection, tipo_evento(producto_id, nombre_producto, stock_nuevo, stock_minimo_nuevo))
+
+    def _stock_cambiado(self, producto_ids, tipo_movimiento: str) -> None:
+        publicar_al_confirmar(self.db_connection, StockCambiado(list(producto_ids), tipo_movimiento))
+
+    def _producto_actualizado(self, producto_id: int) -> None:
+        publicar_al_confirmar(self.db_connection, ProductoActualizado(producto_id))
+
+    def _descartar_indice_busqueda(self, evento=None):
+        self._indice_busqueda = None
+
+    @staticmethod
+    def calcular_costo_promedio(cantidad, total_invertido) -> Decimal:
+        """Costo promedio por unidad base a partir de la cantidad y el total invertido de una fila."""
+        cantidad = a_decimal(cantidad)
+        if cantidad > Decimal('0'):
+            return a_decimal(total_invertido) / cantidad
+        return Decimal('0.00')
+
     def obtener_costo_promedio(self, producto_id: int) -> Decimal:
         """Obtiene el costo promedio por unidad de un producto."""
         conn = self.db_connection.get_connection()
@@ -286,8 +476,8 @@ class Productos:
             cursor = conn.cursor()
             cursor.execute("SELECT cantidad, total_invertido FROM productos WHERE id = %s", (producto_id,))
             result = cursor.fetchone()
-            if result and Decimal(str(result[0])) > Decimal('0'):
-                return Decimal(str(result[1])) / Decimal(str(result[0]))
+            if result:
+                return self.calcular_costo_promedio(result[0], result[1])
             return Decimal('0.00')
         except Error as e:
             # print(f"Error al obtener costo promedio del producto {producto_id}: {e}")
@@ -315,6 +505,7 @@ class Productos:
                 WHERE id = %s
             """
             cursor.execute(query, (nueva_unidad_display, producto_id))
+            self._producto_actualizado(producto_id)
             return True
         except Error as e:
             # print(f"Error al actualizar unidad_display del producto {producto_id}: {e}")
@@ -322,13 +513,14 @@ class Productos:
         finally:
             if cursor: cursor.close()
 
-    def obtener_producto_por_nombre(self, nombre_producto: str) -> tuple:
+    def obtener_producto_por_nombre(self, nombre_producto: str) -> Producto:
         """Obtiene un producto por su nombre (insensible a mayúsculas)."""
         # Usar fetch_one para simplificar
         return self.db_connection.fetch_one(
             "SELECT id, nombre_producto, cantidad, unidad, total_invertido, notas, stock_minimo, unidad_display, proveedor "
             "FROM productos WHERE LOWER(nombre_producto) = LOWER(%s)",
-            (nombre_producto,)
+            (nombre_producto,),
+            modelo=Producto
         )
 
     def obtener_nombres_productos(self) -> list:
@@ -337,6 +529,21 @@ class Productos:
         results = self.db_connection.fetch_all("SELECT DISTINCT nombre_producto FROM productos ORDER BY nombre_producto")
         return [row[0] for row in results]
 
+    def obtener_indice_busqueda(self, refrescar: bool = False) -> SearchIndex:
+        """
+        Devuelve el índice de búsqueda de nombres de productos (id, nombre).
+        Se construye con una sola consulta y se reutiliza en todas las páginas
+        que usan esta instancia; con refrescar=True se vuelve a leer de la base de datos.
+        Se descarta con cada ProductoActualizado (de esta u otra terminal).
+        """
+        if not self._suscrito:
+            bus_eventos.suscribir(ProductoActualizado, self._descartar_indice_busqueda)
+            self._suscrito = True
+        if self._indice_busqueda is None or refrescar:
+            filas = self.db_connection.fetch_all("SELECT id, nombre_producto FROM productos")
+            self._indice_busqueda = SearchIndex(filas or [])
+        return self._indice_busqueda
+
     def obtener_unidad_base(self, producto_id: int) -> str:
         """Obtiene la unidad base de un producto por su ID."""
         result = self.db_connection.fetch_one("SELECT unidad FROM productos WHERE id = %s", (producto_id,))
@@ -368,7 +575,7 @@ class Productos:
             cursor = conn.cursor()
             cursor.execute("SELECT cantidad FROM productos WHERE id = %s", (producto_id,))
             result = cursor.fetchone()
-            if result and Decimal(str(result[0])) > Decimal('0'):
+            if result and a_decimal(result[0]) > Decimal('0'):
                 raise ValueError("No se puede eliminar un producto que tiene stock actual. Por favor, ajuste el stock a 0 antes de eliminar.")
 
             # Verificar si el producto está siendo utilizado en otras tablas
@@ -392,8 +599,14 @@ class Productos:
             if cursor.fetchone()[0] > 0:
                 raise ValueError("No se puede eliminar este producto porque está siendo utilizado en producción.")
 
+            # Verificar en el libro de inventario (append-only: no se borra con el producto)
+            cursor.execute("SELECT COUNT(*) FROM movimientos_inventario WHERE producto_id = %s", (producto_id,))
+            if cursor.fetchone()[0] > 0:
+                raise ValueError("No se puede eliminar este producto porque tiene movimientos en el libro de inventario.")
+
             # Si pasa todas las verificaciones, eliminar el producto
             cursor.execute("DELETE FROM productos WHERE id = %s", (producto_id,))
+            self._producto_actualizado(producto_id)
             return True
             
         except Error as e:
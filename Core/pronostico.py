@@ -0,0 +1,160 @@
+"""
+Pronóstico de demanda por receta a partir del historial de ventas.
+
+Las ventas se agregan por receta y día en la base de datos (una sola consulta sobre el
+índice (fecha_venta, producto_id, cantidad_vendida)) y se ordenan en una matriz
+recetas × días con ceros en los días sin ventas. Los modelos trabajan sobre la matriz
+completa, por lo que se ajustan todas las recetas a la vez: cada paso es una operación
+vectorial sobre todas las filas y el costo es lineal en la cantidad de días.
+
+Modelos:
+    - media_movil: promedio de los últimos `ventana` días, constante en el horizonte.
+    - holt_winters: suavizado exponencial aditivo con tendencia amortiguada y
+      estacionalidad semanal.
+    - auto: para cada receta, el de menor error absoluto medio en las últimas semanas.
+"""
+
+from datetime import date, timedelta
+import numpy as np
+
+PERIODO_SEMANAL = 7
+MODELOS = ('media_movil', 'holt_winters', 'auto')
+
+
+def media_movil(serie: np.ndarray, horizonte: int, ventana: int = 28) -> np.ndarray:
+    """Pronóstico (recetas × horizonte) con el promedio de los últimos `ventana` días de cada fila."""
+    ventana = max(1, min(ventana, serie.shape[1]))
+    promedio = serie[:, -ventana:].mean(axis=1) if serie.shape[1] else np.zeros(serie.shape[0])
+    return np.repeat(promedio[:, None], horizonte, axis=1)
+
+
+def holt_winters(serie: np.ndarray, horizonte: int, alfa: float = 0.3, beta: float = 0.05,
+                 gamma: float = 0.2, amortiguamiento: float = 0.9, periodo: int = PERIODO_SEMANAL) -> np.ndarray:
+    """
+    Suavizado exponencial aditivo (nivel, tendencia amortiguada y estacionalidad) para todas las filas a la vez.
+    Requiere al menos dos periodos completos; con menos historia recurre a la media móvil.
+    """
+    filas, dias = serie.shape
+    if dias < 2 * periodo:
+        return media_movil(serie, horizonte)
+
+    # Inicialización con las dos primeras semanas
+    nivel = serie[:, :periodo].mean(axis=1)
+    tendencia = (serie[:, periodo:2 * periodo].mean(axis=1) - nivel) / periodo
+    estacionalidad = serie[:, :periodo] - nivel[:, None]
+
+    for t in range(dias):
+        s = t % periodo
+        valor = serie[:, t]
+        nivel_anterior = nivel
+        nivel = alfa * (valor - estacionalidad[:, s]) + (1 - alfa) * (nivel_anterior + amortiguamiento * tendencia)
+        tendencia = beta * (nivel - nivel_anterior) + (1 - beta) * amortiguamiento * tendencia
+        estacionalidad[:, s] = gamma * (valor - nivel) + (1 - gamma) * estacionalidad[:, s]
+
+    pasos = np.arange(1, horizonte + 1)
+    acumulado = np.cumsum(amortiguamiento ** pasos) # φ + φ² + ... + φ^h
+    indices_estacion = (dias + pasos - 1) % periodo
+    pronostico = nivel[:, None] + tendencia[:, None] * acumulado[None, :] + estacionalidad[:, indices_estacion]
+    return np.clip(pronostico, 0, None)
+
+
+def error_absoluto_medio(real: np.ndarray, pronostico: np.ndarray) -> np.ndarray:
+    """Error absoluto medio por fila."""
+    return np.abs(real - pronostico).mean(axis=1)
+
+
+class ResultadoPronostico:
+    """Demanda pronosticada: `valores` es una matriz recetas × días (fechas desde `desde`)."""
+
+    __slots__ = ('receta_ids', 'desde', 'valores', 'modelos', '_fila_de')
+
+    def __init__(self, receta_ids, desde: date, valores: np.ndarray, modelos: dict):
+        self.receta_ids = tuple(receta_ids)
+        self.desde = desde
+        self.valores = valores
+        self.modelos = modelos # receta_id -> nombre del modelo usado
+        self._fila_de = {receta_id: i for i, receta_id in enumerate(self.receta_ids)}
+
+    @property
+    def fechas(self) -> list:
+        return [self.desde + timedelta(days=i) for i in range(self.valores.shape[1])]
+
+    def por_receta(self, receta_id) -> np.ndarray:
+        """Demanda diaria pronosticada de una receta (ceros si no tiene historial)."""
+        i = self._fila_de.get(receta_id)
+        return self.valores[i] if i is not None else np.zeros(self.valores.shape[1])
+
+    def totales(self, dias: int = None) -> dict:
+        """{receta_id: unidades} pronosticadas en los primeros `dias` días del horizonte (todos por defecto)."""
+        sumas = self.valores[:, :dias].sum(axis=1)
+        return {receta_id: float(total) for receta_id, total in zip(self.receta_ids, sumas)}
+
+
+class PronosticoDemanda:
+    def __init__(self, db_connection):
+        self.db_connection = db_connection
+
+    def cargar_series(self, dias_historia: int = 730, hasta: date = None) -> tuple:
+        """
+        Ventas diarias por receta en los `dias_historia` días que terminan en `hasta` (por defecto, ayer).
+
+        Returns:
+            tuple: (receta_ids, primera fecha, matriz recetas × días de unidades vendidas)
+        """
+        hasta = hasta or date.today() - timedelta(days=1)
+        desde = hasta - timedelta(days=dias_historia - 1)
+        filas = self.db_connection.fetch_all("""
+            SELECT producto_id, DATE(fecha_venta) AS dia, SUM(cantidad_vendida)
+            FROM ventas
+            WHERE fecha_venta >= %s AND fecha_venta < %s
+            GROUP BY producto_id, dia
+        """, (desde, hasta + timedelta(days=1)))
+
+        receta_ids = sorted({fila[0] for fila in filas})
+        fila_de = {receta_id: i for i, receta_id in enumerate(receta_ids)}
+        serie = np.zeros((len(receta_ids), dias_historia))
+        if filas:
+            recetas = np.fromiter((fila_de[fila[0]] for fila in filas), dtype=np.intp, count=len(filas))
+            dias = np.fromiter(((fila[1] - desde).days for fila in filas), dtype=np.intp, count=len(filas))
+            serie[recetas, dias] = np.fromiter((float(fila[2]) for fila in filas), dtype=float, count=len(filas))
+        return receta_ids, desde, serie
+
+    def pronosticar(self, horizonte: int = 14, modelo: str = 'auto', dias_historia: int = 730,
+                    semanas_validacion: int = 4) -> ResultadoPronostico:
+        """
+        Pronostica la demanda diaria de todas las recetas con ventas en el historial, desde hoy.
+
+        Args:
+            horizonte: Días a pronosticar.
+            modelo: 'media_movil', 'holt_winters' o 'auto' (el de menor error en las últimas
+                    `semanas_validacion` semanas, elegido por receta).
+            dias_historia: Días de historial a usar.
+        """
+        receta_ids, desde, serie = self.cargar_series(dias_historia)
+        return self.ajustar(receta_ids, desde, serie, horizonte, modelo, semanas_validacion)
+
+    def ajustar(self, receta_ids, desde: date, serie: np.ndarray, horizonte: int = 14, modelo: str = 'auto',
+                semanas_validacion: int = 4) -> ResultadoPronostico:
+        """Pronostica a partir de series ya cargadas con `cargar_series` (ver `pronosticar`)."""
+        if modelo not in MODELOS:
+            raise ValueError(f"Modelo inválido: '{modelo}'. Debe ser uno de: {', '.join(MODELOS)}.")
+        if horizonte <= 0:
+            raise ValueError("El horizonte debe ser un entero positivo.")
+
+        inicio = desde + timedelta(days=serie.shape[1])
+        dias_validacion = semanas_validacion * PERIODO_SEMANAL
+        if modelo == 'auto' and serie.shape[1] <= dias_validacion:
+            modelo = 'media_movil' # Historial demasiado corto para validar
+        if modelo != 'auto':
+            valores = media_movil(serie, horizonte) if modelo == 'media_movil' else holt_winters(serie, horizonte)
+            return ResultadoPronostico(receta_ids, inicio, valores, {receta_id: modelo for receta_id in receta_ids})
+
+        # Validación: ajustar sin las últimas semanas y comparar contra lo realmente vendido
+        entrenamiento, real = serie[:, :-dias_validacion], serie[:, -dias_validacion:]
+        error_media = error_absoluto_medio(real, media_movil(entrenamiento, dias_validacion))
+        error_hw = error_absoluto_medio(real, holt_winters(entrenamiento, dias_validacion))
+        usar_hw = error_hw < error_media
+
+        valores = np.where(usar_hw[:, None], holt_winters(serie, horizonte), media_movil(serie, horizonte))
+        modelos = {receta_id: 'holt_winters' if hw else 'media_movil' for receta_id, hw in zip(receta_ids, usar_hw)}
+        return ResultadoPronostico(receta_ids, inicio, valores, modelos)
@@ -0,0 +1,106 @@
+"""
+Puntos de reorden y sugerencias de compra.
+
+El consumo de cada materia prima se deriva de las ventas de recetas explotadas por la
+matriz de materiales (subrecetas incluidas): con la serie diaria de ventas Y
+(recetas × días) y la matriz A (recetas × ingredientes), el consumo diario histórico es
+Yᵀ·A y el consumo esperado es el pronóstico de ventas por A. Todo se calcula para todos
+los productos en una sola pasada matricial.
+
+Para cada producto:
+    stock de seguridad = z(nivel de servicio) · σ(consumo diario) · √(días de entrega)
+    punto de reorden   = consumo esperado durante la entrega + stock de seguridad
+                         (nunca menor que el stock mínimo cargado a mano)
+    cantidad sugerida  = consumo esperado durante entrega + cobertura + stock de seguridad - stock actual
+
+Cantidades en la unidad base de cada producto.
+"""
+
+from statistics import NormalDist
+import numpy as np
+from Core.fixed_point import Cantidad
+from Core.modelos import SugerenciaCompra
+
+_ESCALA_CANTIDAD = 10 ** Cantidad.DECIMALES
+
+
+class Reabastecimiento:
+    def __init__(self, db_connection, recetas_manager, pronostico):
+        self.db_connection = db_connection
+        self.recetas_manager = recetas_manager
+        self.pronostico = pronostico
+
+    def _matriz_densa(self, receta_ids, columna_de: dict) -> np.ndarray:
+        """Matriz recetas × productos (unidades base por unidad de receta) para las recetas dadas."""
+        matriz_bom = self.recetas_manager.obtener_matriz_bom()
+        densa = np.zeros((len(receta_ids), len(columna_de)))
+        for i, receta_id in enumerate(receta_ids):
+            for ingrediente_id, cantidad in matriz_bom.fila(receta_id):
+                j = columna_de.get(ingrediente_id)
+                if j is not None:
+                    densa[i, j] = int(cantidad) / _ESCALA_CANTIDAD
+        return densa
+
+    def calcular_sugerencias(self, dias_entrega: int = 3, dias_cobertura: int = 7, nivel_servicio: float = 0.95,
+                             dias_historia: int = 90, solo_necesarias: bool = True) -> list:
+        """
+        Calcula punto de reorden y cantidad sugerida de todos los productos.
+
+        Args:
+            dias_entrega: Días que tarda el proveedor en entregar (lead time).
+            dias_cobertura: Días de consumo que debe cubrir cada compra además de la entrega.
+            nivel_servicio: Probabilidad deseada de no quedarse sin stock durante la entrega (0.5 - 0.999).
+            dias_historia: Días de ventas usados para estimar consumo y variabilidad.
+            solo_necesarias: Si es True, devuelve solo productos en o bajo su punto de reorden.
+
+        Returns:
+            list: SugerenciaCompra ordenadas por proveedor y nombre.
+        """
+        if dias_entrega < 0 or dias_cobertura < 0:
+            raise ValueError("Los días de entrega y de cobertura no pueden ser negativos.")
+        if not 0.5 <= nivel_servicio < 1:
+            raise ValueError("El nivel de servicio debe estar entre 0.5 y 0.999.")
+        if dias_historia <= 0:
+            raise ValueError("Los días de historial deben ser un entero positivo.")
+
+        productos = self.db_connection.fetch_all("""
+            SELECT id, nombre_producto, unidad, unidad_display, proveedor, cantidad, total_invertido, stock_minimo
+            FROM productos
+        """)
+        if not productos:
+            return []
+        columna_de = {fila[0]: j for j, fila in enumerate(productos)}
+
+        # Consumo diario histórico por producto: ventas (días × recetas) @ matriz (recetas × productos)
+        receta_ids, desde, serie = self.pronostico.cargar_series(dias_historia)
+        matriz = self._matriz_densa(receta_ids, columna_de)
+        consumo_historico = serie.T @ matriz
+        desviacion = consumo_historico.std(axis=0)
+
+        # Consumo esperado durante la entrega y la cobertura, desde el pronóstico de ventas
+        horizonte = max(1, dias_entrega + dias_cobertura)
+        pronostico = self.pronostico.ajustar(receta_ids, desde, serie, horizonte)
+        consumo_esperado = pronostico.valores.T @ matriz # días del horizonte × productos
+        consumo_entrega = consumo_esperado[:dias_entrega].sum(axis=0)
+        consumo_total = consumo_esperado[:dias_entrega + dias_cobertura].sum(axis=0)
+        consumo_diario = consumo_esperado.mean(axis=0)
+
+        z = NormalDist().inv_cdf(nivel_servicio)
+        seguridad = z * desviacion * np.sqrt(dias_entrega)
+        stock = np.array([float(fila[5] or 0) for fila in productos])
+        stock_minimo = np.array([float(fila[7] or 0) for fila in productos])
+        punto_reorden = np.maximum(consumo_entrega + seguridad, stock_minimo)
+        objetivo = np.maximum(consumo_total + seguridad, stock_minimo)
+        sugerida = np.maximum(objetivo - stock, 0)
+
+        sugerencias = []
+        for j, (producto_id, nombre, unidad, unidad_display, proveedor, cantidad, total_invertido, _) in enumerate(productos):
+            necesita = stock[j] <= punto_reorden[j] and sugerida[j] > 0
+            if solo_necesarias and not necesita:
+                continue
+            costo_unitario = float(total_invertido) / stock[j] if stock[j] > 0 else 0.0
+            sugerencias.append(SugerenciaCompra(
+                producto_id, nombre, unidad, unidad_display, proveedor,
+                stock[j], consumo_diario[j], punto_reorden[j], sugerida[j], sugerida[j] * costo_unitario
+            ))
+        return sorted(sugerencias, key=lambda s: ((s.proveedor or '').lower(), s.nombre_producto.lower()))
@@ -1,12 +1,23 @@
 import mysql.connector
 from mysql.connector import Error
 from decimal import Decimal
+from Core.decimal_utils import a_decimal, redondear_dinero, redondear_cantidad
+from Core.fixed_point import Cantidad
+from Core.modelos import Receta, IngredienteReceta, Producibilidad, FaltanteMaterial, ProductoElaborado
+from Core.bom import MatrizBOM
+from Core.costeo import CosteoRecetas, EstructuraRecetas, crearia_ciclo
+from Core.eventos import bus_eventos, publicar_al_confirmar, RecetaActualizada
 from Core.UnitConverter import UnitConverter # Asegúrate de que UnitConverter esté disponible
 
 class RecetasManager:
-    def __init__(self, db_connection):
+    MAXIMO_PRODUCIBLE = 10 ** 9 # Tope de la búsqueda de unidades vendibles con stock elaborado
+
+    def __init__(self, db_connection, unit_converter: UnitConverter = None):
         self.db_connection = db_connection
-        self.unit_converter = UnitConverter()
+        self.unit_converter = unit_converter or UnitConverter()
+        self._estructura = None # Composición de las recetas (ingredientes, subrecetas, matriz); se invalida al editarlas
+        self._suscrito = False
+        self.costeo = CosteoRecetas(self)
 
     def crear_receta(self, nombre_receta: str, categoria: str, precio_venta: Decimal = Decimal('0.00'), costo_mano_obra_total: Decimal = Decimal('0.00')) -> int:
         """
@@ -35,8 +46,9 @@ class RecetasManager:
                 VALUES (%s, %s, %s, %s)
             """
             cursor = conn.cursor()
-            cursor.execute(query, (nombre_receta, categoria, precio_venta, costo_mano_obra_total))
+            cursor.execute(query, (nombre_receta, categoria, redondear_dinero(precio_venta), redondear_dinero(costo_mano_obra_total)))
             # No commit aquí
+            publicar_al_confirmar(self.db_connection, RecetaActualizada(cursor.lastrowid))
             return cursor.lastrowid
         except Error as e:
             # print(f"Error al crear receta: {e}")
@@ -62,8 +74,9 @@ class RecetasManager:
             cursor = conn.cursor()
             cursor.execute(
                 "UPDATE recetas SET costo_mano_obra_total = %s WHERE id = %s",
-                (nuevo_costo_mano_obra, receta_id)
+                (redondear_dinero(nuevo_costo_mano_obra), receta_id)
             )
+            self.invalidar_matriz_bom(receta_id) # La mano de obra de una subreceta forma parte del costo de quien la usa
             # No commit aquí
         except Error as e:
             # print(f"Error al actualizar costo de mano de obra: {str(e)}")
@@ -74,6 +87,8 @@ class RecetasManager:
     def agregar_ingrediente_a_receta(self, receta_id: int, ingrediente_id: int, cantidad: Decimal, unidad: str) -> None:
         """
         Añade un ingrediente a una receta existente.
+        La unidad debe poder convertirse a la unidad base del producto (p. ej. 'kg' para un producto
+        en 'g', pero no 'unidad'): la matriz de materiales trabaja en unidades base.
         Este método NO hace commit. Se espera que el llamador maneje la transacción.
         """
         if not isinstance(receta_id, int) or receta_id <= 0:
@@ -89,6 +104,16 @@ class RecetasManager:
         cursor = None
         try:
             cursor = conn.cursor()
+            cursor.execute("SELECT nombre_producto, unidad FROM productos WHERE id = %s", (ingrediente_id,))
+            producto = cursor.fetchone()
+            if not producto:
+                raise ValueError(f"Producto con ID {ingrediente_id} no encontrado.")
+            try:
+                self.unit_converter.factor(unidad, producto[1])
+            except (ValueError, KeyError):
+                raise ValueError(f"La unidad '{unidad}' no es compatible con la unidad base '{producto[1]}' "
+                                 f"del producto '{producto[0]}'.")
+
             # Verificar si el ingrediente ya está en la receta para actualizar en lugar de insertar
             cursor.execute("SELECT id FROM receta_ingredientes WHERE receta_id = %s AND ingrediente_id = %s", (receta_id, ingrediente_id))
             existing_entry = cursor.fetchone()
@@ -99,13 +124,14 @@ class RecetasManager:
                     SET cantidad = %s, unidad = %s
                     WHERE id = %s
                 """
-                cursor.execute(query, (cantidad, unidad, existing_entry[0]))
+                cursor.execute(query, (redondear_cantidad(cantidad), unidad, existing_entry[0]))
             else:
                 query = """
                     INSERT INTO receta_ingredientes (receta_id, ingrediente_id, cantidad, unidad)
                     VALUES (%s, %s, %s, %s)
                 """
-                cursor.execute(query, (receta_id, ingrediente_id, cantidad, unidad))
+                cursor.execute(query, (receta_id, ingrediente_id, redondear_cantidad(cantidad), unidad))
+            self.invalidar_matriz_bom(receta_id)
             # No commit aquí
         except Error as e:
             # print(f"Error al agregar ingrediente a receta: {e}")
@@ -134,6 +160,7 @@ class RecetasManager:
                 WHERE receta_id = %s AND ingrediente_id = %s
             """
             cursor.execute(query, (receta_id, ingrediente_id))
+            self.invalidar_matriz_bom(receta_id)
             # No commit aquí
         except Error as e:
             # print(f"Error al eliminar ingrediente de receta: {e}")
@@ -141,33 +168,24 @@ class RecetasManager:
         finally:
             if cursor: cursor.close()
 
-    def obtener_receta(self, receta_id: int) -> dict:
+    def obtener_receta(self, receta_id: int) -> Receta:
         """Obtiene los datos de una receta por su ID."""
-        # Usar fetch_one para simplificar
-        result = self.db_connection.fetch_one("SELECT id, nombre, categoria, precio_venta, costo_mano_obra_total FROM recetas WHERE id = %s", (receta_id,))
-        if result:
-            # Mapear a diccionario manualmente si fetch_one no devuelve dict
-            column_names = ["id", "nombre", "categoria", "precio_venta", "costo_mano_obra_total"]
-            return dict(zip(column_names, result))
-        return None
+        # Las columnas decimal llegan como Decimal desde el conector
+        return self.db_connection.fetch_one(
+            "SELECT id, nombre, categoria, precio_venta, costo_mano_obra_total FROM recetas WHERE id = %s",
+            (receta_id,),
+            modelo=Receta
+        )
 
     def obtener_todas_las_recetas(self) -> list:
-        """Obtiene todas las recetas registradas."""
-        # Usar fetch_all para simplificar
-        results = self.db_connection.fetch_all("SELECT id, nombre, categoria, precio_venta, costo_mano_obra_total FROM recetas ORDER BY nombre")
-        
-        # Mapear a lista de diccionarios
-        column_names = ["id", "nombre", "categoria", "precio_venta", "costo_mano_obra_total"]
-        recetas_list = []
-        for row in results:
-            receta_dict = dict(zip(column_names, row))
-            receta_dict['precio_venta'] = Decimal(str(receta_dict['precio_venta']))
-            receta_dict['costo_mano_obra_total'] = Decimal(str(receta_dict['costo_mano_obra_total']))
-            recetas_list.append(receta_dict)
-        return recetas_list
+        """Obtiene todas las recetas registradas (lista de Receta)."""
+        return self.db_connection.fetch_all(
+            "SELECT id, nombre, categoria, precio_venta, costo_mano_obra_total FROM recetas ORDER BY nombre",
+            modelo=Receta
+        )
 
     def obtener_ingredientes_de_receta(self, receta_id: int) -> list:
-        """Obtiene los ingredientes de una receta específica."""
+        """Obtiene los ingredientes de una receta específica (lista de IngredienteReceta)."""
         query = """
             SELECT ri.ingrediente_id, ri.cantidad, ri.unidad, p.nombre_producto as nombre_ingrediente,
                    p.unidad as unidad_base_ingrediente, p.total_invertido, p.cantidad as stock_actual_ingrediente
@@ -175,74 +193,348 @@ class RecetasManager:
             JOIN productos p ON ri.ingrediente_id = p.id
             WHERE ri.receta_id = %s
         """
-        results = self.db_connection.fetch_all(query, (receta_id,))
-        
-        ingredientes_list = []
-        column_names = ["ingrediente_id", "cantidad", "unidad", "nombre_ingrediente", 
-                        "unidad_base_ingrediente", "total_invertido", "stock_actual_ingrediente"]
-        for row in results:
-            ingrediente_dict = dict(zip(column_names, row))
-            ingrediente_dict['cantidad'] = Decimal(str(ingrediente_dict['cantidad']))
-            ingrediente_dict['total_invertido'] = Decimal(str(ingrediente_dict['total_invertido']))
-            ingrediente_dict['stock_actual_ingrediente'] = Decimal(str(ingrediente_dict['stock_actual_ingrediente']))
-            ingredientes_list.append(ingrediente_dict)
-        return ingredientes_list
+        return self.db_connection.fetch_all(query, (receta_id,), modelo=IngredienteReceta)
+
+    def obtener_estructura(self, refrescar: bool = False) -> EstructuraRecetas:
+        """
+        Devuelve la composición de todas las recetas: ingredientes propios, subrecetas, mano de obra,
+        orden topológico y matriz de materiales expandida (ver Core.costeo).
+        Se construye con tres consultas y se reutiliza hasta que se edita alguna receta
+        (aquí o en otra terminal: se descarta con cada RecetaActualizada).
+        """
+        if not self._suscrito:
+            bus_eventos.suscribir(RecetaActualizada, self._descartar_estructura)
+            self._suscrito = True
+        estructura = self._estructura
+        if estructura is None or refrescar:
+            ingredientes = self.db_connection.fetch_all("""
+                SELECT ri.receta_id, ri.ingrediente_id, ri.cantidad, ri.unidad, p.unidad
+                FROM receta_ingredientes ri
+                JOIN productos p ON ri.ingrediente_id = p.id
+                ORDER BY ri.receta_id, ri.ingrediente_id
+            """)
+            subrecetas = self.db_connection.fetch_all(
+                "SELECT receta_id, subreceta_id, cantidad FROM receta_subrecetas ORDER BY receta_id, subreceta_id"
+            )
+            mano_obra = self.db_connection.fetch_all("SELECT id, costo_mano_obra_total FROM recetas")
+            estructura = self._estructura = EstructuraRecetas.construir(
+                ingredientes or [], subrecetas or [], mano_obra or [], self.unit_converter
+            )
+        return estructura
+
+    def obtener_matriz_bom(self, refrescar: bool = False) -> MatrizBOM:
+        """
+        Devuelve la matriz de explosión de materiales de todas las recetas (ver Core.bom), con las
+        subrecetas ya expandidas a materias primas.
+        """
+        return self.obtener_estructura(refrescar).matriz
+
+    def unidades_producibles(self, receta_ids=None) -> dict:
+        """
+        Calcula, para todas las recetas a la vez (o las indicadas), cuántas unidades alcanza a cubrir
+        el stock actual y qué ingrediente lo limita. Usa una sola lectura del stock y la matriz de materiales.
+        Las recetas con subrecetas que tienen stock de su producto elaborado se evalúan como las ventas
+        (ver EstructuraRecetas.explotar): primero ese stock y solo lo que falta desde materias primas.
+
+        Returns:
+            dict: {receta_id: Producibilidad}. Las recetas sin ingredientes no aparecen.
+        """
+        estructura = self.obtener_estructura()
+        matriz = estructura.matriz
+        filas = self.db_connection.fetch_all("SELECT id, nombre_producto, cantidad FROM productos")
+        nombres = {fila[0]: fila[1] for fila in filas}
+        stock = {fila[0]: Cantidad.desde_decimal(fila[2]) for fila in filas}
+
+        ids = [receta_id for receta_id in (matriz.receta_ids if receta_ids is None else receta_ids) if receta_id in matriz]
+        disponibles = self.stock_elaborado(estructura, ids)
+        con_elaborados = [receta_id for receta_id in ids
+                          if disponibles.keys() & (estructura.subarbol((receta_id,)) - {receta_id})]
+        directas = set(ids).difference(con_elaborados)
+
+        resultado = {
+            receta_id: Producibilidad(receta_id, unidades, limitante, nombres.get(limitante))
+            for receta_id, (unidades, limitante) in matriz.unidades_producibles(stock, directas).items()
+        }
+        for receta_id in con_elaborados:
+            unidades, limitante = self._producibles_con_elaborados(estructura, receta_id, stock, disponibles)
+            resultado[receta_id] = Producibilidad(receta_id, unidades, limitante, nombres.get(limitante))
+        return resultado
+
+    def _producibles_con_elaborados(self, estructura: EstructuraRecetas, receta_id: int, stock: dict, disponibles: dict):
+        """
+        Máximo de unidades de una receta descontando primero el stock elaborado de sus subrecetas:
+        búsqueda exponencial y luego binaria sobre `explotar`. Devuelve (unidades, ingrediente_limitante_id).
+        """
+        def escasos(unidades):
+            _, _, materias = estructura.explotar({receta_id: unidades}, disponibles)
+            return {producto_id: cantidad for producto_id, cantidad in materias.items() if cantidad > stock.get(producto_id, 0)}
+
+        alcanza, no_alcanza = 0, 1
+        while not escasos(no_alcanza):
+            if no_alcanza >= self.MAXIMO_PRODUCIBLE:
+                return no_alcanza, None
+            alcanza, no_alcanza = no_alcanza, no_alcanza * 2
+        while no_alcanza - alcanza > 1:
+            medio = (alcanza + no_alcanza) // 2
+            if escasos(medio):
+                no_alcanza = medio
+            else:
+                alcanza = medio
+        # El ingrediente limitante es el que menos cubre de la primera unidad que ya no alcanza
+        faltan = escasos(no_alcanza)
+        limitante = min(sorted(faltan), key=lambda producto_id: max(0, stock.get(producto_id, 0)) / faltan[producto_id])
+        return alcanza, limitante
+
+    def faltantes_pedido(self, pedido: dict) -> list:
+        """
+        Materias primas que no alcanzan para un pedido completo (p. ej. un carrito con varias recetas
+        que comparten ingredientes): requerimientos del pedido contra una sola lectura del stock de
+        esos productos. Como en la venta, las subrecetas se toman primero del stock de su producto
+        elaborado y solo lo que falta se expande a materias primas (ver EstructuraRecetas.explotar).
+
+        Args:
+            pedido: {receta_id: unidades (int)}.
+
+        Returns:
+            list: FaltanteMaterial ordenados por producto; vacía si el stock alcanza.
+
+        Raises:
+            ValueError: Si alguna receta del pedido tiene ingredientes con unidades incompatibles.
+        """
+        estructura = self.obtener_estructura()
+        estructura.verificar(pedido)
+        _, _, requerimientos = estructura.explotar(pedido, self.stock_elaborado(estructura, pedido))
+        if not requerimientos:
+            return []
+        ids = sorted(requerimientos)
+        filas = self.db_connection.fetch_all(
+            f"SELECT id, nombre_producto, unidad, cantidad FROM productos WHERE id IN ({', '.join(['%s'] * len(ids))})",
+            ids
+        )
+        datos = {fila[0]: fila for fila in filas}
+        faltantes = []
+        for producto_id in ids:
+            requerido = requerimientos[producto_id]
+            nombre, unidad, cantidad = datos[producto_id][1:] if producto_id in datos else (f"ID {producto_id}", None, 0)
+            disponible = Cantidad.desde_decimal(cantidad)
+            if requerido > disponible:
+                faltantes.append(FaltanteMaterial(
+                    producto_id, nombre, unidad, requerido.a_decimal(), disponible.a_decimal(),
+                    Cantidad(requerido - disponible).a_decimal()
+                ))
+        return faltantes
+
+    def es_unidad_de_conteo(self, unidad: str) -> bool:
+        """True si `unidad` cuenta piezas ('unidad', 'docena'...): las recetas se producen en unidades enteras."""
+        return self.unit_converter.UNIT_TYPES.get(unidad) == 'conteo'
+
+    def obtener_productos_elaborados(self, receta_ids=None, bloquear: bool = False) -> dict:
+        """
+        Productos del inventario con el nombre de cada receta (insensible a mayúsculas, como
+        Productos.obtener_producto_por_nombre): {receta_id: ProductoElaborado}.
+
+        Args:
+            receta_ids: Recetas a consultar (por defecto, todas).
+            bloquear: Volver a leer el stock de esos productos con FOR UPDATE (por clave primaria, en
+                orden de id), para descontarlo en la misma transacción.
+        """
+        query = """
+            SELECT r.id, p.id, p.nombre_producto, p.unidad, p.cantidad
+            FROM recetas r
+            JOIN productos p ON LOWER(p.nombre_producto) = LOWER(r.nombre)
+        """
+        params = None
+        if receta_ids is not None:
+            params = sorted(set(receta_ids))
+            if not params:
+                return {}
+            query += f" WHERE r.id IN ({', '.join(['%s'] * len(params))})"
+        filas = self.db_connection.fetch_all(query, params)
+        if bloquear and filas:
+            producto_ids = sorted({fila[1] for fila in filas})
+            bloqueadas = dict(self.db_connection.fetch_all(
+                f"SELECT id, cantidad FROM productos WHERE id IN ({', '.join(['%s'] * len(producto_ids))}) ORDER BY id FOR UPDATE",
+                producto_ids
+            ))
+            filas = [fila[:4] + (bloqueadas[fila[1]],) for fila in filas if fila[1] in bloqueadas]
+
+        elaborados = {}
+        for receta_id, producto_id, nombre, unidad, cantidad in filas:
+            disponible = None
+            if self.es_unidad_de_conteo(unidad):
+                disponible = Cantidad.desde_decimal(self.unit_converter.convert(a_decimal(cantidad), unidad, 'unidad'))
+            elaborados[receta_id] = ProductoElaborado(receta_id, producto_id, nombre, unidad, disponible)
+        return elaborados
+
+    def stock_elaborado(self, estructura: EstructuraRecetas, pedido, bloquear: bool = False) -> dict:
+        """
+        {receta_id: Cantidad} stock en unidades de receta de los productos elaborados de las subrecetas
+        que usa el pedido (solo los medidos en unidades de conteo y con stock), para `explotar`.
+        """
+        return {receta_id: elaborado.disponible
+                for receta_id, elaborado in self.productos_elaborados_de(estructura, pedido, bloquear).items()
+                if elaborado.disponible is not None and elaborado.disponible > 0}
+
+    def productos_elaborados_de(self, estructura: EstructuraRecetas, pedido, bloquear: bool = False) -> dict:
+        """Productos elaborados de las subrecetas que usa el pedido (sin consultar si no usa ninguna)."""
+        subrecetas = {subreceta_id for receta_id in estructura.subarbol(pedido)
+                      for subreceta_id, _ in estructura.subrecetas.get(receta_id, ())}
+        if not subrecetas:
+            return {}
+        return self.obtener_productos_elaborados(subrecetas, bloquear)
+
+    def recetas_afectadas(self, producto_ids) -> set:
+        """
+        Recetas cuyas unidades vendibles pueden cambiar si cambia el stock de los productos: las que
+        los usan como ingrediente y las que usan como subreceta la receta de la que son el producto elaborado.
+        """
+        estructura = self.obtener_estructura()
+        producto_ids = set(producto_ids)
+        if not producto_ids:
+            return set()
+        elaboradas = ()
+        if estructura.subrecetas:
+            ids = sorted(producto_ids)
+            elaboradas = [fila[0] for fila in self.db_connection.fetch_all(f"""
+                SELECT r.id
+                FROM recetas r
+                JOIN productos p ON LOWER(p.nombre_producto) = LOWER(r.nombre)
+                WHERE p.id IN ({', '.join(['%s'] * len(ids))})
+            """, ids)]
+        return estructura.afectadas_por(producto_ids, elaboradas)
+
+    def invalidar_matriz_bom(self, receta_id: int = None) -> None:
+        """
+        Descarta la composición de las recetas (y con ella la matriz de materiales y los costos
+        memoizados) para que se reconstruya en el próximo uso.
+        Si hay una transacción en curso se descarta también al confirmarla, para no conservar
+        una matriz construida antes de que los cambios fueran visibles. Al confirmar se publica
+        RecetaActualizada(receta_id) (None si cambiaron varias o no se sabe cuál).
+        """
+        self._estructura = None
+        self.db_connection.al_confirmar(self._descartar_estructura)
+        publicar_al_confirmar(self.db_connection, RecetaActualizada(receta_id))
+
+    def _descartar_estructura(self, evento=None):
+        self._estructura = None
+
+    def agregar_subreceta_a_receta(self, receta_id: int, subreceta_id: int, cantidad: Decimal) -> None:
+        """
+        Usa otra receta como ingrediente (`cantidad` unidades de la subreceta por unidad de la receta).
+        Rechaza la relación si crearía un ciclo (p. ej. A usa B y B usa A).
+        Este método NO hace commit. Se espera que el llamador maneje la transacción.
+        """
+        if not isinstance(receta_id, int) or receta_id <= 0:
+            raise ValueError("El ID de la receta debe ser un entero positivo.")
+        if not isinstance(subreceta_id, int) or subreceta_id <= 0:
+            raise ValueError("El ID de la subreceta debe ser un entero positivo.")
+        if not isinstance(cantidad, Decimal) or cantidad <= Decimal('0'):
+            raise ValueError("La cantidad de la subreceta debe ser un número decimal positivo.")
+
+        conn = self.db_connection.get_connection()
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            # La verificación y el INSERT deben ser atómicos frente a otras terminales: si dos
+            # transacciones agregan A->B y B->A a la vez con lecturas sin bloqueo, ambas pasan y
+            # la estructura queda con un ciclo. Se bloquean las dos recetas (serializa el caso
+            # directo) y todas las relaciones existentes (serializa ciclos a través de otras
+            # recetas); las lecturas con bloqueo ven además los últimos datos confirmados.
+            cursor.execute(
+                "SELECT id FROM recetas WHERE id IN (%s, %s) ORDER BY id FOR UPDATE",
+                (receta_id, subreceta_id)
+            )
+            cursor.fetchall()
+            cursor.execute("SELECT receta_id, subreceta_id FROM receta_subrecetas FOR UPDATE")
+            dependencias = {}
+            for padre, hija in cursor.fetchall():
+                dependencias.setdefault(padre, []).append(hija)
+            if crearia_ciclo(dependencias, receta_id, subreceta_id):
+                raise ValueError(f"La receta ID {subreceta_id} ya usa (directa o indirectamente) la receta ID {receta_id}; se formaría un ciclo.")
+
+            query = """
+                INSERT INTO receta_subrecetas (receta_id, subreceta_id, cantidad)
+                VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE cantidad = VALUES(cantidad)
+            """
+            cursor.execute(query, (receta_id, subreceta_id, redondear_cantidad(cantidad)))
+            self.invalidar_matriz_bom(receta_id)
+            # No commit aquí
+        except Error as e:
+            raise e
+        except ValueError as e:
+            raise e
+        finally:
+            if cursor: cursor.close()
+
+    def eliminar_subreceta_de_receta(self, receta_id: int, subreceta_id: int) -> None:
+        """
+        Quita una subreceta de una receta.
+        Este método NO hace commit. Se espera que el llamador maneje la transacción.
+        """
+        if not isinstance(receta_id, int) or receta_id <= 0:
+            raise ValueError("El ID de la receta debe ser un entero positivo.")
+        if not isinstance(subreceta_id, int) or subreceta_id <= 0:
+            raise ValueError("El ID de la subreceta debe ser un entero positivo.")
+
+        conn = self.db_connection.get_connection()
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                "DELETE FROM receta_subrecetas WHERE receta_id = %s AND subreceta_id = %s",
+                (receta_id, subreceta_id)
+            )
+            self.invalidar_matriz_bom(receta_id)
+            # No commit aquí
+        except Error as e:
+            raise e
+        finally:
+            if cursor: cursor.close()
+
+    def obtener_subrecetas_de_receta(self, receta_id: int) -> list:
+        """Obtiene las subrecetas de una receta: tuplas (subreceta_id, nombre, cantidad)."""
+        return self.db_connection.fetch_all("""
+            SELECT rs.subreceta_id, r.nombre, rs.cantidad
+            FROM receta_subrecetas rs
+            JOIN recetas r ON rs.subreceta_id = r.id
+            WHERE rs.receta_id = %s
+            ORDER BY r.nombre
+        """, (receta_id,))
 
     def obtener_nombres_recetas(self) -> list:
         """Devuelve una lista de nombres de recetas registradas (para Combobox)."""
         results = self.db_connection.fetch_all("SELECT id, nombre FROM recetas ORDER BY nombre")
         return [f"{row[0]} - {row[1]}" for row in results]
 
-    def obtener_receta_por_nombre(self, nombre_receta: str) -> dict:
+    def obtener_receta_por_nombre(self, nombre_receta: str) -> Receta:
         """Obtiene una receta por su nombre (insensible a mayúsculas)."""
-        result = self.db_connection.fetch_one("SELECT id, nombre, categoria, precio_venta, costo_mano_obra_total FROM recetas WHERE LOWER(nombre) = LOWER(%s)", (nombre_receta,))
-        if result:
-            column_names = ["id", "nombre", "categoria", "precio_venta", "costo_mano_obra_total"]
-            receta_dict = dict(zip(column_names, result))
-            receta_dict['precio_venta'] = Decimal(str(receta_dict['precio_venta']))
-            receta_dict['costo_mano_obra_total'] = Decimal(str(receta_dict['costo_mano_obra_total']))
-            return receta_dict
-        return None
+        return self.db_connection.fetch_one(
+            "SELECT id, nombre, categoria, precio_venta, costo_mano_obra_total FROM recetas WHERE LOWER(nombre) = LOWER(%s)",
+            (nombre_receta,),
+            modelo=Receta
+        )
 
-    def calcular_costo_receta(self, receta_id: int, productos_manager) -> Decimal:
+    def calcular_costo_receta(self, receta_id: int, productos_manager=None) -> Decimal:
         """
-        Calcula el costo actualizado de una receta basado en precios vigentes de ingredientes.
+        Calcula el costo actualizado de materiales de una receta (por unidad) con los precios vigentes
+        de los ingredientes, incluyendo el costo (materiales y mano de obra) de sus subrecetas.
+        Los costos se memoizan en `self.costeo`: solo se recalculan las recetas afectadas por los
+        productos cuyo costo cambió desde la última llamada.
         """
         if not isinstance(receta_id, int) or receta_id <= 0:
             raise ValueError("El ID de la receta debe ser un entero positivo.")
 
-        # Obtener todos los ingredientes de la receta con sus unidades base
-        # Usamos obtener_ingredientes_de_receta que ya trae la unidad_base_ingrediente
-        ingredientes = self.obtener_ingredientes_de_receta(receta_id)
-        
-        costo_total = Decimal('0.00')
-        
-        for ingrediente in ingredientes:
-            ingrediente_id = ingrediente['ingrediente_id']
-            cantidad_receta = ingrediente['cantidad'] # Cantidad en la unidad de la receta
-            unidad_receta = ingrediente['unidad'] # Unidad en la que se define en la receta
-            unidad_base_ingrediente = ingrediente['unidad_base_ingrediente'] # Unidad base del producto en inventario
-
-            # Obtener el costo promedio del ingrediente
-            costo_promedio_ingrediente = productos_manager.obtener_costo_promedio(ingrediente_id)
-            
-            try:
-                # Convertir cantidad de la receta a la unidad base del ingrediente
-                cantidad_en_base = self.unit_converter.convert(
-                    cantidad_receta,
-                    unidad_receta,
-                    unidad_base_ingrediente
-                )
-                
-                # Calcular costo proporcional
-                costo_total += cantidad_en_base * costo_promedio_ingrediente
-            except Exception as e:
-                # print(f"Error al convertir o calcular costo para ingrediente {ingrediente['nombre_ingrediente']}: {e}")
-                # Si hay un error en la conversión, se puede optar por ignorar este ingrediente o lanzar un error.
-                # Aquí, relanzamos para que el llamador sepa que el cálculo no fue completo.
-                raise ValueError(f"Error al calcular costo para ingrediente '{ingrediente['nombre_ingrediente']}': {str(e)}")
-        
-        return costo_total
+        try:
+            self.costeo.actualizar()
+        except ValueError as e:
+            raise ValueError(f"Error al calcular costo de la receta {receta_id}: {str(e)}")
+        return self.costeo.costo(receta_id)
+
+    def calcular_costos_recetas(self) -> dict:
+        """Costo de materiales por unidad de todas las recetas ({receta_id: Decimal}), en una sola pasada."""
+        self.costeo.actualizar()
+        return self.costeo.costos()
 
     def obtener_analisis_costos(self, categoria: str = None) -> list:
         """
@@ -252,14 +544,7 @@ class RecetasManager:
             categoria (str): Filtra por categoría específica (None para todas)
             
         Returns:
-            list: Lista de dictos con {
-                'id': int,
-                'nombre': str,
-                'categoria': str,
-                'costo': Decimal,
-                'precio': Decimal,
-                'ingredientes': int
-            }
+            list: Lista de Receta (id, nombre, categoria, precio_venta, costo_mano_obra_total)
         """
         # Esta consulta es una simplificación y asume que el costo promedio se puede calcular
         # directamente de total_invertido / cantidad.
@@ -307,36 +592,9 @@ class RecetasManager:
             
         query += " ORDER BY r.nombre"
         
-        results = self.db_connection.fetch_all(query, params)
-        
-        recetas_con_costo = []
-        column_names = ["id", "nombre", "categoria", "precio_venta", "costo_mano_obra_total"]
-        
-        # Para cada receta, calcular el costo real usando el método Python
-        for row in results:
-            receta_dict = dict(zip(column_names, row))
-            receta_id = receta_dict['id']
-            try:
-                # Aquí es donde se llama al cálculo preciso del costo
-                # Necesitamos una instancia de Productos para esto, que se pasará desde la GUI
-                # o se instanciará aquí si es necesario.
-                # Para evitar un acoplamiento circular, este método no debería instanciar Productos.
-                # La GUI de ControlCostos ya tiene acceso a ProductosManager.
-                # Por lo tanto, este método solo devolverá los datos de la receta.
-                # El cálculo del costo total de ingredientes se hará en la GUI.
-                
-                # Convertir a Decimal
-                receta_dict['precio_venta'] = Decimal(str(receta_dict['precio_venta']))
-                receta_dict['costo_mano_obra_total'] = Decimal(str(receta_dict['costo_mano_obra_total']))
-                
-                recetas_con_costo.append(receta_dict)
-            except Exception as e:
-                # print(f"Error al procesar receta {receta_id} para análisis de costos: {e}")
-                # Si hay un error en el cálculo del costo de una receta, se puede omitir o registrar.
-                # Aquí, simplemente se omite del reporte.
-                pass
-        
-        return recetas_con_costo
+        # Solo se devuelven los datos de la receta; el costo real de ingredientes
+        # se calcula en la GUI con calcular_costo_receta.
+        return self.db_connection.fetch_all(query, params, modelo=Receta)
 
     def actualizar_precio_receta(self, receta_id: int, nuevo_precio: Decimal) -> None:
         """
@@ -354,8 +612,9 @@ class RecetasManager:
             cursor = conn.cursor()
             cursor.execute(
                 "UPDATE recetas SET precio_venta = %s WHERE id = %s",
-                (nuevo_precio, receta_id)
+                (redondear_dinero(nuevo_precio), receta_id)
             )
+            publicar_al_confirmar(self.db_connection, RecetaActualizada(receta_id))
             # No commit aquí
         except Error as e:
             # print(f"Error al actualizar precio: {str(e)}")
@@ -388,7 +647,7 @@ class RecetasManager:
                 INSERT INTO receta_trabajadores (receta_id, nombre_trabajador, pago)
                 VALUES (%s, %s, %s)
             """
-            cursor.execute(query, (receta_id, nombre_trabajador, pago))
+            cursor.execute(query, (receta_id, nombre_trabajador, redondear_dinero(pago)))
             # No commit aquí
         except Error as e:
             raise e
@@ -408,7 +667,7 @@ class RecetasManager:
         column_names = ["id", "nombre_trabajador", "pago"]
         for row in results:
             trabajador_dict = dict(zip(column_names, row))
-            trabajador_dict['pago'] = Decimal(str(trabajador_dict['pago']))
+            trabajador_dict['pago'] = a_decimal(trabajador_dict['pago'])
             trabajadores_list.append(trabajador_dict)
         return trabajadores_list
 
@@ -451,7 +710,7 @@ class RecetasManager:
             cursor = conn.cursor()
             cursor.execute(
                 "UPDATE receta_trabajadores SET pago = %s WHERE id = %s",
-                (nuevo_pago, trabajador_id)
+                (redondear_dinero(nuevo_pago), trabajador_id)
             )
             # No commit aquí
         except Error as e:
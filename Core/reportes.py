@@ -3,12 +3,15 @@ from mysql.connector import Error
 from Core.recetas import RecetasManager # CAMBIO: Importar RecetasManager
 from Core.productos import Productos
 from decimal import Decimal
+from Core.decimal_utils import a_decimal, redondear_dinero
+from Core.modelos import Dashboard
 
 class Reportes:
-    def __init__(self, db_connection):
+    def __init__(self, db_connection, recetas_manager: RecetasManager = None, productos_manager: Productos = None):
         self.db_connection = db_connection
-        self.recetas_manager = RecetasManager(db_connection) # CAMBIO: Usar RecetasManager
-        self.productos_manager = Productos(db_connection)
+        # Se reutilizan los managers compartidos si se inyectan (ver Core.service_registry)
+        self.recetas_manager = recetas_manager or RecetasManager(db_connection)
+        self.productos_manager = productos_manager or Productos(db_connection)
 
     def calcular_costo_por_unidad(self, receta_id): # CAMBIO: receta_id
         """Calcula el costo por unidad de una receta basado en sus ingredientes."""
@@ -27,33 +30,25 @@ class Reportes:
     def calcular_ganancia_por_unidad(self, receta_id, precio_venta): # CAMBIO: receta_id
         """Calcula la ganancia por unidad de una receta."""
         costo_por_unidad = self.calcular_costo_por_unidad(receta_id)
-        ganancia = Decimal(str(precio_venta)) - costo_por_unidad
+        ganancia = a_decimal(precio_venta) - costo_por_unidad
         return ganancia
 
     def obtener_ventas_por_producto(self):
         try:
-            conn = self.db_connection.get_connection()
-            cursor = conn.cursor()
-            # CAMBIO: Unir con la tabla 'recetas' en lugar de 'productos' para ventas de recetas
-            cursor.execute("""
+            return self.db_connection.fetch_all("""
                 SELECT r.nombre, SUM(v.cantidad_vendida) as total_vendido, SUM(v.precio_venta * v.cantidad_vendida) as total_ingresos
                 FROM ventas v
                 JOIN recetas r ON v.producto_id = r.id
                 GROUP BY r.id
                 ORDER BY total_ingresos DESC
             """)
-            return cursor.fetchall()
         except Error as e:
             print(f"Error al obtener ventas por producto: {e}")
             return None
-        finally:
-            if cursor: cursor.close()
 
     def obtener_clientes_top(self):
         try:
-            conn = self.db_connection.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
+            return self.db_connection.fetch_all("""
                 SELECT v.cliente_nombre, COUNT(v.id) as total_compras, SUM(v.precio_venta * v.cantidad_vendida) as total_gastado
                 FROM ventas v
                 WHERE v.cliente_nombre IS NOT NULL AND v.cliente_nombre != ''
@@ -61,36 +56,27 @@ class Reportes:
                 ORDER BY total_gastado DESC
                 LIMIT 10
             """)
-            return cursor.fetchall()
         except Error as e:
             print(f"Error al obtener clientes top: {e}")
             return None
-        finally:
-            if cursor: cursor.close()
 
     def obtener_productos_bajo_stock(self):
+        """Productos debajo de su stock mínimo: (nombre_producto, stock_minimo, cantidad, id)."""
         try:
-            conn = self.db_connection.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT nombre_producto, stock_minimo, cantidad
+            return self.db_connection.fetch_all("""
+                SELECT nombre_producto, stock_minimo, cantidad, id
                 FROM productos
                 WHERE cantidad < stock_minimo
                 ORDER BY nombre_producto
             """)
-            return cursor.fetchall()
         except Error as e:
             print(f"Error al obtener productos bajo stock: {e}")
             return None
-        finally:
-            if cursor: cursor.close()
 
     def obtener_ventas_semanales(self):
         """Obtiene las ventas de los últimos 7 días"""
         try:
-            conn = self.db_connection.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
+            return self.db_connection.fetch_all("""
                 SELECT DATE(v.fecha_venta) as fecha, 
                        COALESCE(SUM(v.precio_venta * v.cantidad_vendida), 0) as total
                 FROM ventas v
@@ -98,19 +84,14 @@ class Reportes:
                 GROUP BY DATE(v.fecha_venta)
                 ORDER BY fecha
             """)
-            return cursor.fetchall()
         except Error as e:
             print(f"Error al obtener ventas semanales: {e}")
             return None
-        finally:
-            if cursor: cursor.close()
 
     def obtener_ganancias_por_receta(self):
         """Obtiene las ganancias por receta"""
         try:
-            conn = self.db_connection.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
+            return self.db_connection.fetch_all("""
                 SELECT r.nombre,
                        COALESCE(SUM(v.cantidad_vendida), 0) as cantidad_vendida,
                        COALESCE(SUM(v.precio_venta * v.cantidad_vendida), 0) as ingresos,
@@ -126,46 +107,68 @@ class Reportes:
                 GROUP BY r.id, r.nombre, r.costo_mano_obra_total
                 ORDER BY ingresos DESC
             """)
-            return cursor.fetchall()
         except Error as e:
             print(f"Error al obtener ganancias por receta: {e}")
             return None
-        finally:
-            if cursor: cursor.close()
 
     def obtener_total_ventas(self):
         """Obtiene el total de ventas"""
         try:
-            conn = self.db_connection.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
+            result = self.db_connection.fetch_one("""
                 SELECT COALESCE(SUM(v.precio_venta * v.cantidad_vendida), 0)
                 FROM ventas v
             """)
-            result = cursor.fetchone()
-            return result[0] if result and result[0] is not None else 0
+            return redondear_dinero(result[0]) if result and result[0] is not None else 0
         except Error as e:
             print(f"Error al obtener total de ventas: {e}")
             return 0
-        finally:
-            if cursor: cursor.close()
 
     def obtener_total_costos(self):
         """Obtiene el total de costos"""
         try:
-            conn = self.db_connection.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
+            result = self.db_connection.fetch_one("""
                 SELECT COALESCE(SUM(ri.cantidad * p.total_invertido / p.cantidad), 0)
                 FROM ventas v
                 JOIN recetas r ON v.producto_id = r.id
                 JOIN receta_ingredientes ri ON r.id = ri.receta_id
                 JOIN productos p ON ri.ingrediente_id = p.id
             """)
-            result = cursor.fetchone()
-            return result[0] if result and result[0] is not None else 0
+            return redondear_dinero(result[0]) if result and result[0] is not None else 0
         except Error as e:
             print(f"Error al obtener total de costos: {e}")
             return 0
-        finally:
-            if cursor: cursor.close()
+
+    def cargar_dashboard(self, autoconsumo_manager=None) -> Dashboard:
+        """
+        Carga todos los datos del panel de flujo de caja en un único resultado.
+
+        Las consultas se ejecutan en secuencia dentro de un mismo snapshot (Database.snapshot):
+        todos los totales corresponden al mismo instante, aunque se estén registrando ventas,
+        y se usa una sola conexión del pool.
+
+        Args:
+            autoconsumo_manager: Manager de autoconsumo para el total de autoconsumo (opcional).
+        Returns:
+            Dashboard con totales (Decimal) y las filas de cada gráfico.
+        """
+        tareas = {
+            'total_ventas': self.obtener_total_ventas,
+            'total_costos': self.obtener_total_costos,
+            'total_autoconsumo': (autoconsumo_manager.obtener_total_costo_autoconsumo
+                                  if autoconsumo_manager else (lambda: Decimal('0.00'))),
+            'ventas_semanales': self.obtener_ventas_semanales,
+            'ganancias_por_receta': self.obtener_ganancias_por_receta,
+            'ventas_por_producto': self.obtener_ventas_por_producto,
+        }
+
+        with self.db_connection.snapshot():
+            resultados = {clave: tarea() for clave, tarea in tareas.items()}
+
+        return Dashboard(
+            a_decimal(resultados['total_ventas']),
+            a_decimal(resultados['total_costos']),
+            a_decimal(resultados['total_autoconsumo']),
+            resultados['ventas_semanales'] or [],
+            resultados['ganancias_por_receta'] or [],
+            resultados['ventas_por_producto'] or [],
+        )
@@ -0,0 +1,152 @@
+import unicodedata
+from bisect import bisect_left, insort
+from collections import defaultdict
+from heapq import nsmallest
+
+
+def normalizar_texto(texto) -> str:
+    """
+    Normaliza un texto para búsquedas: minúsculas, sin acentos ni espacios sobrantes.
+    Ej: '  Azúcar Glass ' -> 'azucar glass'
+    """
+    if texto is None:
+        return ""
+    descompuesto = unicodedata.normalize('NFKD', str(texto).strip().lower())
+    return "".join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+class SearchIndex:
+    """
+    Índice en memoria para búsquedas por prefijo y subcadena sobre nombres.
+
+    Los nombres se guardan ya normalizados (minúsculas y sin acentos) y se indexan
+    por trigramas, de modo que cada búsqueda solo verifica los candidatos que
+    comparten todos los trigramas del texto buscado en lugar de recorrer toda la lista.
+    Los resultados que empiezan por el texto buscado aparecen primero.
+    """
+
+    TAMANO_NGRAMA = 3
+
+    def __init__(self, elementos=None):
+        """
+        Args:
+            elementos: Iterable de tuplas (id, nombre) con las que construir el índice.
+        """
+        self.reconstruir(elementos or [])
+
+    def reconstruir(self, elementos):
+        """Vuelve a construir el índice completo a partir de tuplas (id, nombre)."""
+        self._nombres = {}         # id -> nombre original
+        self._normalizados = {}    # id -> nombre normalizado
+        self._exactos = {}         # nombre normalizado -> id
+        self._ngramas = defaultdict(set)
+        self._ordenados = []       # lista ordenada de (nombre normalizado, id)
+        for elemento_id, nombre in elementos:
+            self._ordenados.append((self._indexar(elemento_id, nombre), elemento_id))
+        self._ordenados.sort()
+
+    def _ngramas_de(self, texto: str) -> set:
+        n = self.TAMANO_NGRAMA
+        return {texto[i:i + n] for i in range(len(texto) - n + 1)}
+
+    def _indexar(self, elemento_id, nombre):
+        normalizado = normalizar_texto(nombre)
+        self._nombres[elemento_id] = nombre
+        self._normalizados[elemento_id] = normalizado
+        self._exactos[normalizado] = elemento_id
+        for ngrama in self._ngramas_de(normalizado):
+            self._ngramas[ngrama].add(elemento_id)
+        return normalizado
+
+    def agregar(self, elemento_id, nombre):
+        """Agrega (o reemplaza) un elemento sin reconstruir el índice."""
+        if elemento_id in self._nombres:
+            self.eliminar(elemento_id)
+        insort(self._ordenados, (self._indexar(elemento_id, nombre), elemento_id))
+
+    def eliminar(self, elemento_id):
+        """Quita un elemento del índice si existe."""
+        normalizado = self._normalizados.pop(elemento_id, None)
+        if normalizado is None:
+            return
+        del self._nombres[elemento_id]
+        if self._exactos.get(normalizado) == elemento_id:
+            del self._exactos[normalizado]
+        for ngrama in self._ngramas_de(normalizado):
+            ids = self._ngramas.get(ngrama)
+            if ids is not None:
+                ids.discard(elemento_id)
+                if not ids:
+                    del self._ngramas[ngrama]
+        posicion = bisect_left(self._ordenados, (normalizado, elemento_id))
+        if posicion < len(self._ordenados) and self._ordenados[posicion] == (normalizado, elemento_id):
+            del self._ordenados[posicion]
+
+    def __len__(self):
+        return len(self._nombres)
+
+    def nombre(self, elemento_id):
+        """Devuelve el nombre original de un elemento, o None si no está indexado."""
+        return self._nombres.get(elemento_id)
+
+    def exacto(self, texto):
+        """Devuelve el id del elemento cuyo nombre coincide exactamente (sin distinguir mayúsculas ni acentos)."""
+        return self._exactos.get(normalizar_texto(texto))
+
+    def _coincidencias(self, consulta: str):
+        """Devuelve los ids cuyo nombre normalizado contiene la consulta (ya normalizada)."""
+        if len(consulta) < self.TAMANO_NGRAMA:
+            # Consultas muy cortas: recorrido directo sobre los nombres ya normalizados
+            return [elemento_id for normalizado, elemento_id in self._ordenados if consulta in normalizado]
+
+        conjuntos = []
+        for ngrama in self._ngramas_de(consulta):
+            ids = self._ngramas.get(ngrama)
+            if not ids:
+                return []
+            conjuntos.append(ids)
+        conjuntos.sort(key=len)
+        candidatos = conjuntos[0].intersection(*conjuntos[1:])
+        # Los trigramas pueden aparecer en otro orden, así que se confirma la subcadena
+        return [elemento_id for elemento_id in candidatos if consulta in self._normalizados[elemento_id]]
+
+    def buscar(self, texto, limite: int = 50) -> list:
+        """
+        Busca elementos cuyo nombre contenga el texto dado.
+
+        Args:
+            texto: Texto a buscar (se normaliza igual que los nombres).
+            limite: Cantidad máxima de resultados (None para no limitar).
+        Returns:
+            Lista de tuplas (id, nombre). Primero las coincidencias por prefijo y luego
+            el resto, ambas en orden alfabético.
+        """
+        consulta = normalizar_texto(texto)
+        if not consulta:
+            return []
+
+        # Coincidencias por prefijo: rango contiguo de la lista ordenada
+        resultados = []
+        posicion = bisect_left(self._ordenados, (consulta,))
+        while posicion < len(self._ordenados) and self._ordenados[posicion][0].startswith(consulta):
+            resultados.append(self._ordenados[posicion][1])
+            posicion += 1
+            if limite is not None and len(resultados) >= limite:
+                return [(elemento_id, self._nombres[elemento_id]) for elemento_id in resultados]
+
+        en_prefijo = set(resultados)
+        resto = ((self._normalizados[elemento_id], elemento_id)
+                 for elemento_id in self._coincidencias(consulta) if elemento_id not in en_prefijo)
+        if limite is None:
+            resto = sorted(resto)
+        else:
+            resto = nsmallest(limite - len(resultados), resto)
+        resultados.extend(elemento_id for _, elemento_id in resto)
+        return [(elemento_id, self._nombres[elemento_id]) for elemento_id in resultados]
+
+    def buscar_ids(self, texto) -> set:
+        """Devuelve el conjunto de ids que coinciden con el texto, sin orden ni límite."""
+        consulta = normalizar_texto(texto)
+        if not consulta:
+            return set(self._nombres)
+        return set(self._coincidencias(consulta))
@@ -0,0 +1,71 @@
+from Core.UnitConverter import UnitConverter
+from Core.productos import Productos
+from Core.compras import Compras
+from Core.produccion import Produccion
+from Core.recetas import RecetasManager
+from Core.ventas import Ventas
+from Core.clientes import Clientes
+from Core.autoconsumo import Autoconsumo
+from Core.reportes import Reportes
+from Core.inversiones import Inversiones
+from Core.inventario import Inventario
+from Core.pronostico import PronosticoDemanda
+from Core.reabastecimiento import Reabastecimiento
+from Core.planificacion import PlanificadorProduccion
+from Core.cambios import MonitorCambios
+
+
+class ServiceRegistry:
+    """
+    Registro único de managers de la aplicación.
+
+    Cada manager se construye una sola vez (la primera vez que se pide) y recibe
+    las dependencias compartidas del registro: la misma conexión, el mismo
+    `UnitConverter` y las mismas instancias de `Productos` y `RecetasManager`.
+    Así, cualquier estado en memoria de un manager (p. ej. el índice de búsqueda
+    de productos) es el mismo para todas las páginas.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.unit_converter = UnitConverter()
+        self._instancias = {}
+        self._fabricas = {
+            'productos': lambda: Productos(self.db),
+            'recetas': lambda: RecetasManager(self.db, unit_converter=self.unit_converter),
+            'compras': lambda: Compras(self.db, self['productos'], unit_converter=self.unit_converter),
+            'produccion': lambda: Produccion(self.db, productos_manager=self['productos'],
+                                             unit_converter=self.unit_converter,
+                                             recetas_manager=self['recetas']),
+            'ventas': lambda: Ventas(self.db, recetas_manager=self['recetas'],
+                                     productos_manager=self['productos']),
+            'reportes': lambda: Reportes(self.db, recetas_manager=self['recetas'],
+                                         productos_manager=self['productos']),
+            'clientes': lambda: Clientes(self.db),
+            'autoconsumo': lambda: Autoconsumo(self.db, productos_manager=self['productos']),
+            'inversiones': lambda: Inversiones(self.db, inventario=self['inventario']),
+            'inventario': lambda: Inventario(self.db),
+            'pronostico': lambda: PronosticoDemanda(self.db),
+            'reabastecimiento': lambda: Reabastecimiento(self.db, self['recetas'], self['pronostico']),
+            'planificacion': lambda: PlanificadorProduccion(self.db, self['recetas'], self['produccion']),
+            'monitor_cambios': lambda: MonitorCambios(self.db),
+        }
+
+    def obtener(self, clave: str):
+        """Devuelve el manager registrado con `clave`, construyéndolo si aún no existe."""
+        if clave not in self._instancias:
+            fabrica = self._fabricas.get(clave)
+            if fabrica is None:
+                raise KeyError(f"No hay ningún manager registrado como '{clave}'.")
+            self._instancias[clave] = fabrica()
+        return self._instancias[clave]
+
+    __getitem__ = obtener
+
+    def __contains__(self, clave):
+        return clave in self._fabricas
+
+    def inicializar(self, *claves):
+        """Construye por adelantado los managers indicados (todos si no se indica ninguno)."""
+        for clave in claves or self._fabricas:
+            self.obtener(clave)
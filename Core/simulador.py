@@ -0,0 +1,137 @@
+"""
+Simulador de márgenes ante cambios de precio de las materias primas.
+
+Toma la matriz de materiales expandida (recetas × ingredientes en unidades base, ver
+Core.costeo) como una matriz de NumPy y evalúa cientos de escenarios de precios a la vez:
+los costos de todas las recetas en todos los escenarios son un único producto de matrices
+
+    costos (escenarios × recetas) = precios (escenarios × ingredientes) @ Aᵀ
+
+sin volver a llamar a `calcular_costo_receta` por receta y por escenario. Los resultados
+son aproximaciones en punto flotante pensadas para análisis, no para registrar importes.
+"""
+
+import numpy as np
+from Core.fixed_point import Cantidad
+from Core.modelos import ResumenMargen
+
+_ESCALA_CANTIDAD = 10 ** Cantidad.DECIMALES
+
+
+class SimuladorMargenes:
+    """
+    Evalúa el margen (precio de venta - materiales - mano de obra) de cada receta bajo
+    muchos escenarios de precios de ingredientes.
+
+    Uso:
+        simulador = SimuladorMargenes(recetas_manager)
+        simulador.preparar()
+        factores = simulador.escenarios_aleatorios(500, variacion=0.10, cambios={producto_id: 0.25})
+        resumen = simulador.resumir(simulador.simular(factores))
+    """
+
+    def __init__(self, recetas_manager):
+        self.recetas_manager = recetas_manager
+        self.receta_ids = ()
+        self.ingrediente_ids = ()
+        self.nombres = {}
+        self.matriz = np.zeros((0, 0))         # recetas × ingredientes, unidades base por unidad de receta
+        self.costo_unitario = np.zeros(0)      # costo vigente por unidad base de cada ingrediente
+        self.precio_venta = np.zeros(0)
+        self.mano_obra = np.zeros(0)           # propia más la de las subrecetas usadas
+
+    def preparar(self) -> None:
+        """Carga la composición de las recetas, sus precios y el costo vigente de los ingredientes."""
+        estructura = self.recetas_manager.obtener_estructura()
+        matriz_bom = estructura.matriz
+        db = self.recetas_manager.db_connection
+
+        recetas = {receta.id: receta for receta in self.recetas_manager.obtener_todas_las_recetas()}
+        self.receta_ids = tuple(receta_id for receta_id in recetas if receta_id in matriz_bom)
+        self.ingrediente_ids = matriz_bom.ingrediente_ids
+        self.nombres = {receta_id: recetas[receta_id].nombre for receta_id in self.receta_ids}
+
+        columna_de = {ingrediente_id: j for j, ingrediente_id in enumerate(self.ingrediente_ids)}
+        self.matriz = np.zeros((len(self.receta_ids), len(self.ingrediente_ids)))
+        for i, receta_id in enumerate(self.receta_ids):
+            for ingrediente_id, cantidad in matriz_bom.fila(receta_id):
+                self.matriz[i, columna_de[ingrediente_id]] = int(cantidad) / _ESCALA_CANTIDAD
+
+        self.costo_unitario = np.zeros(len(self.ingrediente_ids))
+        for producto_id, total_invertido, stock in db.fetch_all("SELECT id, total_invertido, cantidad FROM productos"):
+            j = columna_de.get(producto_id)
+            if j is not None and stock and stock > 0:
+                self.costo_unitario[j] = float(total_invertido) / float(stock)
+
+        mano_obra = self._mano_obra_expandida(estructura)
+        self.precio_venta = np.array([float(recetas[r].precio_venta or 0) for r in self.receta_ids])
+        self.mano_obra = np.array([mano_obra.get(r, 0.0) for r in self.receta_ids])
+
+    @staticmethod
+    def _mano_obra_expandida(estructura) -> dict:
+        """Mano de obra por unidad de cada receta incluyendo la de sus subrecetas (en orden topológico)."""
+        total = {}
+        for receta_id in estructura.orden:
+            valor = int(estructura.mano_obra.get(receta_id, 0)) / 100
+            for subreceta_id, cantidad_sub in estructura.subrecetas.get(receta_id, ()):
+                valor += int(cantidad_sub) / _ESCALA_CANTIDAD * total.get(subreceta_id, 0.0)
+            total[receta_id] = valor
+        return total
+
+    def escenarios_aleatorios(self, cantidad: int, variacion: float = 0.10, cambios: dict = None,
+                              semilla: int = None) -> np.ndarray:
+        """
+        Genera factores multiplicativos de precio (escenarios × ingredientes).
+
+        Args:
+            cantidad: Número de escenarios.
+            variacion: Variación aleatoria uniforme de cada precio, ± fracción (0.10 = ±10 %).
+            cambios: {producto_id: fracción} cambio fijo propuesto por proveedor (0.25 = +25 %),
+                     aplicado en todos los escenarios además de la variación aleatoria.
+            semilla: Semilla del generador, para resultados reproducibles.
+        """
+        if cantidad <= 0:
+            raise ValueError("La cantidad de escenarios debe ser un entero positivo.")
+        if variacion < 0:
+            raise ValueError("La variación no puede ser negativa.")
+        generador = np.random.default_rng(semilla)
+        factores = generador.uniform(1 - variacion, 1 + variacion, size=(cantidad, len(self.ingrediente_ids)))
+        columna_de = {ingrediente_id: j for j, ingrediente_id in enumerate(self.ingrediente_ids)}
+        for producto_id, cambio in (cambios or {}).items():
+            j = columna_de.get(producto_id)
+            if j is not None:
+                factores[:, j] *= 1 + cambio
+        return np.clip(factores, 0, None)
+
+    def simular(self, factores: np.ndarray) -> np.ndarray:
+        """
+        Margen por unidad de cada receta en cada escenario.
+
+        Args:
+            factores: (escenarios × ingredientes) multiplicadores sobre el costo vigente.
+
+        Returns:
+            np.ndarray: (escenarios × recetas) margen = precio de venta - materiales - mano de obra.
+        """
+        factores = np.atleast_2d(factores)
+        if factores.shape[1] != len(self.ingrediente_ids):
+            raise ValueError("Los escenarios deben tener un factor por cada ingrediente.")
+        costos = (factores * self.costo_unitario) @ self.matriz.T
+        return self.precio_venta - self.mano_obra - costos
+
+    def margen_actual(self) -> np.ndarray:
+        """Margen por unidad de cada receta con los precios vigentes."""
+        return self.simular(np.ones((1, len(self.ingrediente_ids))))[0]
+
+    def resumir(self, margenes: np.ndarray) -> list:
+        """Resume la distribución de márgenes por receta (lista de ResumenMargen ordenada por nombre)."""
+        actual = self.margen_actual()
+        p5, p50, p95 = np.percentile(margenes, [5, 50, 95], axis=0)
+        medio = margenes.mean(axis=0)
+        perdida = (margenes < 0).mean(axis=0)
+        resumen = [
+            ResumenMargen(receta_id, self.nombres[receta_id], self.precio_venta[i], actual[i],
+                          medio[i], p5[i], p50[i], p95[i], perdida[i])
+            for i, receta_id in enumerate(self.receta_ids)
+        ]
+        return sorted(resumen, key=lambda fila: fila.nombre)
@@ -2,18 +2,28 @@ import mysql.connector
 from mysql.connector import Error
 from datetime import datetime
 from decimal import Decimal
+from Core.database import reintentar_transaccion
+from Core.decimal_utils import redondear_dinero
+from Core.eventos import publicar_al_confirmar, VentaRegistrada
 from Core.productos import Productos
 from Core.recetas import RecetasManager
 
 class Ventas:
-    def __init__(self, db_connection):
+    def __init__(self, db_connection, recetas_manager: RecetasManager = None, productos_manager: Productos = None):
         self.db_connection = db_connection
-        self.recetas_manager = RecetasManager(db_connection)
-        self.productos_manager = Productos(db_connection)
+        # Se reutilizan los managers compartidos si se inyectan (ver Core.service_registry)
+        self.recetas_manager = recetas_manager or RecetasManager(db_connection)
+        self.productos_manager = productos_manager or Productos(db_connection)
 
+    @reintentar_transaccion()
     def registrar_venta(self, receta_vendida_id: int, cantidad_vendida: int, precio_venta: Decimal, cliente_nombre: str = None, cliente_notas: str = None) -> int:
         """
         Registra la venta de un producto final (receta), consumiendo sus materias primas.
+        Las subrecetas se toman primero del stock de su producto elaborado (p. ej. la masa que dejó
+        un plan de producción) y solo lo que falta se consume desde sus materias primas, igual que
+        en Core.planificacion (ver EstructuraRecetas.explotar).
+        Toda la operación es una sola transacción; si choca con otra venta concurrente
+        (deadlock o espera de bloqueo agotada) se reintenta completa.
         """
         # Validaciones iniciales de entrada
         if not isinstance(receta_vendida_id, int) or receta_vendida_id <= 0:
@@ -23,56 +33,57 @@ class Ventas:
         if not isinstance(precio_venta, Decimal) or precio_venta <= Decimal('0'):
             raise ValueError("El precio de venta debe ser un número decimal positivo.")
         
-        # Iniciar la transacción
-        self.db_connection.get_connection() # Asegurarse de que la conexión esté activa
         try:
-            self.db_connection.commit() # Limpiar cualquier transacción pendiente
-        except Error:
-            self.db_connection.rollback() # Si hay una transacción pendiente, revertirla
+            with self.db_connection.transaction():
+                # Convertir receta_vendida_id a entero si viene como "ID - Nombre"
+                if isinstance(receta_vendida_id, str) and ' - ' in receta_vendida_id:
+                    receta_vendida_id = int(receta_vendida_id.split(' - ')[0])
 
-        try:
-            self.db_connection.get_connection().start_transaction() # Iniciar la transacción explícitamente
-
-            # Convertir receta_vendida_id a entero si viene como "ID - Nombre"
-            if isinstance(receta_vendida_id, str) and ' - ' in receta_vendida_id:
-                receta_vendida_id = int(receta_vendida_id.split(' - ')[0])
+                # Composición de la receta (ingredientes y subrecetas, ya en unidades base)
+                estructura = self.recetas_manager.obtener_estructura()
+                estructura.verificar((receta_vendida_id,)) # Solo falla la receta mal cargada, no todas las ventas
+                if receta_vendida_id not in estructura.matriz:
+                    raise ValueError(f"La receta ID {receta_vendida_id} no tiene ingredientes definidos. No se puede vender.")
 
-            # Obtener los ingredientes de la receta vendida
-            ingredientes_receta = self.recetas_manager.obtener_ingredientes_de_receta(receta_vendida_id)
-            if not ingredientes_receta:
-                raise ValueError(f"La receta ID {receta_vendida_id} no tiene ingredientes definidos. No se puede vender.")
-            
-            # Para cada ingrediente en la receta, decrementar el stock de MATERIAS PRIMAS
-            for ingrediente in ingredientes_receta:
-                ingrediente_id = ingrediente['ingrediente_id']
-                cantidad_necesaria_por_unidad_final = Decimal(str(ingrediente['cantidad']))
-                
-                cantidad_total_a_consumir = cantidad_necesaria_por_unidad_final * Decimal(str(cantidad_vendida))
-                
-                # Decrementar el stock de la materia prima
-                self.productos_manager.decrementar_stock(ingrediente_id, cantidad_total_a_consumir)
+                # Registrar la venta primero: su id referencia las salidas en el libro de inventario
+                fecha_actual = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                query = """
+                    INSERT INTO ventas (producto_id, cantidad_vendida, precio_venta, cliente_nombre, cliente_notas, fecha_venta)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                """
+                params = (receta_vendida_id, cantidad_vendida, redondear_dinero(precio_venta), cliente_nombre, cliente_notas, fecha_actual)
+                venta_id = self.db_connection.execute_query(query, params)
 
-            # Registrar la venta en la base de datos
-            fecha_actual = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            query = """
-                INSERT INTO ventas (producto_id, cantidad_vendida, precio_venta, cliente_nombre, cliente_notas, fecha_venta)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """
-            params = (receta_vendida_id, cantidad_vendida, precio_venta, cliente_nombre, cliente_notas, fecha_actual)
-            self.db_connection.execute_query(query, params)
+                # Requerimientos de la venta, exactos en micro-unidades: primero el stock elaborado de las
+                # subrecetas (releído con bloqueo) y lo que falta de ellas desde sus materias primas
+                pedido = {receta_vendida_id: cantidad_vendida}
+                elaborados = self.recetas_manager.productos_elaborados_de(estructura, pedido, bloquear=True)
+                disponibles = {receta_id: e.disponible for receta_id, e in elaborados.items()
+                               if e.disponible is not None and e.disponible > 0}
+                _, usados, requerimientos = estructura.explotar(pedido, disponibles)
+                consumos = {ingrediente_id: cantidad.a_decimal() for ingrediente_id, cantidad in requerimientos.items()}
+                for receta_id, cantidad in usados.items():
+                    elaborado = elaborados[receta_id]
+                    consumos[elaborado.producto_id] = consumos.get(elaborado.producto_id, Decimal('0')) + \
+                        self.recetas_manager.unit_converter.convert(cantidad.a_decimal(), 'unidad', elaborado.unidad)
 
-            self.db_connection.commit() # Confirmar la transacción completa
-            return self.db_connection.cursor.lastrowid
+                # Decrementar el stock de todos los productos en un lote (bloqueo en orden de id,
+                # un UPDATE y un solo evento StockCambiado para toda la venta)
+                self.productos_manager.decrementar_stock_lote(
+                    consumos, tipo_movimiento='venta', referencia_id=venta_id
+                )
+                publicar_al_confirmar(self.db_connection, VentaRegistrada(
+                    venta_id, receta_vendida_id, cantidad_vendida, redondear_dinero(precio_venta)
+                ))
+            return venta_id # La transacción ya se confirmó al salir del bloque
 
+        # El rollback ya lo hizo transaction(); se conserva la causa para el reintento
         except Error as e:
-            self.db_connection.rollback() # Revertir si hay algún error de DB
-            raise Exception(f"Error de base de datos al registrar venta: {str(e)}") # Relanzar como excepción general
+            raise Exception(f"Error de base de datos al registrar venta: {str(e)}") from e # Relanzar como excepción general
         except ValueError as e:
-            self.db_connection.rollback() # Revertir si hay algún error de validación
-            raise ValueError(f"Error de validación al registrar venta: {str(e)}") # Relanzar como ValueError
+            raise ValueError(f"Error de validación al registrar venta: {str(e)}") from e # Relanzar como ValueError
         except Exception as e:
-            self.db_connection.rollback() # Revertir para cualquier otro error inesperado
-            raise Exception(f"Error inesperado al registrar venta: {str(e)}")
+            raise Exception(f"Error inesperado al registrar venta: {str(e)}") from e
 
     def obtener_ventas_por_producto(self) -> list:
         """Obtiene el reporte de ventas por producto."""
@@ -88,11 +88,12 @@ class CashFlowPage(tk.Frame):
     def load_data(self):
         """Carga y muestra los datos financieros"""
         try:
-            # Calcular totales
-            total_ventas = Decimal(str(self.reportes_manager.obtener_total_ventas()))
-            total_costos = Decimal(str(self.reportes_manager.obtener_total_costos()))
-            total_autoconsumo = self.autoconsumo_manager.obtener_total_costo_autoconsumo()
-            total_ganancias = total_ventas - total_costos - total_autoconsumo
+            # Todas las consultas del panel ven el mismo instante (un solo snapshot)
+            dashboard = self.reportes_manager.cargar_dashboard(self.autoconsumo_manager)
+            total_ventas = dashboard.total_ventas
+            total_costos = dashboard.total_costos
+            total_autoconsumo = dashboard.total_autoconsumo
+            total_ganancias = dashboard.total_ganancias
             
             # Actualizar etiquetas de resumen
             self.label_total_ventas.config(text=f"Total Ventas: ${total_ventas:.2f}")
@@ -101,18 +102,19 @@ class CashFlowPage(tk.Frame):
             self.label_total_autoconsumo.config(text=f"Total Autoconsumo: ${total_autoconsumo:.2f}")
             
             # Actualizar gráficos
-            self.update_ventas_chart()
-            self.update_ganancias_chart()
-            self.update_productos_chart()
+            self.update_ventas_chart(dashboard.ventas_semanales)
+            self.update_ganancias_chart(dashboard.ganancias_por_receta)
+            self.update_productos_chart(dashboard.ventas_por_producto)
             
         except Exception as e:
             messagebox.showerror("Error", f"No se pudieron cargar los datos financieros: {str(e)}")
 
-    def update_ventas_chart(self):
+    def update_ventas_chart(self, ventas_diarias_data=None):
         """Actualiza el gráfico de ventas semanales"""
         try:
-            # Obtener ventas de los últimos 7 días
-            ventas_diarias_data = self.reportes_manager.obtener_ventas_semanales()
+            # Obtener ventas de los últimos 7 días (si no se recibieron ya leídas)
+            if ventas_diarias_data is None:
+                ventas_diarias_data = self.reportes_manager.obtener_ventas_semanales()
             
             # Convertir fechas a objetos datetime
             ventas_diarias = []
@@ -198,11 +200,12 @@ class CashFlowPage(tk.Frame):
             print(f"Error al obtener ventas diarias: {e}")
             return []
 
-    def update_ganancias_chart(self):
+    def update_ganancias_chart(self, recetas_data_raw=None):
         """Actualiza el gráfico de ganancias"""
         try:
-            # Obtener datos de ventas y costos por receta
-            recetas_data_raw = self.reportes_manager.obtener_ganancias_por_receta()
+            # Obtener datos de ventas y costos por receta (si no se recibieron ya leídos)
+            if recetas_data_raw is None:
+                recetas_data_raw = self.reportes_manager.obtener_ganancias_por_receta()
             
             # Calcular ganancia neta (ingresos - costos ingredientes - costos mano de obra)
             recetas_data = []
@@ -287,11 +290,12 @@ class CashFlowPage(tk.Frame):
             print(f"Error al obtener datos de recetas: {e}")
             return []
 
-    def update_productos_chart(self):
+    def update_productos_chart(self, productos_data=None):
         """Actualiza el gráfico de productos más vendidos"""
         try:
-            # Obtener productos más vendidos
-            productos_data = self.reportes_manager.obtener_ventas_por_producto()
+            # Obtener productos más vendidos (si no se recibieron ya leídos)
+            if productos_data is None:
+                productos_data = self.reportes_manager.obtener_ventas_por_producto()
             
             # Preparar datos para el gráfico
             nombres = [p[0] for p in productos_data]
@@ -3,12 +3,15 @@ from tkinter import ttk, messagebox
 from decimal import Decimal, InvalidOperation
 from Core.autoconsumo import Autoconsumo
 from Core.productos import Productos
+from Gui.widgets import Debouncer
 
 class GestionAutoconsumo(tk.Frame):
     def __init__(self, parent, autoconsumo_manager, productos_manager):
         super().__init__(parent)
         self.autoconsumo_manager = autoconsumo_manager
         self.productos_manager = productos_manager
+        self.productos_por_id = {} # id -> fila de producto cargada en el combobox
+        self.valores_productos = [] # Todas las opciones "ID - Nombre"
         
         self.create_widgets()
         self.load_productos()
@@ -37,7 +40,8 @@ class GestionAutoconsumo(tk.Frame):
         
         # Selección de producto
         ttk.Label(registro_frame, text="Producto:").grid(row=0, column=0, sticky="w", padx=5, pady=5)
-        self.combo_producto = ttk.Combobox(registro_frame, state="readonly", style="Modern.TCombobox")
+        # Editable para poder escribir y filtrar con el índice compartido de productos
+        self.combo_producto = ttk.Combobox(registro_frame, state="normal", style="Modern.TCombobox")
         self.combo_producto.grid(row=0, column=1, sticky="ew", padx=5, pady=5)
         
         # Cantidad
@@ -106,12 +110,17 @@ class GestionAutoconsumo(tk.Frame):
         
         # Eventos
         self.combo_producto.bind("<<ComboboxSelected>>", self.on_producto_selected)
+        self._filtro_productos_debouncer = Debouncer(self, self.filtrar_productos)
+        self.combo_producto.bind("<KeyRelease>", self._filtro_productos_debouncer)
 
     def load_productos(self):
         """Carga los productos en el combobox"""
         try:
             productos = self.productos_manager.obtener_todos_los_productos()
-            producto_names = [f"{p[0]} - {p[1]}" for p in productos]  # ID - Nombre
+            self.productos_manager.obtener_indice_busqueda(refrescar=True)
+            self.productos_por_id = {p.id: p for p in productos}
+            producto_names = [f"{p.id} - {p.nombre_producto}" for p in productos]  # ID - Nombre
+            self.valores_productos = producto_names
             self.combo_producto['values'] = producto_names
             
             if producto_names:
@@ -121,15 +130,38 @@ class GestionAutoconsumo(tk.Frame):
         except Exception as e:
             messagebox.showerror("Error", f"No se pudieron cargar los productos: {str(e)}")
 
+    def filtrar_productos(self):
+        """Reduce las opciones del combobox a los productos que coinciden con lo escrito."""
+        texto = self.combo_producto.get().strip()
+        if not texto:
+            self.combo_producto['values'] = self.valores_productos
+            return
+        if texto in self.valores_productos:
+            # Ya es una opción completa (p. ej. recién seleccionada)
+            self.on_producto_selected()
+            return
+        indice = self.productos_manager.obtener_indice_busqueda()
+        self.combo_producto['values'] = [f"{producto_id} - {nombre}" for producto_id, nombre in indice.buscar(texto)]
+
+    def _producto_id_seleccionado(self, texto: str) -> int:
+        """Obtiene el ID a partir de una opción "ID - Nombre" o de un nombre escrito completo."""
+        prefijo = texto.split(" - ")[0]
+        if prefijo.isdigit() and int(prefijo) in self.productos_por_id:
+            return int(prefijo)
+        producto_id = self.productos_manager.obtener_indice_busqueda().exacto(texto)
+        if producto_id is None:
+            raise ValueError("Seleccione un producto de la lista.")
+        return producto_id
+
     def on_producto_selected(self, event=None):
         """Actualiza la unidad cuando se selecciona un producto"""
         selected = self.combo_producto.get()
         if selected:
             try:
                 producto_id = int(selected.split(" - ")[0])
-                producto = self.productos_manager.obtener_producto(producto_id)
+                producto = self.productos_por_id.get(producto_id)
                 if producto:
-                    self.label_unidad.config(text=producto[7])  # unidad_display
+                    self.label_unidad.config(text=producto.unidad_display)
             except Exception:
                 self.label_unidad.config(text="")
 
@@ -148,14 +180,16 @@ class GestionAutoconsumo(tk.Frame):
             return
             
         try:
-            producto_id = int(selected.split(" - ")[0])
+            producto_id = self._producto_id_seleccionado(selected)
             cantidad = Decimal(cantidad_str)
             
             if cantidad <= Decimal('0'):
                 raise ValueError("La cantidad debe ser un número positivo.")
                 
-            # Registrar autoconsumo
-            self.autoconsumo_manager.registrar_autoconsumo(producto_id, cantidad, "", motivo)
+            # Registrar autoconsumo (la cantidad se descuenta del stock en la unidad base del producto)
+            producto = self.productos_por_id.get(producto_id)
+            unidad = producto.unidad if producto else self.label_unidad.cget("text")
+            self.autoconsumo_manager.registrar_autoconsumo(producto_id, cantidad, unidad, motivo)
             
             messagebox.showinfo("Éxito", "Autoconsumo registrado correctamente.")
             
@@ -1,25 +1,33 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, simpledialog
 from decimal import Decimal, InvalidOperation
 from Core.UnitConverter import UnitConverter
+from Gui.widgets import Debouncer, SuscripcionEventos
+from Core.eventos import CompraRegistrada
 
 class GestionCompras(tk.Frame):
-    def __init__(self, parent, compras_manager, productos_manager, on_compra_exitosa_callback=None):
+    MAX_SUGERENCIAS = 50 # Máximo de nombres mostrados en el autocompletado
+
+    def __init__(self, parent, compras_manager, productos_manager, unit_converter=None, reabastecimiento=None):
         super().__init__(parent)
         self.compras_manager = compras_manager
         self.productos_manager = productos_manager
-        self.on_compra_exitosa_callback = on_compra_exitosa_callback
-        self.unit_converter = UnitConverter()
+        self.unit_converter = unit_converter or UnitConverter()
+        self.reabastecimiento = reabastecimiento # Motor de sugerencias de compra (opcional)
         
         self.producto_actual_id = None # Para almacenar el ID del producto seleccionado/creado
         self.producto_actual_unidad_base = None # Para almacenar la unidad base del producto
         self.producto_actual_unidad_display = None # Para almacenar la unidad display del producto
+        self.es_producto_nuevo = False # True mientras el formulario está preparado para un producto nuevo
 
         self._create_widgets()
         self._setup_layout()
         self._bind_events()
         self._load_history()
         self._load_product_names_for_autocomplete() # Cargar nombres para autocompletado
+        
+        # Compras registradas (aquí o desde otra página)
+        self.suscripcion_compras = SuscripcionEventos(self, (CompraRegistrada,), lambda eventos: self._load_history())
 
     def _create_widgets(self):
         """Crea todos los widgets de la interfaz"""
@@ -114,6 +122,13 @@ class GestionCompras(tk.Frame):
             command=self._registrar_compra,
             style="Accent.TButton" # Aplicar estilo Accent
         )
+        # Botón para precargar el formulario con una compra sugerida por el punto de reorden
+        self.btn_sugerencias = ttk.Button(
+            self.frm_compra,
+            text="Sugerencias de Compra",
+            command=self._mostrar_sugerencias,
+            style="Modern.TButton"
+        )
         
         # Historial de Compras
         self.frm_historial = ttk.LabelFrame(self.main_frame, text="Historial de Compras (Últimos 7 Días)", padding=10, style="Card.TFrame") # LabelFrame
@@ -198,7 +213,11 @@ class GestionCompras(tk.Frame):
         self.lbl_total_compra_val.grid(row=row_idx, column=1, sticky='w', padx=5, pady=5)
         row_idx += 1
         
-        self.btn_registrar.grid(row=row_idx, column=0, columnspan=4, pady=10)
+        if self.reabastecimiento is not None:
+            self.btn_registrar.grid(row=row_idx, column=0, columnspan=2, pady=10)
+            self.btn_sugerencias.grid(row=row_idx, column=2, columnspan=2, pady=10)
+        else:
+            self.btn_registrar.grid(row=row_idx, column=0, columnspan=4, pady=10)
         
         # Historial
         self.frm_historial.pack(fill='both', expand=True, pady=(20,0))
@@ -218,46 +237,68 @@ class GestionCompras(tk.Frame):
         self.ent_unidades_por_paquete.bind("<KeyRelease>", self._calcular_total_compra)
         
         # Eventos para autocompletado
-        self.ent_nombre_producto.bind("<KeyRelease>", self._on_product_name_change)
+        self._autocomplete_debouncer = Debouncer(self, self._on_product_name_change)
+        self.ent_nombre_producto.bind("<KeyRelease>", self._on_product_name_key)
         self.listbox_autocomplete.bind("<<ListboxSelect>>", self._select_autocomplete)
         self.ent_nombre_producto.bind("<FocusOut>", self._hide_autocomplete_if_not_selected)
         self.listbox_autocomplete.bind("<FocusOut>", self._hide_autocomplete_if_not_selected)
         self.ent_nombre_producto.bind("<Return>", self._select_first_autocomplete_entry) # Seleccionar primera opción con Enter
 
-    def _load_product_names_for_autocomplete(self):
-        """Carga todos los nombres de productos para el autocompletado."""
+    def _load_product_names_for_autocomplete(self, refrescar: bool = False):
+        """Construye por adelantado el índice de nombres de productos compartido para el autocompletado."""
         try:
-            self.all_product_names = self.productos_manager.obtener_nombres_productos()
+            self.productos_manager.obtener_indice_busqueda(refrescar=refrescar)
         except Exception as e:
             messagebox.showerror("Error de Carga", f"No se pudieron cargar los nombres de productos para autocompletado: {str(e)}")
-            self.all_product_names = []
+
+    def _indice_productos(self):
+        """
+        Índice compartido vigente. Se pide en cada búsqueda porque Productos lo descarta con cada
+        ProductoActualizado (de esta u otra terminal) y lo reconstruye en el próximo uso.
+        """
+        try:
+            return self.productos_manager.obtener_indice_busqueda()
+        except Exception as e:
+            print(f"Error al obtener el índice de productos: {e}")
+            return None
+
+    def _on_product_name_key(self, event=None):
+        """Reprograma el autocompletado; las teclas de navegación no lo disparan."""
+        if event is not None and event.keysym in ("Return", "Tab", "Up", "Down", "Left", "Right"):
+            return
+        self._autocomplete_debouncer()
 
     def _on_product_name_change(self, event=None):
         """Maneja el cambio en el campo de nombre de producto para autocompletado."""
-        current_text = self.ent_nombre_producto.get().strip().lower()
+        current_text = self.ent_nombre_producto.get().strip()
         
         if not current_text:
             self.listbox_autocomplete.grid_remove()
             self._reset_producto_fields() # Resetear si el campo está vacío
             return
 
-        matches = [name for name in self.all_product_names if current_text in name.lower()]
+        indice = self._indice_productos()
+        if indice is None:
+            return
+
+        matches = indice.buscar(current_text, limite=self.MAX_SUGERENCIAS)
         
         self.listbox_autocomplete.delete(0, tk.END)
         if matches:
-            for match in matches:
-                self.listbox_autocomplete.insert(tk.END, match)
+            self.listbox_autocomplete.insert(tk.END, *(nombre for _, nombre in matches))
             self.listbox_autocomplete.grid() # Mostrar listbox
             self.listbox_autocomplete.lift() # Asegurarse de que esté encima
         else:
             self.listbox_autocomplete.grid_remove()
         
-        # Si no hay coincidencias o el texto no es un producto existente, preparar para nuevo producto
-        if current_text not in [name.lower() for name in self.all_product_names]:
-            self._prepare_for_new_product(self.ent_nombre_producto.get().strip())
-        else:
-            # Si el texto coincide exactamente con un producto existente, cargar sus datos
-            self._load_existing_product_data(self.ent_nombre_producto.get().strip())
+        # La coincidencia exacta se resuelve en el índice; solo se consulta la base de datos
+        # cuando el texto pasa a corresponder a un producto distinto del ya cargado.
+        producto_id = indice.exacto(current_text)
+        if producto_id is None:
+            if not self.es_producto_nuevo:
+                self._prepare_for_new_product(current_text)
+        elif producto_id != self.producto_actual_id:
+            self._load_existing_product_data(current_text)
 
     def _select_autocomplete(self, event=None):
         """Selecciona un elemento del autocompletado y lo pone en el Entry."""
@@ -271,6 +312,7 @@ class GestionCompras(tk.Frame):
 
     def _select_first_autocomplete_entry(self, event=None):
         """Selecciona la primera entrada del autocompletado si hay alguna."""
+        self._autocomplete_debouncer.ejecutar_ahora() # Aplicar lo último escrito antes de elegir
         if self.listbox_autocomplete.size() > 0:
             self.listbox_autocomplete.selection_set(0)
             self._select_autocomplete()
@@ -298,21 +340,24 @@ class GestionCompras(tk.Frame):
             self._reset_producto_fields()
             return
 
-        producto_data = self.productos_manager.obtener_producto_por_nombre(nombre_producto)
-        if producto_data:
+        indice = self._indice_productos()
+        producto_id = indice.exacto(nombre_producto) if indice else None
+        if producto_id is None:
+            if not self.es_producto_nuevo:
+                self._prepare_for_new_product(nombre_producto)
+        elif producto_id != self.producto_actual_id:
             self._load_existing_product_data(nombre_producto)
-        else:
-            self._prepare_for_new_product(nombre_producto)
 
     def _load_existing_product_data(self, nombre_producto: str):
         """Carga los datos de un producto existente en el formulario."""
         producto_data = self.productos_manager.obtener_producto_por_nombre(nombre_producto)
         if producto_data:
-            self.producto_actual_id = producto_data[0]
-            self.producto_actual_unidad_base = producto_data[3]
-            self.producto_actual_unidad_display = producto_data[7]
-            stock_minimo_existente = producto_data[6]
-            proveedor_existente = producto_data[8]
+            self.producto_actual_id = producto_data.id
+            self.producto_actual_unidad_base = producto_data.unidad
+            self.producto_actual_unidad_display = producto_data.unidad_display
+            self.es_producto_nuevo = False
+            stock_minimo_existente = producto_data.stock_minimo
+            proveedor_existente = producto_data.proveedor
 
             # Deshabilitar campos de nuevo producto
             self.frm_nuevo_producto.grid_remove()
@@ -338,6 +383,7 @@ class GestionCompras(tk.Frame):
         self.producto_actual_id = None
         self.producto_actual_unidad_base = None
         self.producto_actual_unidad_display = None
+        self.es_producto_nuevo = True
 
         # Habilitar campos de nuevo producto
         self.frm_nuevo_producto.grid()
@@ -354,6 +400,7 @@ class GestionCompras(tk.Frame):
         self.producto_actual_id = None
         self.producto_actual_unidad_base = None
         self.producto_actual_unidad_display = None
+        self.es_producto_nuevo = False
         
         self.frm_nuevo_producto.grid_remove()
         self.cbo_unidad_default.config(state="readonly")
@@ -477,10 +524,7 @@ class GestionCompras(tk.Frame):
             if success:
                 messagebox.showinfo("Éxito", "Compra registrada correctamente.")
                 self._clear_form()
-                self._load_history()
-                self._load_product_names_for_autocomplete() # Recargar nombres para autocompletado
-                if self.on_compra_exitosa_callback:
-                    self.on_compra_exitosa_callback() # Recargar productos en la otra página (GestionProductos)
+                # El historial, los nombres y las demás páginas abiertas se actualizan con los eventos de la compra
             else:
                 messagebox.showerror("Error", "No se pudo registrar la compra.")
 
@@ -489,6 +533,41 @@ class GestionCompras(tk.Frame):
         except Exception as e:
             messagebox.showerror("Error al Registrar Compra", f"Ocurrió un error inesperado: {str(e)}")
 
+    def _mostrar_sugerencias(self):
+        """Calcula las compras sugeridas y precarga en el formulario la que se elija."""
+        try:
+            sugerencias = self.reabastecimiento.calcular_sugerencias()
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudieron calcular las sugerencias de compra: {str(e)}")
+            return
+        if not sugerencias:
+            messagebox.showinfo("Sugerencias de Compra", "Ningún producto está en su punto de reorden.")
+            return
+
+        dialog = SugerenciasCompraDialog(self, "Sugerencias de Compra", sugerencias)
+        if dialog.result_data:
+            self.precargar_sugerencia(dialog.result_data)
+
+    def precargar_sugerencia(self, sugerencia):
+        """Completa el formulario con una SugerenciaCompra (cantidad y precio en la unidad de visualización)."""
+        self._clear_form()
+        self.ent_nombre_producto.insert(0, sugerencia.nombre_producto)
+        self._load_existing_product_data(sugerencia.nombre_producto)
+
+        unidad = sugerencia.unidad_display or sugerencia.unidad
+        cantidad_base = Decimal(str(round(sugerencia.cantidad_sugerida, 4)))
+        cantidad = self.unit_converter.convert(cantidad_base, sugerencia.unidad, unidad)
+        self.cbo_unidad_compra.set(unidad)
+        self.ent_cantidad_compra.insert(0, f"{cantidad:.4f}".rstrip('0').rstrip('.'))
+
+        # Precio estimado por unidad de compra a partir del costo promedio vigente
+        if sugerencia.cantidad_sugerida > 0 and sugerencia.costo_estimado > 0:
+            costo_base = Decimal(str(sugerencia.costo_estimado / sugerencia.cantidad_sugerida))
+            precio = costo_base * self.unit_converter.convert(Decimal('1'), unidad, sugerencia.unidad)
+            self.ent_precio_compra.insert(0, f"{precio:.2f}")
+        self.ent_notas.insert(0, "Sugerencia de reabastecimiento")
+        self._calcular_total_compra()
+
     def _clear_form(self):
         """Limpia todos los campos del formulario."""
         self.ent_nombre_producto.delete(0, tk.END)
@@ -503,6 +582,7 @@ class GestionCompras(tk.Frame):
         self.ent_stock_minimo.delete(0, tk.END)
         self.cbo_unidad_default.set("")
         self.lbl_total_compra_val.config(text="$0.00")
+        self._autocomplete_debouncer.cancelar()
         self._reset_producto_fields() # Resetear campos de producto nuevo/existente
         self._on_tipo_compra_selected() # Asegurar que los frames dinámicos se reseteen
         self.listbox_autocomplete.grid_remove() # Ocultar listbox de autocompletado
@@ -516,19 +596,74 @@ class GestionCompras(tk.Frame):
             compras = self.compras_manager.obtener_historial(days=days)
             for compra in compras:
                 # Asegurarse de que los valores Decimal se formateen correctamente
-                cantidad_fmt = f"{compra['cantidad']:.4f}"
-                precio_unitario_fmt = f"${compra['precio_unitario']:.2f}"
-                precio_total_fmt = f"${compra['precio_total']:.2f}"
+                cantidad_fmt = f"{compra.cantidad:.4f}"
+                precio_unitario_fmt = f"${compra.precio_unitario:.2f}"
+                precio_total_fmt = f"${compra.precio_total:.2f}"
 
                 self.tree_historial.insert('', 'end', values=(
-                    compra['fecha_compra'].strftime('%Y-%m-%d %H:%M'), # Formato de fecha y hora
-                    compra['nombre_producto'],
+                    compra.fecha_compra.strftime('%Y-%m-%d %H:%M'), # Formato de fecha y hora
+                    compra.nombre_producto,
                     cantidad_fmt,
-                    compra['unidad'],
+                    compra.unidad,
                     precio_unitario_fmt,
                     precio_total_fmt,
-                    compra['tipo_compra'],
-                    compra['proveedor'] if compra['proveedor'] else 'N/A'
+                    compra.tipo_compra,
+                    compra.proveedor if compra.proveedor else 'N/A'
                 ))
         except Exception as e:
             messagebox.showerror("Error de Historial", f"No se pudo cargar el historial de compras: {str(e)}")
+
+
+class SugerenciasCompraDialog(simpledialog.Dialog):
+    """Lista de compras sugeridas; devuelve en result_data la SugerenciaCompra elegida."""
+
+    def __init__(self, parent, title, sugerencias):
+        self.sugerencias = sugerencias
+        self.result_data = None
+        super().__init__(parent, title)
+
+    def body(self, master):
+        columnas = [
+            ('producto', 'Producto', 180, 'w'),
+            ('proveedor', 'Proveedor', 120, 'w'),
+            ('stock', 'Stock', 90, 'e'),
+            ('consumo', 'Consumo/Día', 90, 'e'),
+            ('reorden', 'Punto Reorden', 100, 'e'),
+            ('sugerida', 'Comprar', 90, 'e'),
+            ('unidad', 'Unidad', 60, 'center'),
+            ('costo', 'Costo Est.', 90, 'e')
+        ]
+        self.tree = ttk.Treeview(master, columns=[c[0] for c in columnas], show='headings', height=15,
+                                 style="Modern.Treeview")
+        for col_id, texto, ancho, anchor in columnas:
+            self.tree.heading(col_id, text=texto)
+            self.tree.column(col_id, width=ancho, anchor=anchor)
+        for i, s in enumerate(self.sugerencias):
+            self.tree.insert('', 'end', iid=str(i), values=(
+                s.nombre_producto, s.proveedor or "", f"{s.stock_actual:.2f}", f"{s.consumo_diario:.2f}",
+                f"{s.punto_reorden:.2f}", f"{s.cantidad_sugerida:.2f}", s.unidad, f"${s.costo_estimado:.2f}"
+            ))
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        scrollbar = ttk.Scrollbar(master, orient="vertical", command=self.tree.yview)
+        scrollbar.grid(row=0, column=1, sticky="ns")
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.bind('<Double-1>', lambda event: self.ok())
+
+        total = sum(s.costo_estimado for s in self.sugerencias)
+        ttk.Label(master, text=f"Costo total estimado: ${total:.2f}").grid(row=1, column=0, sticky="w", pady=5)
+        return self.tree
+
+    def buttonbox(self):
+        box = ttk.Frame(self)
+
+        ttk.Button(box, text="Cargar en Formulario", command=self.ok, style="Accent.TButton").pack(side="left", padx=5, pady=5)
+        ttk.Button(box, text="Cerrar", command=self.cancel, style="Modern.TButton").pack(side="left", padx=5, pady=5)
+
+        self.bind("<Escape>", lambda event: self.cancel())
+
+        box.pack()
+
+    def apply(self):
+        seleccion = self.tree.selection()
+        if seleccion:
+            self.result_data = self.sugerencias[int(seleccion[0])]
@@ -3,6 +3,7 @@ from tkinter import ttk, messagebox, simpledialog
 from decimal import Decimal, InvalidOperation
 from Core.UnitConverter import UnitConverter
 from Core.productos import Productos # Asegurarse de que Productos esté importado para obtener datos de productos
+from Gui.widgets import Debouncer, FiltroTreeview
 
 # --- Clase de Diálogo Personalizado para Cantidad y Unidad (Reutilizada de RecetasEditor) ---
 # Esta clase es útil para pedir la cantidad y unidad de un ingrediente a usar.
@@ -87,15 +88,18 @@ class CantidadUnidadDialog(simpledialog.Dialog):
 
 
 class GestionProduccion(tk.Frame):
-    def __init__(self, parent, produccion_manager, productos_manager):
+    def __init__(self, parent, produccion_manager, productos_manager, unit_converter=None):
         super().__init__(parent)
         self.produccion_manager = produccion_manager
         self.productos_manager = productos_manager
-        self.unit_converter = UnitConverter()
+        self.unit_converter = unit_converter or UnitConverter()
         # Almacena (ingrediente_id, nombre, cantidad_total_usada, unidad_ingrediente, costo_promedio_ingrediente)
         self.ingredientes_temporales = [] 
         
+        self.recetas_por_nombre = {} # "nombre" -> receta_id para el combobox de producción por receta
+
         self.create_widgets()
+        self.load_recetas()
         self.load_materias_primas() # Cargar materias primas al inicio
         self.actualizar_treeview_ingredientes_produccion() # Asegurarse de que esté vacío al inicio
         self.calcular_costo_total_produccion() # Calcular costo inicial (0.00)
@@ -140,9 +144,15 @@ class GestionProduccion(tk.Frame):
         # --- Panel Izquierdo: Materias Primas Disponibles ---
         mp_frame = ttk.LabelFrame(content_frame, text="Inventario de Materias Primas", padding=10, style="Card.TFrame")
         mp_frame.grid(row=0, column=0, sticky="nsew", padx=5, pady=5)
-        mp_frame.grid_rowconfigure(0, weight=1)
+        mp_frame.grid_rowconfigure(1, weight=1)
         mp_frame.grid_columnconfigure(0, weight=1)
 
+        # Búsqueda de materias primas (usa el índice compartido de productos)
+        self.entry_buscar_mp = ttk.Entry(mp_frame, style="Modern.TEntry")
+        self.entry_buscar_mp.grid(row=0, column=0, columnspan=2, sticky="ew", pady=(0, 5))
+        self._buscar_mp_debouncer = Debouncer(self, self.filtrar_materias_primas)
+        self.entry_buscar_mp.bind('<KeyRelease>', self._buscar_mp_debouncer)
+
         self.tree_materias_primas = ttk.Treeview(mp_frame, columns=('id', 'nombre', 'stock', 'unidad'), show='headings', style="Modern.Treeview")
         self.tree_materias_primas.heading('id', text='ID')
         self.tree_materias_primas.heading('nombre', text='Materia Prima')
@@ -152,10 +162,11 @@ class GestionProduccion(tk.Frame):
         self.tree_materias_primas.column('nombre', width=150, anchor='w')
         self.tree_materias_primas.column('stock', width=80, anchor='e')
         self.tree_materias_primas.column('unidad', width=60, anchor='center')
-        self.tree_materias_primas.grid(row=0, column=0, sticky="nsew")
+        self.tree_materias_primas.grid(row=1, column=0, sticky="nsew")
+        self.filtro_materias_primas = FiltroTreeview(self.tree_materias_primas)
         
         mp_scrollbar = ttk.Scrollbar(mp_frame, orient="vertical", command=self.tree_materias_primas.yview, style="Vertical.TScrollbar")
-        mp_scrollbar.grid(row=0, column=1, sticky="ns")
+        mp_scrollbar.grid(row=1, column=1, sticky="ns")
         self.tree_materias_primas.configure(yscrollcommand=mp_scrollbar.set)
 
         # --- Panel Central: Botones de Acción ---
@@ -200,6 +211,22 @@ class GestionProduccion(tk.Frame):
         ttk.Button(summary_controls_frame, text="💾 Registrar Producción", command=self.registrar_produccion, style="Accent.TButton").grid(row=1, column=0, columnspan=2, pady=(10, 5), sticky="ew")
         ttk.Button(summary_controls_frame, text="🧹 Limpiar Formulario", command=self.limpiar_formulario, style="Modern.TButton").grid(row=2, column=0, columnspan=2, pady=(5, 0), sticky="ew")
 
+        # --- Producción desde Receta: ingredientes escalados desde la receta ---
+        receta_frame = ttk.LabelFrame(main_frame, text="Producir desde Receta", padding=10, style="Card.TFrame")
+        receta_frame.grid(row=4, column=0, columnspan=4, sticky="ew", pady=(10, 0))
+        receta_frame.columnconfigure(1, weight=1)
+
+        ttk.Label(receta_frame, text="Receta:").grid(row=0, column=0, sticky="w", padx=5, pady=2)
+        self.combobox_receta = ttk.Combobox(receta_frame, state="readonly", width=40, style="Modern.TCombobox")
+        self.combobox_receta.grid(row=0, column=1, sticky="ew", padx=5, pady=2)
+
+        ttk.Label(receta_frame, text="Unidades:").grid(row=0, column=2, sticky="w", padx=5, pady=2)
+        self.entry_lotes = ttk.Entry(receta_frame, width=10, style="Modern.TEntry")
+        self.entry_lotes.grid(row=0, column=3, sticky="w", padx=5, pady=2)
+        self.entry_lotes.insert(0, "1")
+
+        ttk.Button(receta_frame, text="🏭 Producir desde Receta", command=self.producir_desde_receta, style="Accent.TButton").grid(row=0, column=4, padx=5, pady=2)
+
         # Configurar expansión de filas y columnas en el main_frame
         main_frame.grid_rowconfigure(2, weight=1) # El content_frame (que contiene los treeviews)
         main_frame.grid_columnconfigure(0, weight=1) # Permitir que la primera columna se expanda
@@ -211,23 +238,43 @@ class GestionProduccion(tk.Frame):
 
     def load_materias_primas(self):
         """Carga las materias primas disponibles en el Treeview de inventario."""
-        for item in self.tree_materias_primas.get_children():
-            self.tree_materias_primas.delete(item)
+        self.filtro_materias_primas.limpiar()
         
         try:
             productos = self.productos_manager.obtener_todos_los_productos()
+            self.productos_manager.obtener_indice_busqueda(refrescar=True)
             for p in productos:
-                # p: (id, nombre_producto, cantidad, unidad, total_invertido, notas, stock_minimo, unidad_display, proveedor)
-                prod_id, nombre, cantidad, unidad_interna, total_invertido, _, _, unidad_display, _ = p
+                prod_id, nombre, cantidad = p.id, p.nombre_producto, p.cantidad
+                unidad_interna, unidad_display = p.unidad, p.unidad_display
                 
                 costo_promedio = self.productos_manager.obtener_costo_promedio(prod_id)
 
-                self.tree_materias_primas.insert('', 'end', 
+                iid = self.tree_materias_primas.insert('', 'end', 
                                             values=(prod_id, nombre, f"{float(cantidad):.4f} {unidad_display}", unidad_display),
                                             tags=(str(prod_id), str(costo_promedio), unidad_interna)) # Guardamos ID, costo_promedio y unidad_interna en tags
+                self.filtro_materias_primas.registrar(prod_id, iid)
+            self.filtrar_materias_primas()
         except Exception as e:
             messagebox.showerror("Error de Carga", f"No se pudieron cargar las materias primas: {str(e)}")
 
+    def load_recetas(self):
+        """Carga las recetas que se pueden producir."""
+        try:
+            recetas = self.produccion_manager.recetas_manager.obtener_todas_las_recetas()
+            self.recetas_por_nombre = {r.nombre: r.id for r in recetas}
+            self.combobox_receta['values'] = sorted(self.recetas_por_nombre)
+        except Exception as e:
+            messagebox.showerror("Error de Carga", f"No se pudieron cargar las recetas: {str(e)}")
+
+    def filtrar_materias_primas(self):
+        """Muestra solo las materias primas cuyo nombre coincide con la búsqueda."""
+        texto = self.entry_buscar_mp.get().strip()
+        if not texto:
+            self.filtro_materias_primas.aplicar(None)
+            return
+        indice = self.productos_manager.obtener_indice_busqueda()
+        self.filtro_materias_primas.aplicar(indice.buscar_ids(texto))
+
     def agregar_ingrediente_a_produccion(self, event=None):
         """Agrega el ingrediente seleccionado del inventario a la lista de producción."""
         seleccion = self.tree_materias_primas.selection()
@@ -302,7 +349,7 @@ class GestionProduccion(tk.Frame):
             if not producto_data:
                 messagebox.showerror("Error", "No se pudo obtener la información del ingrediente.")
                 return
-            unidad_base_interna = producto_data[3]
+            unidad_base_interna = producto_data.unidad
             unit_type = self.unit_converter.UNIT_TYPES.get(unidad_base_interna)
             if not unit_type:
                 messagebox.showerror("Error de Unidad", f"La unidad base interna '{unidad_base_interna}' del ingrediente '{nombre_ingrediente}' no tiene un tipo de magnitud definido. No se puede editar.")
@@ -365,7 +412,7 @@ class GestionProduccion(tk.Frame):
             producto_data = self.productos_manager.obtener_producto(ing_id)
             costo_parcial = Decimal('0.00')
             if producto_data:
-                unidad_base_ingrediente = producto_data[3] # 'unidad' en la tabla productos
+                unidad_base_ingrediente = producto_data.unidad # 'unidad' en la tabla productos
                 try:
                     cantidad_en_base = self.unit_converter.convert(
                         cantidad_usada, unidad_usada, unidad_base_ingrediente
@@ -384,7 +431,7 @@ class GestionProduccion(tk.Frame):
         for ing_id, _, cantidad_usada, unidad_usada, costo_promedio_ingrediente in self.ingredientes_temporales:
             producto_data = self.productos_manager.obtener_producto(ing_id)
             if producto_data:
-                unidad_base_ingrediente = producto_data[3]
+                unidad_base_ingrediente = producto_data.unidad
                 try:
                     cantidad_en_base = self.unit_converter.convert(
                         cantidad_usada, unidad_usada, unidad_base_ingrediente
@@ -447,6 +494,29 @@ class GestionProduccion(tk.Frame):
         except Exception as e:
             messagebox.showerror("Error", f"No se pudo registrar la producción: {str(e)}")
 
+    def producir_desde_receta(self):
+        """Produce la receta seleccionada descontando sus ingredientes escalados a las unidades indicadas."""
+        nombre_receta = self.combobox_receta.get().strip()
+        if not nombre_receta:
+            messagebox.showerror("Error", "Debe seleccionar una receta.")
+            return
+        try:
+            lotes = int(self.entry_lotes.get().strip())
+            if lotes <= 0:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Error de Entrada", "Las unidades a producir deben ser un entero positivo.")
+            return
+
+        try:
+            producto_id = self.produccion_manager.producir_desde_receta(self.recetas_por_nombre[nombre_receta], lotes)
+            messagebox.showinfo("Éxito", f"Se produjeron {lotes} unidad(es) de '{nombre_receta}'. ID del producto: {producto_id}")
+            self.load_materias_primas() # Reflejar el stock consumido y producido
+        except ValueError as ve:
+            messagebox.showerror("Error de Validación", str(ve))
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudo registrar la producción: {str(e)}")
+
     def limpiar_formulario(self):
         """Limpia todos los campos del formulario de producción."""
         self.entry_nombre_elaborado.delete(0, tk.END)
@@ -3,13 +3,18 @@ from tkinter import ttk, messagebox, simpledialog
 from tkinter.font import Font
 from Core.productos import Productos
 from Core.UnitConverter import UnitConverter
+from Core.search_index import SearchIndex
+from Gui.widgets import Debouncer, FiltroTreeview, SuscripcionEventos
+from Core.eventos import StockCambiado, ProductoActualizado
 from decimal import Decimal, InvalidOperation # Importar Decimal para manejo preciso
 
 class GestionProductos(tk.Frame):
-    def __init__(self, parent, productos_manager):
+    def __init__(self, parent, productos_manager, unit_converter=None):
         super().__init__(parent)
         self.productos_manager = productos_manager
-        self.unit_converter = UnitConverter()
+        self.unit_converter = unit_converter or UnitConverter()
+        self.all_products_data = []
+        self.indice_productos = SearchIndex() # Índice sobre los productos cargados en la tabla
         
         # Configurar fuentes modernas (ya definidas en styles.py, pero se pueden usar aquí si se desea sobrescribir)
         # self.font_title = Font(family="Helvetica", size=14, weight="bold")
@@ -19,6 +24,9 @@ class GestionProductos(tk.Frame):
         self._crear_widgets()
         self._configurar_layout()
         self.load_products() # Cargar productos al inicializar la página
+        
+        # Compras, ventas, producción y ediciones (de esta u otras páginas) actualizan solo sus filas
+        self.suscripcion = SuscripcionEventos(self, (StockCambiado, ProductoActualizado), self._on_productos_cambiados)
 
     def _crear_widgets(self):
         """Crea todos los widgets con estilo moderno"""
@@ -54,6 +62,7 @@ class GestionProductos(tk.Frame):
         for col_name, width, anchor in column_config:
             self.tree.heading(col_name, text=col_name)
             self.tree.column(col_name, width=width, anchor=anchor)
+        self.filtro_productos = FiltroTreeview(self.tree) # Filtrado por búsqueda sin reconstruir filas
         
         # Scrollbar
         self.scrollbar = ttk.Scrollbar(
@@ -108,7 +117,8 @@ class GestionProductos(tk.Frame):
         ttk.Label(self.search_frame, text="Buscar Producto:").pack(side=tk.LEFT, padx=(0, 5))
         self.entry_search = ttk.Entry(self.search_frame, width=30, style="Modern.TEntry")
         self.entry_search.pack(side=tk.LEFT, padx=(0, 10))
-        self.entry_search.bind("<KeyRelease>", self._filter_products) # Filtrar al escribir
+        self._search_debouncer = Debouncer(self, self._filter_products)
+        self.entry_search.bind("<KeyRelease>", self._search_debouncer) # Filtrar al dejar de escribir
 
     def _configurar_layout(self):
         """Configura el layout usando grid"""
@@ -139,19 +149,20 @@ class GestionProductos(tk.Frame):
     def load_products(self):
         """Carga los productos en el Treeview de forma segura."""
         try:
-            # Limpiar el treeview
-            for item in self.tree.get_children():
-                self.tree.delete(item)
+            # Limpiar el treeview (incluidas las filas ocultas por el filtro)
+            self.filtro_productos.limpiar()
             
             # Obtener todos los productos
             productos = self.productos_manager.obtener_todos_los_productos()
             self.all_products_data = productos # Guardar todos los datos para filtrar
+            self.indice_productos = SearchIndex((p.id, p.nombre_producto) for p in productos)
             
             if not productos:
                 messagebox.showinfo("Información", "No hay productos registrados en el inventario.")
                 return
                 
             self._populate_treeview(productos)
+            self._filter_products() # Mantener el filtro vigente tras recargar
                     
         except Exception as e:
             messagebox.showerror("Error de Carga", f"Error general al cargar productos: {str(e)}")
@@ -160,57 +171,81 @@ class GestionProductos(tk.Frame):
         """Rellena el treeview con la lista de productos dada."""
         for prod in products_to_display:
             try:
-                prod_id, nombre, cantidad_interna, unidad_interna, total_invertido, notas, stock_minimo, unidad_display, proveedor = prod
-                
-                # Calcular costo promedio
-                costo_promedio = self.productos_manager.obtener_costo_promedio(prod_id)
-                costo_promedio_fmt = f"${costo_promedio:.2f}"
-                
-                # Formatear cantidad para mostrar (convertir si unidad_interna != unidad_display)
-                cantidad_para_mostrar = Decimal(str(cantidad_interna)) # Asegurar que sea Decimal
-                try:
-                    if unidad_interna != unidad_display and \
-                       unidad_interna in self.unit_converter.CONVERSION_FACTORS and \
-                       unidad_display in self.unit_converter.CONVERSION_FACTORS and \
-                       self.unit_converter.UNIT_TYPES.get(unidad_interna) == self.unit_converter.UNIT_TYPES.get(unidad_display):
-                        cantidad_para_mostrar = self.unit_converter.convert(cantidad_para_mostrar, unidad_interna, unidad_display)
-                except Exception as e_conv:
-                    # print(f"Advertencia: No se pudo convertir {cantidad_interna} {unidad_interna} a {unidad_display} para {nombre}. Error: {e_conv}")
-                    pass # No mostrar error al usuario, solo usar la cantidad interna si falla la conversión
-
-                cantidad_fmt = f"{cantidad_para_mostrar:.4f}" # Mostrar 4 decimales para precisión
-                
-                self.tree.insert("", "end", values=(
-                    prod_id,
-                    nombre,
-                    cantidad_fmt,
-                    unidad_display, # Mostrar la unidad de visualización
-                    costo_promedio_fmt,
-                    f"{stock_minimo:.4f}", # Mostrar stock mínimo con 4 decimales
-                    proveedor if proveedor else "N/A"
-                ))
+                iid = self.tree.insert("", "end", values=self._valores_fila(prod))
+                self.filtro_productos.registrar(prod.id, iid)
             except Exception as e_prod:
                 print(f"Error al procesar producto {prod}: {str(e_prod)}")
                 # messagebox.showerror("Error de Carga", f"Error al procesar un producto: {str(e_prod)}") # Demasiado intrusivo
 
+    def _valores_fila(self, prod) -> tuple:
+        """Valores formateados de la fila de un producto."""
+        cantidad_interna = prod.cantidad
+        unidad_interna = prod.unidad
+        unidad_display = prod.unidad_display
+        
+        # Calcular costo promedio con los datos ya cargados (sin consultar la base de datos)
+        costo_promedio = Productos.calcular_costo_promedio(cantidad_interna, prod.total_invertido)
+        costo_promedio_fmt = f"${costo_promedio:.2f}"
+        
+        # Formatear cantidad para mostrar (convertir si unidad_interna != unidad_display)
+        cantidad_para_mostrar = Decimal(str(cantidad_interna)) # Asegurar que sea Decimal
+        try:
+            if unidad_interna != unidad_display and \
+               unidad_interna in self.unit_converter.CONVERSION_FACTORS and \
+               unidad_display in self.unit_converter.CONVERSION_FACTORS and \
+               self.unit_converter.UNIT_TYPES.get(unidad_interna) == self.unit_converter.UNIT_TYPES.get(unidad_display):
+                cantidad_para_mostrar = self.unit_converter.convert(cantidad_para_mostrar, unidad_interna, unidad_display)
+        except Exception as e_conv:
+            # print(f"Advertencia: No se pudo convertir {cantidad_interna} {unidad_interna} a {unidad_display} para {prod.nombre_producto}. Error: {e_conv}")
+            pass # No mostrar error al usuario, solo usar la cantidad interna si falla la conversión
+
+        cantidad_fmt = f"{cantidad_para_mostrar:.4f}" # Mostrar 4 decimales para precisión
+        
+        return (
+            prod.id,
+            prod.nombre_producto,
+            cantidad_fmt,
+            unidad_display, # Mostrar la unidad de visualización
+            costo_promedio_fmt,
+            f"{prod.stock_minimo:.4f}", # Mostrar stock mínimo con 4 decimales
+            prod.proveedor if prod.proveedor else "N/A"
+        )
+
+    def _on_productos_cambiados(self, eventos):
+        """Actualiza en el lugar solo las filas de los productos que cambiaron; un producto nuevo recarga la lista."""
+        producto_ids = {producto_id for evento in eventos for producto_id in evento.productos()}
+        try:
+            productos = {p.id: p for p in self.productos_manager.obtener_productos_por_ids(producto_ids)}
+        except Exception as e:
+            print(f"Error al actualizar productos {sorted(producto_ids)}: {str(e)}")
+            return
+        
+        if any(self.filtro_productos.iid(pid) is None for pid in productos):
+            self.load_products() # Producto nuevo: recargar para respetar el orden por nombre
+            return
+        
+        por_id = {p.id: p for p in self.all_products_data}
+        for producto_id in producto_ids:
+            prod = productos.get(producto_id)
+            if prod is None: # Eliminado
+                self.filtro_productos.quitar(producto_id)
+                por_id.pop(producto_id, None)
+            else:
+                self.tree.item(self.filtro_productos.iid(producto_id), values=self._valores_fila(prod))
+                por_id[producto_id] = prod
+        self.all_products_data = list(por_id.values())
+
     def _filter_products(self, event=None):
         """Filtra los productos en el Treeview según el texto de búsqueda."""
-        search_term = self.entry_search.get().strip().lower()
-        
-        # Limpiar el treeview
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        search_term = self.entry_search.get().strip()
         
+        # Las filas ya están formateadas en el Treeview; solo se ocultan/muestran las que cambian
         if not search_term:
             # Si el campo de búsqueda está vacío, mostrar todos los productos
-            self._populate_treeview(self.all_products_data)
+            self.filtro_productos.aplicar(None)
         else:
-            # Filtrar los productos
-            filtered_products = [
-                p for p in self.all_products_data 
-                if search_term in p[1].lower() # Buscar por nombre de producto
-            ]
-            self._populate_treeview(filtered_products)
+            # Buscar por nombre de producto
+            self.filtro_productos.aplicar(self.indice_productos.buscar_ids(search_term))
 
     def editar_stock_minimo(self):
         """Método para editar el stock mínimo de un producto."""
@@ -239,14 +274,12 @@ class GestionProductos(tk.Frame):
             if nuevo_stock_minimo < Decimal('0'):
                 raise ValueError("El stock mínimo no puede ser negativo.")
             
-            # Iniciar transacción para la actualización
-            self.productos_manager.db_connection.get_connection().start_transaction()
-            success = self.productos_manager.actualizar_stock_minimo(prod_id, nuevo_stock_minimo)
-            self.productos_manager.db_connection.commit() # Confirmar la transacción
+            with self.productos_manager.db_connection.transaction(): # Commit al salir, rollback ante un error
+                success = self.productos_manager.actualizar_stock_minimo(prod_id, nuevo_stock_minimo)
             
             if success:
                 messagebox.showinfo("Éxito", f"Stock mínimo de '{nombre_producto}' actualizado correctamente a {nuevo_stock_minimo:.4f}.")
-                self.load_products()  # Refrescar vista
+                # La fila se actualiza con el evento ProductoActualizado
             else:
                 messagebox.showerror("Error", "No se pudo actualizar el stock mínimo en la base de datos.")
         except InvalidOperation:
@@ -254,7 +287,6 @@ class GestionProductos(tk.Frame):
         except ValueError as ve:
             messagebox.showerror("Error de Validación", str(ve))
         except Exception as e:
-            self.productos_manager.db_connection.rollback() # Revertir en caso de error
             messagebox.showerror("Error", f"Ocurrió un error al actualizar el stock mínimo: {str(e)}")
 
     def cambiar_unidad(self):
@@ -275,7 +307,7 @@ class GestionProductos(tk.Frame):
             if not producto_data:
                 messagebox.showerror("Error", "No se pudo obtener la información del producto.")
                 return
-            unidad_base_interna = producto_data[3] # 'unidad' en la tabla productos
+            unidad_base_interna = producto_data.unidad # 'unidad' en la tabla productos
             
             # Obtener el tipo de magnitud de la unidad base interna
             unit_type = self.unit_converter.UNIT_TYPES.get(unidad_base_interna)
@@ -338,19 +370,16 @@ class GestionProductos(tk.Frame):
             return
             
         try:
-            # Iniciar transacción para la actualización
-            self.productos_manager.db_connection.get_connection().start_transaction()
-            success = self.productos_manager.actualizar_unidad_display(product_id, nueva_unidad_display)
-            self.productos_manager.db_connection.commit() # Confirmar la transacción
+            with self.productos_manager.db_connection.transaction(): # Commit al salir, rollback ante un error
+                success = self.productos_manager.actualizar_unidad_display(product_id, nueva_unidad_display)
             
             if success:
                 messagebox.showinfo("Éxito", f"Unidad de visualización actualizada correctamente a '{nueva_unidad_display}'.")
                 dialog.destroy()
-                self.load_products()  # Refrescar vista
+                # La fila se actualiza con el evento ProductoActualizado
             else:
                 messagebox.showerror("Error", "No se pudo actualizar la unidad de visualización en la base de datos.")
         except Exception as e:
-            self.productos_manager.db_connection.rollback() # Revertir en caso de error
             messagebox.showerror("Error", f"Ocurrió un error al actualizar la unidad: {str(e)}")
 
     def exportar_csv(self):
@@ -404,19 +433,16 @@ class GestionProductos(tk.Frame):
             return
 
         try:
-            # Iniciar transacción para la eliminación
-            self.productos_manager.db_connection.get_connection().start_transaction()
-            success = self.productos_manager.eliminar_producto(prod_id)
-            self.productos_manager.db_connection.commit()
+            with self.productos_manager.db_connection.transaction(): # Commit al salir, rollback ante un error
+                success = self.productos_manager.eliminar_producto(prod_id)
             
             if success:
                 messagebox.showinfo("Éxito", f"Producto '{nombre_producto}' eliminado correctamente.")
-                self.load_products()  # Refrescar la lista de productos
+                # La fila se actualiza con el evento ProductoActualizado
             else:
                 messagebox.showerror("Error", "No se pudo eliminar el producto.")
                 
         except Exception as e:
-            self.productos_manager.db_connection.rollback()
             messagebox.showerror("Error", f"Error al eliminar el producto: {str(e)}")
 
         prod_id = item['values'][0]
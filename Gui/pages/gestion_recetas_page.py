@@ -4,6 +4,9 @@ from decimal import Decimal, InvalidOperation
 from Core.productos import Productos
 from Core.recetas import RecetasManager
 from Core.UnitConverter import UnitConverter
+from Core.search_index import SearchIndex
+from Core.eventos import StockCambiado, ProductoActualizado
+from Gui.widgets import Debouncer, FiltroTreeview, SuscripcionEventos
 
 # --- Clase de Diálogo Personalizado para Cantidad y Unidad ---
 class CantidadUnidadDialog(simpledialog.Dialog):
@@ -88,18 +91,27 @@ class CantidadUnidadDialog(simpledialog.Dialog):
 
 # --- Modificaciones en la clase RecetasEditor ---
 class RecetasEditor(tk.Frame):
-    def __init__(self, parent, productos_manager, recetas_manager):
+    def __init__(self, parent, productos_manager, recetas_manager, unit_converter=None):
         super().__init__(parent)
         self.productos_manager = productos_manager
         self.recetas_manager = recetas_manager
-        self.unit_converter = UnitConverter()
+        self.unit_converter = unit_converter or UnitConverter()
         self.ingredientes_en_receta = [] # Almacena (ingrediente_id, nombre, cantidad, unidad, costo_promedio_ingrediente)
+        self.snapshot_ingredientes = {} # ingrediente_id -> (unidad_base, costo_promedio), leído una vez con el inventario
         self.current_editing_receta_id = None # Para saber qué receta se está editando
         self.trabajadores_temporales = [] # Almacena (id, nombre_trabajador, pago) para trabajadores nuevos
+        self.subrecetas_en_receta = [] # Almacena (subreceta_id, nombre, cantidad) de las recetas usadas como ingrediente
+        self.opciones_subrecetas = {} # Texto del combobox -> (subreceta_id, nombre)
+        self.costos_recetas = {} # receta_id -> costo de materiales, leído con el listado de recetas
 
         self.create_widgets()
         self.load_productos_base()
         self.load_recetas_existentes() # Cargar recetas existentes al inicio
+
+        # Compras, producciones y cambios del catálogo (aquí o en otra terminal) cambian los costos del snapshot
+        self.suscripcion_productos = SuscripcionEventos(
+            self, (StockCambiado, ProductoActualizado), lambda eventos: self.refrescar_snapshot_ingredientes()
+        )
         
     def create_widgets(self):
         # Panel principal con notebook
@@ -170,6 +182,46 @@ class RecetasEditor(tk.Frame):
         trabajadores_frame.rowconfigure(1, weight=1)
         trabajadores_frame.columnconfigure(1, weight=1)
 
+        # Sección de Subrecetas (otras recetas usadas como ingrediente, p. ej. una masa)
+        subrecetas_frame = ttk.LabelFrame(receta_info_frame, text="Subrecetas", style="Card.TFrame")
+        subrecetas_frame.grid(row=4, column=0, columnspan=2, sticky="ew", padx=5, pady=10)
+
+        ttk.Label(subrecetas_frame, text="Receta:").grid(row=0, column=0, sticky="w", padx=5, pady=2)
+        self.combo_subreceta = ttk.Combobox(subrecetas_frame, state="readonly", style="Modern.TCombobox")
+        self.combo_subreceta.grid(row=0, column=1, sticky="ew", padx=5, pady=2)
+
+        ttk.Label(subrecetas_frame, text="Cantidad:").grid(row=0, column=2, sticky="w", padx=5, pady=2)
+        self.entry_cantidad_subreceta = ttk.Entry(subrecetas_frame, width=10, style="Modern.TEntry")
+        self.entry_cantidad_subreceta.grid(row=0, column=3, padx=5, pady=2)
+        self.entry_cantidad_subreceta.insert(0, "1")
+
+        ttk.Button(subrecetas_frame, text="➕ Agregar Subreceta",
+                  command=self.agregar_subreceta, style="Modern.TButton").grid(row=0, column=4, padx=5, pady=2)
+
+        # Treeview para mostrar subrecetas
+        self.tree_subrecetas = ttk.Treeview(subrecetas_frame,
+                                           columns=('id', 'nombre', 'cantidad', 'costo_parcial'),
+                                           show='headings', style="Modern.Treeview", height=3)
+        self.tree_subrecetas.heading('id', text='ID')
+        self.tree_subrecetas.heading('nombre', text='Subreceta')
+        self.tree_subrecetas.heading('cantidad', text='Cantidad')
+        self.tree_subrecetas.heading('costo_parcial', text='Costo Parcial')
+        self.tree_subrecetas.column('id', width=40, anchor='center')
+        self.tree_subrecetas.column('nombre', width=150, anchor='w')
+        self.tree_subrecetas.column('cantidad', width=80, anchor='e')
+        self.tree_subrecetas.column('costo_parcial', width=80, anchor='e')
+        self.tree_subrecetas.grid(row=1, column=0, columnspan=5, sticky="nsew", padx=5, pady=5)
+
+        subrecetas_scrollbar = ttk.Scrollbar(subrecetas_frame, orient="vertical", command=self.tree_subrecetas.yview)
+        subrecetas_scrollbar.grid(row=1, column=5, sticky="ns")
+        self.tree_subrecetas.configure(yscrollcommand=subrecetas_scrollbar.set)
+
+        ttk.Button(subrecetas_frame, text="➖ Eliminar Subreceta",
+                  command=self.eliminar_subreceta, style="Modern.TButton").grid(row=2, column=0, columnspan=5, pady=5)
+
+        subrecetas_frame.rowconfigure(1, weight=1)
+        subrecetas_frame.columnconfigure(1, weight=1)
+
         receta_info_frame.grid_columnconfigure(1, weight=1) # Permitir expansión
 
         # Contenedor para los dos Treeviews y los controles
@@ -183,6 +235,12 @@ class RecetasEditor(tk.Frame):
         # Panel izquierdo (ingredientes disponibles)
         self.ingredientes_frame = ttk.LabelFrame(content_frame, text="Inventario de Materias Primas", style="Card.TFrame") # Aplicar estilo
         self.ingredientes_frame.grid(row=0, column=0, sticky="nsew", padx=5, pady=5)
+
+        # Búsqueda de materias primas (usa el índice compartido de productos)
+        self.entry_buscar_ingredientes = ttk.Entry(self.ingredientes_frame, style="Modern.TEntry")
+        self.entry_buscar_ingredientes.pack(fill=tk.X, pady=(0, 5))
+        self._buscar_ingredientes_debouncer = Debouncer(self, self.filtrar_productos_base)
+        self.entry_buscar_ingredientes.bind('<KeyRelease>', self._buscar_ingredientes_debouncer)
         
         self.tree_ingredientes = ttk.Treeview(self.ingredientes_frame, columns=('id', 'nombre', 'stock', 'unidad'), show='headings', style="Modern.Treeview") # Aplicar estilo
         self.tree_ingredientes.heading('id', text='ID')
@@ -194,6 +252,7 @@ class RecetasEditor(tk.Frame):
         self.tree_ingredientes.column('stock', width=80, anchor='e')
         self.tree_ingredientes.column('unidad', width=60, anchor='center')
         self.tree_ingredientes.pack(fill=tk.BOTH, expand=True)
+        self.filtro_ingredientes = FiltroTreeview(self.tree_ingredientes)
         
         # Scrollbar para tree_ingredientes
         ingredientes_scrollbar = ttk.Scrollbar(self.ingredientes_frame, orient="vertical", command=self.tree_ingredientes.yview, style="Vertical.TScrollbar")
@@ -257,7 +316,8 @@ class RecetasEditor(tk.Frame):
         ttk.Label(listado_controls_frame, text="Buscar Receta:").pack(side=tk.LEFT, padx=(0, 5))
         self.entry_search_recetas = ttk.Entry(listado_controls_frame, width=30, style="Modern.TEntry")
         self.entry_search_recetas.pack(side=tk.LEFT, padx=(0, 10))
-        self.entry_search_recetas.bind("<KeyRelease>", self._filter_recetas_existentes)
+        self._search_recetas_debouncer = Debouncer(self, self._filter_recetas_existentes)
+        self.entry_search_recetas.bind("<KeyRelease>", self._search_recetas_debouncer)
 
         ttk.Button(listado_controls_frame, text="⟳ Actualizar Lista", command=self.load_recetas_existentes, style="Modern.TButton").pack(side=tk.RIGHT, padx=5)
 
@@ -282,6 +342,8 @@ class RecetasEditor(tk.Frame):
         self.tree_recetas_existentes.column('ganancia', width=100, anchor='e')
 
         self.tree_recetas_existentes.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.filtro_recetas = FiltroTreeview(self.tree_recetas_existentes)
+        self.indice_recetas = SearchIndex() # Nombre y categoría de las recetas cargadas
         
         # Scrollbar para tree_recetas_existentes
         recetas_existentes_scrollbar = ttk.Scrollbar(self.listado_frame, orient="vertical", command=self.tree_recetas_existentes.yview, style="Vertical.TScrollbar")
@@ -300,28 +362,42 @@ class RecetasEditor(tk.Frame):
         self.tree_ingredientes.bind('<Double-1>', self.agregar_ingrediente_a_receta)
         self.tree_receta.bind('<Delete>', self.eliminar_ingrediente_de_receta) # Permite eliminar con tecla Supr
         self.tree_receta.bind('<Double-1>', self.editar_cantidad_ingrediente) # Editar cantidad de ingrediente en receta
+        self.tree_subrecetas.bind('<Delete>', self.eliminar_subreceta)
         
         # Eventos para edición directa en el Treeview de recetas existentes
         self.tree_recetas_existentes.bind("<Double-1>", self.on_double_click_recetas_existentes)
 
     def load_productos_base(self):
         """Carga las materias primas disponibles en el Treeview de inventario."""
-        for item in self.tree_ingredientes.get_children():
-            self.tree_ingredientes.delete(item)
+        self.filtro_ingredientes.limpiar()
         
         try:
             productos = self.productos_manager.obtener_todos_los_productos()
+            self.productos_manager.obtener_indice_busqueda(refrescar=True)
+            self.snapshot_ingredientes = {}
             for p in productos:
-                # p: (id, nombre_producto, cantidad, unidad, total_invertido, notas, stock_minimo, unidad_display, proveedor)
-                prod_id, nombre, cantidad, unidad_interna, total_invertido, _, _, unidad_display, _ = p
+                prod_id, nombre, cantidad = p.id, p.nombre_producto, p.cantidad
+                unidad_interna, unidad_display = p.unidad, p.unidad_display
                 
-                costo_promedio = self.productos_manager.obtener_costo_promedio(prod_id)
+                costo_promedio = Productos.calcular_costo_promedio(cantidad, p.total_invertido)
+                self.snapshot_ingredientes[prod_id] = (unidad_interna, costo_promedio)
 
-                self.tree_ingredientes.insert('', 'end', 
+                iid = self.tree_ingredientes.insert('', 'end', 
                                             values=(prod_id, nombre, f"{float(cantidad):.4f} {unidad_display}", unidad_display),
                                             tags=(str(prod_id), str(costo_promedio), unidad_interna)) # Guardamos ID, costo_promedio y unidad_interna en tags
+                self.filtro_ingredientes.registrar(prod_id, iid)
+            self.filtrar_productos_base()
         except Exception as e:
             messagebox.showerror("Error de Carga", f"No se pudieron cargar las materias primas: {str(e)}")
+
+    def filtrar_productos_base(self):
+        """Muestra solo las materias primas cuyo nombre coincide con la búsqueda."""
+        texto = self.entry_buscar_ingredientes.get().strip()
+        if not texto:
+            self.filtro_ingredientes.aplicar(None)
+            return
+        indice = self.productos_manager.obtener_indice_busqueda()
+        self.filtro_ingredientes.aplicar(indice.buscar_ids(texto))
     
     def agregar_ingrediente_a_receta(self, event=None):
         """Agrega el ingrediente seleccionado del inventario a la receta en edición."""
@@ -393,11 +469,10 @@ class RecetasEditor(tk.Frame):
 
         # Obtener la unidad base interna del producto para el tipo de magnitud
         try:
-            producto_data = self.productos_manager.obtener_producto(ingrediente_id)
-            if not producto_data:
+            if ingrediente_id not in self.snapshot_ingredientes:
                 messagebox.showerror("Error", "No se pudo obtener la información del ingrediente.")
                 return
-            unidad_base_interna = producto_data[3]
+            unidad_base_interna = self.snapshot_ingredientes[ingrediente_id][0]
             unit_type = self.unit_converter.UNIT_TYPES.get(unidad_base_interna)
             if not unit_type:
                 messagebox.showerror("Error de Unidad", f"La unidad base interna '{unidad_base_interna}' del ingrediente '{nombre_ingrediente}' no tiene un tipo de magnitud definido. No se puede editar.")
@@ -451,46 +526,48 @@ class RecetasEditor(tk.Frame):
         self.calcular_costo_total_receta()
         messagebox.showinfo("Eliminado", f"Ingrediente '{nombre_ingrediente}' eliminado de la receta.")
 
+    def refrescar_snapshot_ingredientes(self):
+        """Vuelve a leer unidades base y costos promedio (p. ej. tras una compra) y recalcula la vista previa."""
+        self.load_productos_base()
+        self.actualizar_treeview_receta()
+        self.calcular_costo_total_receta()
+
+    def _calcular_costo_parcial(self, ing_id, cantidad_receta, unidad_receta) -> Decimal:
+        """Costo de un ingrediente de la receta usando el snapshot en memoria (sin consultar la base de datos)."""
+        snapshot = self.snapshot_ingredientes.get(ing_id)
+        if snapshot is None:
+            print(f"Advertencia: Producto ID {ing_id} no encontrado para calcular costo parcial en GUI.")
+            return Decimal('0.00')
+        unidad_base_ingrediente, costo_promedio_actual = snapshot
+        try:
+            cantidad_en_base = self.unit_converter.convert(
+                cantidad_receta, unidad_receta, unidad_base_ingrediente
+            )
+            return cantidad_en_base * costo_promedio_actual
+        except Exception as e:
+            print(f"Error al calcular costo parcial para ingrediente {ing_id}: {e}")
+            return Decimal('0.00')
+
     def actualizar_treeview_receta(self):
         """Actualiza el Treeview de la receta con los ingredientes temporales."""
         for item in self.tree_receta.get_children():
             self.tree_receta.delete(item)
         
         for ing_id, nombre, cantidad_receta, unidad_receta, costo_promedio_ingrediente in self.ingredientes_en_receta:
-            producto_data = self.productos_manager.obtener_producto(ing_id)
-            costo_parcial = Decimal('0.00')
-            if producto_data:
-                unidad_base_ingrediente = producto_data[3] # 'unidad' en la tabla productos
-                try:
-                    cantidad_en_base = self.unit_converter.convert(
-                        cantidad_receta, unidad_receta, unidad_base_ingrediente
-                    )
-                    costo_parcial = cantidad_en_base * costo_promedio_ingrediente
-                except Exception as e:
-                    print(f"Error al calcular costo parcial para {nombre}: {e}")
-                    # No mostrar messagebox aquí, solo en el cálculo total o al guardar
-            else:
-                print(f"Advertencia: Producto ID {ing_id} no encontrado para calcular costo parcial en GUI.")
-
+            costo_parcial = self._calcular_costo_parcial(ing_id, cantidad_receta, unidad_receta)
             self.tree_receta.insert('', 'end', values=(ing_id, nombre, f"{cantidad_receta:.4f} {unidad_receta}", f"${costo_parcial:.2f}"))
 
     def calcular_costo_total_receta(self):
         """Calcula y actualiza el costo total mostrado de la receta."""
-        total = Decimal('0.00')
-        for ing_id, _, cantidad_receta, unidad_receta, costo_promedio_ingrediente in self.ingredientes_en_receta:
-            producto_data = self.productos_manager.obtener_producto(ing_id)
-            if producto_data:
-                unidad_base_ingrediente = producto_data[3]
-                try:
-                    cantidad_en_base = self.unit_converter.convert(
-                        cantidad_receta, unidad_receta, unidad_base_ingrediente
-                    )
-                    total += cantidad_en_base * costo_promedio_ingrediente
-                except Exception as e:
-                    print(f"Error al calcular costo total para ingrediente {ing_id}: {e}")
-            else:
-                print(f"Advertencia: Producto ID {ing_id} no encontrado para calcular costo total.")
-
+        total = sum(
+            (self._calcular_costo_parcial(ing_id, cantidad_receta, unidad_receta)
+             for ing_id, _, cantidad_receta, unidad_receta, _ in self.ingredientes_en_receta),
+            Decimal('0.00')
+        )
+        total += sum(
+            (self._calcular_costo_subreceta(sub_id, cantidad) for sub_id, _, cantidad in self.subrecetas_en_receta),
+            Decimal('0.00')
+        )
         self.costo_total_var.set(f"${total:.2f}")
     
     def guardar_receta(self):
@@ -502,8 +579,8 @@ class RecetasEditor(tk.Frame):
         if not nombre_receta:
             messagebox.showerror("Error", "El nombre de la receta no puede estar vacío.")
             return
-        if not self.ingredientes_en_receta:
-            messagebox.showerror("Error", "La receta debe contener al menos un ingrediente.")
+        if not self.ingredientes_en_receta and not self.subrecetas_en_receta:
+            messagebox.showerror("Error", "La receta debe contener al menos un ingrediente o una subreceta.")
             return
         
         try:
@@ -516,32 +593,31 @@ class RecetasEditor(tk.Frame):
             for _, _, pago in self.trabajadores_temporales:
                 costo_mano_obra_total += pago
 
-            # Iniciar la transacción
-            self.recetas_manager.db_connection.get_connection().start_transaction()
+            # Todo en una transacción: commit al salir del bloque, rollback ante cualquier error
+            with self.recetas_manager.db_connection.transaction():
+                # Crear la receta principal
+                receta_id = self.recetas_manager.crear_receta(nombre_receta, categoria, precio_venta, costo_mano_obra_total)
 
-            # Crear la receta principal
-            receta_id = self.recetas_manager.crear_receta(nombre_receta, categoria, precio_venta, costo_mano_obra_total)
-            
-            # Añadir cada ingrediente a la receta
-            for ing_id, _, cantidad, unidad, _ in self.ingredientes_en_receta:
-                self.recetas_manager.agregar_ingrediente_a_receta(receta_id, ing_id, cantidad, unidad)
-            
-            # Guardar trabajadores
-            self.guardar_trabajadores_de_receta(receta_id)
-            
-            self.recetas_manager.db_connection.commit() # Confirmar la transacción
+                # Añadir cada ingrediente a la receta
+                for ing_id, _, cantidad, unidad, _ in self.ingredientes_en_receta:
+                    self.recetas_manager.agregar_ingrediente_a_receta(receta_id, ing_id, cantidad, unidad)
+
+                # Añadir cada subreceta
+                for sub_id, _, cantidad in self.subrecetas_en_receta:
+                    self.recetas_manager.agregar_subreceta_a_receta(receta_id, sub_id, cantidad)
+
+                # Guardar trabajadores
+                self.guardar_trabajadores_de_receta(receta_id)
+                self.recetas_manager.invalidar_matriz_bom(receta_id) # Los ingredientes cambiaron
             messagebox.showinfo("Éxito", f"Receta '{nombre_receta}' guardada correctamente con ID: {receta_id}")
             self.limpiar_formulario()
             self.load_recetas_existentes() # Recargar la lista de recetas existentes
             
         except InvalidOperation:
-            self.recetas_manager.db_connection.rollback()
             messagebox.showerror("Error de Entrada", "Ingrese valores numéricos válidos para Precio de Venta.")
         except ValueError as ve:
-            self.recetas_manager.db_connection.rollback()
             messagebox.showerror("Error de Validación", str(ve))
         except Exception as e:
-            self.recetas_manager.db_connection.rollback()
             messagebox.showerror("Error", f"No se pudo guardar la receta: {str(e)}")
     
     def limpiar_formulario(self):
@@ -555,8 +631,12 @@ class RecetasEditor(tk.Frame):
         self.entry_pago_trabajador.insert(0, "0.00")
         self.ingredientes_en_receta = []
         self.trabajadores_temporales = []
+        self.subrecetas_en_receta = []
         self.actualizar_treeview_receta()
         self.actualizar_treeview_trabajadores()
+        self.actualizar_treeview_subrecetas()
+        self.entry_cantidad_subreceta.delete(0, tk.END)
+        self.entry_cantidad_subreceta.insert(0, "1")
         self.costo_total_var.set("$0.00")
         self.load_productos_base() # Recargar inventario por si hubo cambios
         self.current_editing_receta_id = None # Resetear ID de edición
@@ -564,67 +644,71 @@ class RecetasEditor(tk.Frame):
 
     def load_recetas_existentes(self):
         """Carga las recetas existentes en el Treeview de la segunda pestaña."""
-        for item in self.tree_recetas_existentes.get_children():
-            self.tree_recetas_existentes.delete(item)
+        self.filtro_recetas.limpiar()
         
         try:
             recetas = self.recetas_manager.obtener_todas_las_recetas()
             self.all_recetas_data = recetas # Guardar para filtrar
+            # Se indexa "nombre\ncategoria" para que la búsqueda coincida con cualquiera de los dos
+            self.indice_recetas = SearchIndex((r.id, f"{r.nombre}\n{r.categoria}") for r in recetas)
+            self.opciones_subrecetas = {f"{r.id} - {r.nombre}": (r.id, r.nombre) for r in recetas}
+            self.combo_subreceta.config(values=list(self.opciones_subrecetas))
             
             if not recetas:
                 # messagebox.showinfo("Información", "No hay recetas registradas.") # Demasiado intrusivo
                 return
 
             self._populate_recetas_treeview(recetas)
+            self._filter_recetas_existentes() # Mantener el filtro vigente tras recargar
 
         except Exception as e:
             messagebox.showerror("Error de Carga", f"No se pudieron cargar las recetas existentes: {str(e)}")
 
     def _populate_recetas_treeview(self, recetas_to_display):
         """Rellena el treeview de recetas existentes con la lista dada."""
+        # Costo de materiales de todas las recetas en una pasada (incluye subrecetas, memoizado)
+        costos = self.recetas_manager.calcular_costos_recetas()
+        self.costos_recetas = costos # También para el costo parcial de las subrecetas en el editor
         for receta in recetas_to_display:
             try:
-                receta_id = receta['id']
-                nombre = receta['nombre']
-                categoria = receta['categoria']
-                precio_venta = receta['precio_venta']
-                costo_mano_obra = receta['costo_mano_obra_total']
-
-                # Calcular el costo de ingredientes usando el manager
-                costo_ingredientes = self.recetas_manager.calcular_costo_receta(receta_id, self.productos_manager)
-                
-                ganancia = precio_venta - costo_ingredientes - costo_mano_obra
-
-                self.tree_recetas_existentes.insert("", "end", values=(
+                receta_id = receta.id
+                nombre = receta.nombre
+                categoria = receta.categoria
+                precio_venta = receta.precio_venta
+                costo_mano_obra = receta.costo_mano_obra_total
+
+                # Sin costo: la receta tiene ingredientes con unidades incompatibles (ver EstructuraRecetas.verificar)
+                costo_ingredientes = costos.get(receta_id)
+                if costo_ingredientes is None:
+                    texto_costo = texto_ganancia = "N/D"
+                else:
+                    texto_costo = f"{costo_ingredientes:.2f}"
+                    texto_ganancia = f"{precio_venta - costo_ingredientes - costo_mano_obra:.2f}"
+
+                iid = self.tree_recetas_existentes.insert("", "end", values=(
                     receta_id,
                     nombre,
                     categoria,
-                    f"{costo_ingredientes:.2f}",
+                    texto_costo,
                     f"{costo_mano_obra:.2f}",
                     f"{precio_venta:.2f}",
-                    f"{ganancia:.2f}"
+                    texto_ganancia
                 ), tags=("editable",)) # Añadir tag para edición directa
+                self.filtro_recetas.registrar(receta_id, iid)
             except Exception as e:
-                print(f"Error al procesar receta {receta.get('id', 'N/A')} para listado: {str(e)}")
-                # messagebox.showwarning("Advertencia", f"No se pudo calcular el costo para la receta '{receta.get('nombre', 'N/A')}': {str(e)}")
+                print(f"Error al procesar receta {receta.id} para listado: {str(e)}")
+                # messagebox.showwarning("Advertencia", f"No se pudo calcular el costo para la receta '{receta.nombre}': {str(e)}")
 
     def _filter_recetas_existentes(self, event=None):
         """Filtra las recetas en el Treeview de recetas existentes."""
-        search_term = self.entry_search_recetas.get().strip().lower()
-        
-        for item in self.tree_recetas_existentes.get_children():
-            self.tree_recetas_existentes.delete(item)
+        search_term = self.entry_search_recetas.get().strip()
         
+        # Los costos ya se calcularon al cargar; filtrar solo oculta/muestra las filas que cambian
         if not search_term:
-            # Si el campo de búsqueda está vacío, mostrar todos los productos
-            self._populate_recetas_treeview(self.all_recetas_data)
+            # Si el campo de búsqueda está vacío, mostrar todas las recetas
+            self.filtro_recetas.aplicar(None)
         else:
-            # Filtrar los productos
-            filtered_recetas = [
-                r for r in self.all_recetas_data 
-                if search_term in r['nombre'].lower() or search_term in r['categoria'].lower()
-            ]
-            self._populate_recetas_treeview(filtered_recetas)
+            self.filtro_recetas.aplicar(self.indice_recetas.buscar_ids(search_term))
 
     def editar_receta_existente(self):
         """Carga los datos de una receta existente en el editor para su modificación."""
@@ -647,24 +731,29 @@ class RecetasEditor(tk.Frame):
 
             # Llenar el formulario con los datos de la receta
             self.entry_nombre_receta.delete(0, tk.END)
-            self.entry_nombre_receta.insert(0, receta_data['nombre'])
-            self.combo_categoria.set(receta_data['categoria'])
+            self.entry_nombre_receta.insert(0, receta_data.nombre)
+            self.combo_categoria.set(receta_data.categoria)
             self.entry_precio_venta.delete(0, tk.END)
-            self.entry_precio_venta.insert(0, f"{receta_data['precio_venta']:.2f}")
-            self.entry_costo_mano_obra.delete(0, tk.END)
-            self.entry_costo_mano_obra.insert(0, f"{receta_data['costo_mano_obra_total']:.2f}")
+            self.entry_precio_venta.insert(0, f"{receta_data.precio_venta:.2f}")
 
             # Cargar ingredientes de la receta
             ingredientes_db = self.recetas_manager.obtener_ingredientes_de_receta(receta_id)
             self.ingredientes_en_receta = []
             for ing in ingredientes_db:
-                ingrediente_id = ing['ingrediente_id']
-                nombre_ingrediente = ing['nombre_ingrediente']
-                cantidad = ing['cantidad']
-                unidad = ing['unidad']
-                costo_promedio = self.productos_manager.obtener_costo_promedio(ingrediente_id)
+                ingrediente_id = ing.ingrediente_id
+                nombre_ingrediente = ing.nombre_ingrediente
+                cantidad = ing.cantidad
+                unidad = ing.unidad
+                costo_promedio = self.snapshot_ingredientes.get(ingrediente_id, (None, Decimal('0.00')))[1]
                 self.ingredientes_en_receta.append((ingrediente_id, nombre_ingrediente, cantidad, unidad, costo_promedio))
             
+            # Cargar subrecetas de la receta
+            self.subrecetas_en_receta = [
+                (sub_id, nombre, cantidad)
+                for sub_id, nombre, cantidad in self.recetas_manager.obtener_subrecetas_de_receta(receta_id)
+            ]
+            self.actualizar_treeview_subrecetas()
+
             self.actualizar_treeview_receta()
             self.calcular_costo_total_receta()
 
@@ -673,7 +762,7 @@ class RecetasEditor(tk.Frame):
 
             # Cambiar a la pestaña del editor
             self.notebook.select(self.editor_frame)
-            messagebox.showinfo("Receta Cargada", f"Receta '{receta_data['nombre']}' cargada para edición.")
+            messagebox.showinfo("Receta Cargada", f"Receta '{receta_data.nombre}' cargada para edición.")
 
             # Guardar el ID de la receta que se está editando
             self.current_editing_receta_id = receta_id
@@ -698,8 +787,8 @@ class RecetasEditor(tk.Frame):
         if not nombre_receta:
             messagebox.showerror("Error", "El nombre de la receta no puede estar vacío.")
             return
-        if not self.ingredientes_en_receta:
-            messagebox.showerror("Error", "La receta debe contener al menos un ingrediente.")
+        if not self.ingredientes_en_receta and not self.subrecetas_en_receta:
+            messagebox.showerror("Error", "La receta debe contener al menos un ingrediente o una subreceta.")
             return
         
         try:
@@ -712,37 +801,43 @@ class RecetasEditor(tk.Frame):
             for _, _, pago in self.trabajadores_temporales:
                 costo_mano_obra_total += pago
 
-            # Iniciar la transacción
-            self.recetas_manager.db_connection.get_connection().start_transaction()
-
-            # Actualizar la información básica de la receta
-            self.recetas_manager.actualizar_precio_receta(receta_id, precio_venta)
-            self.recetas_manager.actualizar_costo_mano_obra_receta(receta_id, costo_mano_obra_total)
-
-            # Eliminar todos los ingredientes actuales de la receta y luego re-agregarlos
-            # Esto es una forma simple de manejar actualizaciones complejas de ingredientes.
-            # Una alternativa más eficiente sería comparar y solo actualizar/insertar/eliminar diferencias.
-            
-            # Obtener ingredientes actuales en DB
-            current_ingredients_in_db = self.recetas_manager.obtener_ingredientes_de_receta(receta_id)
-            current_ingredient_ids_in_db = {ing['ingrediente_id'] for ing in current_ingredients_in_db}
-            
-            # Ingredientes en la GUI
-            new_ingredient_ids_in_gui = {ing[0] for ing in self.ingredientes_en_receta}
-
-            # Eliminar ingredientes que ya no están en la GUI
-            for ing_id_db in current_ingredient_ids_in_db:
-                if ing_id_db not in new_ingredient_ids_in_gui:
-                    self.recetas_manager.eliminar_ingrediente_de_receta(receta_id, ing_id_db)
-
-            # Añadir/Actualizar ingredientes de la GUI
-            for ing_id, _, cantidad, unidad, _ in self.ingredientes_en_receta:
-                self.recetas_manager.agregar_ingrediente_a_receta(receta_id, ing_id, cantidad, unidad) # Este método ya maneja UPDATE/INSERT
-
-            # Guardar trabajadores
-            self.guardar_trabajadores_de_receta(receta_id)
-
-            self.recetas_manager.db_connection.commit() # Confirmar la transacción
+            # Todo en una transacción: commit al salir del bloque, rollback ante cualquier error
+            with self.recetas_manager.db_connection.transaction():
+                # Actualizar la información básica de la receta
+                self.recetas_manager.actualizar_precio_receta(receta_id, precio_venta)
+                self.recetas_manager.actualizar_costo_mano_obra_receta(receta_id, costo_mano_obra_total)
+
+                # Eliminar todos los ingredientes actuales de la receta y luego re-agregarlos
+                # Esto es una forma simple de manejar actualizaciones complejas de ingredientes.
+                # Una alternativa más eficiente sería comparar y solo actualizar/insertar/eliminar diferencias.
+
+                # Obtener ingredientes actuales en DB
+                current_ingredients_in_db = self.recetas_manager.obtener_ingredientes_de_receta(receta_id)
+                current_ingredient_ids_in_db = {ing.ingrediente_id for ing in current_ingredients_in_db}
+
+                # Ingredientes en la GUI
+                new_ingredient_ids_in_gui = {ing[0] for ing in self.ingredientes_en_receta}
+
+                # Eliminar ingredientes que ya no están en la GUI
+                for ing_id_db in current_ingredient_ids_in_db:
+                    if ing_id_db not in new_ingredient_ids_in_gui:
+                        self.recetas_manager.eliminar_ingrediente_de_receta(receta_id, ing_id_db)
+
+                # Añadir/Actualizar ingredientes de la GUI
+                for ing_id, _, cantidad, unidad, _ in self.ingredientes_en_receta:
+                    self.recetas_manager.agregar_ingrediente_a_receta(receta_id, ing_id, cantidad, unidad) # Este método ya maneja UPDATE/INSERT
+
+                # Subrecetas: quitar las que ya no están en la GUI y agregar/actualizar el resto
+                subrecetas_en_gui = {sub[0] for sub in self.subrecetas_en_receta}
+                for sub_id_db, _, _ in self.recetas_manager.obtener_subrecetas_de_receta(receta_id):
+                    if sub_id_db not in subrecetas_en_gui:
+                        self.recetas_manager.eliminar_subreceta_de_receta(receta_id, sub_id_db)
+                for sub_id, _, cantidad in self.subrecetas_en_receta:
+                    self.recetas_manager.agregar_subreceta_a_receta(receta_id, sub_id, cantidad) # ON DUPLICATE KEY UPDATE
+
+                # Guardar trabajadores
+                self.guardar_trabajadores_de_receta(receta_id)
+                self.recetas_manager.invalidar_matriz_bom(receta_id) # Los ingredientes cambiaron
             messagebox.showinfo("Éxito", f"Receta '{nombre_receta}' actualizada correctamente.")
             self.limpiar_formulario()
             self.load_recetas_existentes() # Recargar la lista de recetas existentes
@@ -752,13 +847,10 @@ class RecetasEditor(tk.Frame):
             self.current_editing_receta_id = None
             
         except InvalidOperation:
-            self.recetas_manager.db_connection.rollback()
             messagebox.showerror("Error de Entrada", "Ingrese valores numéricos válidos para Precio de Venta.")
         except ValueError as ve:
-            self.recetas_manager.db_connection.rollback()
             messagebox.showerror("Error de Validación", str(ve))
         except Exception as e:
-            self.recetas_manager.db_connection.rollback()
             messagebox.showerror("Error", f"No se pudo actualizar la receta: {str(e)}")
 
     def eliminar_receta_existente(self):
@@ -776,28 +868,24 @@ class RecetasEditor(tk.Frame):
             return
         
         try:
-            # Iniciar la transacción
-            self.recetas_manager.db_connection.get_connection().start_transaction()
-
-            # Eliminar ingredientes asociados primero (si no hay CASCADE DELETE en DB)
-            # Asumiendo que la DB tiene CASCADE DELETE o que RecetasManager lo maneja.
-            # Si no, se necesitaría un método en RecetasManager para eliminar ingredientes por receta_id.
-            # Por ahora, confiamos en que la eliminación de la receta principal maneje las dependencias.
-            
-            # Eliminar la receta principal
-            cursor = self.recetas_manager.db_connection.get_connection().cursor()
-            cursor.execute("DELETE FROM recetas WHERE id = %s", (receta_id,))
-            cursor.close()
-
-            self.recetas_manager.db_connection.commit()
+            # Commit al salir del bloque, rollback ante cualquier error
+            with self.recetas_manager.db_connection.transaction():
+                # Eliminar ingredientes asociados primero (si no hay CASCADE DELETE en DB)
+                # Asumiendo que la DB tiene CASCADE DELETE o que RecetasManager lo maneja.
+                # Si no, se necesitaría un método en RecetasManager para eliminar ingredientes por receta_id.
+                # Por ahora, confiamos en que la eliminación de la receta principal maneje las dependencias.
+
+                # Eliminar la receta principal
+                cursor = self.recetas_manager.db_connection.get_connection().cursor()
+                cursor.execute("DELETE FROM recetas WHERE id = %s", (receta_id,))
+                cursor.close()
+                self.recetas_manager.invalidar_matriz_bom(receta_id) # La receta ya no forma parte de la matriz
             messagebox.showinfo("Éxito", f"Receta '{nombre_receta}' eliminada correctamente.")
             self.load_recetas_existentes() # Recargar la lista
             
         except Error as e:
-            self.recetas_manager.db_connection.rollback()
             messagebox.showerror("Error de Base de Datos", f"No se pudo eliminar la receta: {str(e)}")
         except Exception as e:
-            self.recetas_manager.db_connection.rollback()
             messagebox.showerror("Error", f"Ocurrió un error inesperado al eliminar la receta: {str(e)}")
 
     def exportar_recetas_csv(self):
@@ -891,23 +979,18 @@ class RecetasEditor(tk.Frame):
                 if new_value < Decimal('0'):
                     raise ValueError("El valor no puede ser negativo.")
 
-                # Iniciar transacción
-                self.recetas_manager.db_connection.get_connection().start_transaction()
-                update_method(receta_id, new_value)
-                self.recetas_manager.db_connection.commit()
+                with self.recetas_manager.db_connection.transaction(): # Commit al salir, rollback ante un error
+                    update_method(receta_id, new_value)
 
                 messagebox.showinfo("Éxito", "Valor actualizado correctamente.")
                 edit_window.destroy()
                 self.load_recetas_existentes() # Recargar para ver los cambios y recalcular ganancias
 
             except InvalidOperation:
-                self.recetas_manager.db_connection.rollback()
                 messagebox.showerror("Error", "Ingrese un valor numérico válido.")
             except ValueError as ve:
-                self.recetas_manager.db_connection.rollback()
                 messagebox.showerror("Error de Validación", str(ve))
             except Exception as e:
-                self.recetas_manager.db_connection.rollback()
                 messagebox.showerror("Error", f"No se pudo actualizar: {str(e)}")
 
         ttk.Button(edit_window, text="Guardar", command=save_value, style="Accent.TButton").pack(pady=10)
@@ -1019,3 +1102,60 @@ class RecetasEditor(tk.Frame):
         except Exception as e:
             messagebox.showerror("Error", f"No se pudieron guardar los trabajadores: {str(e)}")
 
+
+    def agregar_subreceta(self):
+        """Agrega (o actualiza la cantidad de) una receta usada como ingrediente en la lista temporal."""
+        opcion = self.combo_subreceta.get()
+        if opcion not in self.opciones_subrecetas:
+            messagebox.showwarning("Advertencia", "Seleccione la receta que desea usar como subreceta.")
+            return
+        sub_id, nombre = self.opciones_subrecetas[opcion]
+        if sub_id == self.current_editing_receta_id:
+            messagebox.showerror("Error", "Una receta no puede usarse a sí misma como subreceta.")
+            return
+
+        try:
+            cantidad = Decimal(self.entry_cantidad_subreceta.get().strip())
+            if cantidad <= Decimal('0'):
+                raise ValueError("La cantidad de la subreceta debe ser mayor que cero.")
+        except InvalidOperation:
+            messagebox.showerror("Error", "Ingrese un valor numérico válido para la cantidad.")
+            return
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+
+        # Los ciclos con otras recetas (A usa B y B usa A) se rechazan al guardar
+        self.subrecetas_en_receta = [s for s in self.subrecetas_en_receta if s[0] != sub_id]
+        self.subrecetas_en_receta.append((sub_id, nombre, cantidad))
+        self.actualizar_treeview_subrecetas()
+        self.calcular_costo_total_receta()
+
+    def eliminar_subreceta(self, event=None):
+        """Elimina la subreceta seleccionada de la lista temporal."""
+        seleccion = self.tree_subrecetas.selection()
+        if not seleccion:
+            messagebox.showwarning("Advertencia", "Seleccione una subreceta para eliminar.")
+            return
+
+        sub_id = self.tree_subrecetas.item(seleccion)['values'][0]
+        self.subrecetas_en_receta = [s for s in self.subrecetas_en_receta if s[0] != sub_id]
+        self.actualizar_treeview_subrecetas()
+        self.calcular_costo_total_receta()
+
+    def _calcular_costo_subreceta(self, sub_id, cantidad) -> Decimal:
+        """Costo de `cantidad` unidades de una subreceta según los costos del listado (sin consultar la base de datos)."""
+        costo_unitario = self.costos_recetas.get(sub_id)
+        if costo_unitario is None:
+            return Decimal('0.00')
+        return costo_unitario * cantidad
+
+    def actualizar_treeview_subrecetas(self):
+        """Actualiza el Treeview de subrecetas con la lista temporal."""
+        for item in self.tree_subrecetas.get_children():
+            self.tree_subrecetas.delete(item)
+
+        for sub_id, nombre, cantidad in self.subrecetas_en_receta:
+            costo_unitario = self.costos_recetas.get(sub_id)
+            texto_costo = "N/D" if costo_unitario is None else f"${costo_unitario * cantidad:.2f}"
+            self.tree_subrecetas.insert("", "end", values=(sub_id, nombre, f"{cantidad:.4f}", texto_costo))
@@ -1,23 +1,32 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 from decimal import Decimal
+from Core.fixed_point import Dinero
 from Core.UnitConverter import UnitConverter
 from Core.productos import Productos
 from Core.recetas import RecetasManager
+from Core.eventos import StockCambiado, RecetaActualizada
+from Gui.widgets import SuscripcionEventos
 
 class GestionVentas(tk.Frame):
-    def __init__(self, parent, ventas_manager, productos_manager, recetas_manager):
+    def __init__(self, parent, ventas_manager, productos_manager, recetas_manager, unit_converter=None):
         super().__init__(parent)
         self.ventas_manager = ventas_manager
         self.productos_manager = productos_manager
         self.recetas_manager = recetas_manager
-        self.unit_converter = UnitConverter()
+        self.unit_converter = unit_converter or UnitConverter()
         
         self.ventas_activas = {}  
         self.current_client_id = None
+        self.producibles = {} # receta_id -> Producibilidad con el stock de la última carga
+        self.filas_recetas = {} # receta_id -> iid en tree_recetas
         
         self.create_widgets()
         self.load_recetas_disponibles()  # Cambiado a solo cargar recetas
+        
+        # Cambios de stock (ventas, compras, producción...) solo recalculan las recetas que usan esos productos
+        self.suscripcion_stock = SuscripcionEventos(self, (StockCambiado,), self._on_stock_cambiado)
+        self.suscripcion_recetas = SuscripcionEventos(self, (RecetaActualizada,), lambda eventos: self.load_recetas_disponibles())
 
     def create_widgets(self):
         main_frame = ttk.Frame(self, padding=20)
@@ -50,20 +59,22 @@ class GestionVentas(tk.Frame):
 
         # Treeview solo para recetas
         self.tree_recetas = ttk.Treeview(recetas_frame, 
-                                       columns=('id', 'nombre', 'precio'),
+                                       columns=('id', 'nombre', 'precio', 'disponibles'),
                                        show='headings', height=10)
         
         # Configurar columnas
         columns = [
             ('id', 'ID', 50, 'center'),
             ('nombre', 'Receta', 180, 'w'),
-            ('precio', 'Precio Venta', 100, 'e')
+            ('precio', 'Precio Venta', 100, 'e'),
+            ('disponibles', 'Disponibles', 90, 'center')
         ]
         
         for col_id, text, width, anchor in columns:
             self.tree_recetas.heading(col_id, text=text)
             self.tree_recetas.column(col_id, width=width, anchor=anchor)
             
+        self.tree_recetas.tag_configure('sin_stock', foreground='gray')
         self.tree_recetas.pack(fill=tk.BOTH, expand=True)
         self.tree_recetas.bind('<Double-1>', self.agregar_receta_a_venta)
 
@@ -72,26 +83,56 @@ class GestionVentas(tk.Frame):
         main_frame.grid_rowconfigure(1, weight=1)
 
     def load_recetas_disponibles(self):
-        """Carga solo las recetas con precio de venta definido"""
+        """Carga solo las recetas con precio de venta definido y cuántas unidades cubre el stock actual"""
         for item in self.tree_recetas.get_children():
             self.tree_recetas.delete(item)
+        self.filas_recetas = {}
         
         try:
             recetas = self.recetas_manager.obtener_todas_las_recetas()
+            # Unidades vendibles de todas las recetas con una sola lectura del stock
+            self.producibles = self.recetas_manager.unidades_producibles()
             
             # Filtrar recetas con precio de venta > 0
             for r in recetas:
-                # ACCIÓN: Acceder a los valores del diccionario por clave
-                precio_venta = r.get('precio_venta', Decimal('0.00')) # Usar .get para seguridad y valor por defecto
+                precio_venta = r.precio_venta
                 
                 if precio_venta is not None and precio_venta > Decimal('0'):  # Comparar con Decimal('0')
-                    self.tree_recetas.insert('', 'end', 
-                                          values=(r['id'], r['nombre'], f"${precio_venta:.2f}"),
-                                          tags=('receta', str(r['id'])))
+                    producible = self.producibles.get(r.id)
+                    disponibles = producible.unidades if producible else 0
+                    tags = ('receta', str(r.id)) if disponibles > 0 else ('receta', str(r.id), 'sin_stock')
+                    self.filas_recetas[r.id] = self.tree_recetas.insert('', 'end', 
+                                          values=(r.id, r.nombre, f"${precio_venta:.2f}", disponibles),
+                                          tags=tags)
                 
         except Exception as e:
             messagebox.showerror("Error", f"No se pudieron cargar las recetas: {str(e)}")
 
+    def _on_stock_cambiado(self, eventos):
+        """Recalcula la columna Disponibles solo de las recetas que usan los productos que cambiaron (o sus subrecetas elaboradas)"""
+        try:
+            afectadas = self.recetas_manager.recetas_afectadas(
+                {producto_id for evento in eventos for producto_id in evento.productos()}
+            ) & self.filas_recetas.keys()
+            if not afectadas:
+                return
+            producibles = self.recetas_manager.unidades_producibles(afectadas)
+        except Exception as e:
+            print(f"Error al actualizar las unidades disponibles: {str(e)}")
+            return
+        
+        for receta_id in afectadas:
+            producible = producibles.get(receta_id)
+            if producible is None:
+                self.producibles.pop(receta_id, None)
+            else:
+                self.producibles[receta_id] = producible
+            disponibles = producible.unidades if producible else 0
+            iid = self.filas_recetas[receta_id]
+            self.tree_recetas.set(iid, 'disponibles', disponibles)
+            tags = ('receta', str(receta_id)) if disponibles > 0 else ('receta', str(receta_id), 'sin_stock')
+            self.tree_recetas.item(iid, tags=tags)
+
     def nuevo_cliente(self):
         dialog = NuevoClienteDialog(self, "Información del Cliente")
         if dialog.result_data:
@@ -185,16 +226,16 @@ class GestionVentas(tk.Frame):
         for item in tree.get_children():
             tree.delete(item)
         
-        total = Decimal('0.00')
+        total = 0 # En centavos
         for prod in self.ventas_activas[client_id]['productos']:
             prod_id, nombre, precio_unitario, cantidad = prod
-            subtotal = precio_unitario * Decimal(str(cantidad))
+            subtotal = Dinero(Dinero.desde_decimal(precio_unitario) * int(cantidad))
             total += subtotal
             tree.insert('', 'end', 
                        values=(prod_id, nombre, f"${precio_unitario:.2f}", 
-                               cantidad, f"${subtotal:.2f}"))
+                               cantidad, f"${subtotal.a_decimal():.2f}"))
         
-        self.ventas_activas[client_id]['total_var'].set(f"Total: ${total:.2f}")
+        self.ventas_activas[client_id]['total_var'].set(f"Total: ${Dinero(total).a_decimal():.2f}")
 
     def seleccionar_cliente(self, event):
         """Cuando se selecciona un cliente de la lista"""
@@ -231,6 +272,28 @@ class GestionVentas(tk.Frame):
         )
         
         if cantidad and cantidad > 0:
+            # Verificar el carrito completo contra el stock antes de que la venta falle al registrarse:
+            # recetas distintas pueden compartir ingredientes (mismas unidades enteras que se registran)
+            pedido = {}
+            for p in self.ventas_activas[self.current_client_id]['productos']:
+                pedido[p[0]] = pedido.get(p[0], 0) + int(p[3])
+            pedido[receta_id] = pedido.get(receta_id, 0) + int(cantidad)
+            try:
+                faltantes = self.recetas_manager.faltantes_pedido(pedido)
+            except Exception as e:
+                messagebox.showerror("Error", f"No se pudo verificar el stock: {str(e)}")
+                return
+            if faltantes:
+                detalle = "\n".join(
+                    f"- {f.nombre_producto}: requiere {f.requerido:.4f}, hay {f.disponible:.4f} {f.unidad or ''}".rstrip()
+                    for f in faltantes
+                )
+                messagebox.showwarning(
+                    "Stock insuficiente",
+                    f"Con el stock actual no alcanza para agregar {int(cantidad)} de '{nombre}' a esta venta:\n{detalle}"
+                )
+                return
+
             # Verificar si la receta ya está en la venta
             for i, prod in enumerate(self.ventas_activas[self.current_client_id]['productos']):
                 if prod[0] == receta_id:
@@ -322,6 +385,7 @@ class GestionVentas(tk.Frame):
             # Limpiar después de registrar
             self.ventas_activas[client_id]['productos'] = []
             self.actualizar_productos_cliente(client_id)
+            # Las unidades disponibles se actualizan con los eventos StockCambiado de la venta
             
         except Exception as e:
             messagebox.showerror("Error", f"No se pudo registrar la venta: {str(e)}")
@@ -0,0 +1,184 @@
+import tkinter as tk
+from tkinter import ttk, messagebox
+
+class PlanProduccionPage(tk.Frame):
+    """Plan de producción de varias recetas: corridas en orden, subrecetas incluidas, y faltantes de materias primas."""
+
+    def __init__(self, parent, planificador, recetas_manager):
+        super().__init__(parent)
+        self.planificador = planificador
+        self.recetas_manager = recetas_manager
+        self.objetivos = {} # receta_id -> unidades a producir
+        self.nombres_recetas = {} # receta_id -> nombre
+        self.plan = None
+
+        self.create_widgets()
+        self.load_recetas()
+
+    def create_widgets(self):
+        """Crea todos los widgets de la interfaz"""
+        main_frame = tk.Frame(self, padx=20, pady=20)
+        main_frame.pack(fill="both", expand=True)
+        main_frame.columnconfigure(0, weight=1)
+        main_frame.rowconfigure(3, weight=1)
+        main_frame.rowconfigure(4, weight=1)
+
+        tk.Label(
+            main_frame,
+            text="Plan de Producción",
+            font=("Helvetica", 16, "bold"),
+            fg="#1E88E5"
+        ).grid(row=0, column=0, pady=(0, 20), sticky="w")
+
+        # Objetivos por receta
+        objetivos_frame = ttk.LabelFrame(main_frame, text="Objetivos", padding=10)
+        objetivos_frame.grid(row=1, column=0, sticky="ew", pady=(0, 10))
+
+        ttk.Label(objetivos_frame, text="Receta:").grid(row=0, column=0, sticky="w", padx=5, pady=5)
+        self.combo_receta = ttk.Combobox(objetivos_frame, state="readonly", width=35)
+        self.combo_receta.grid(row=0, column=1, sticky="w", padx=5, pady=5)
+
+        ttk.Label(objetivos_frame, text="Unidades:").grid(row=0, column=2, sticky="w", padx=5, pady=5)
+        self.entry_unidades = ttk.Entry(objetivos_frame, width=10)
+        self.entry_unidades.grid(row=0, column=3, sticky="w", padx=5, pady=5)
+
+        ttk.Button(objetivos_frame, text="Agregar Objetivo", command=self.agregar_objetivo).grid(row=0, column=4, padx=5, pady=5)
+        ttk.Button(objetivos_frame, text="Quitar Objetivos", command=self.quitar_objetivos).grid(row=0, column=5, padx=5, pady=5)
+
+        self.label_objetivos = ttk.Label(objetivos_frame, text="Sin objetivos.")
+        self.label_objetivos.grid(row=1, column=0, columnspan=6, sticky="w", padx=5, pady=5)
+
+        botones_frame = tk.Frame(main_frame)
+        botones_frame.grid(row=2, column=0, sticky="w", pady=(0, 10))
+        ttk.Button(botones_frame, text="Calcular Plan", command=self.calcular_plan, style="Accent.TButton").pack(side="left")
+        self.boton_ejecutar = ttk.Button(botones_frame, text="Ejecutar Plan", command=self.ejecutar_plan, state="disabled")
+        self.boton_ejecutar.pack(side="left", padx=10)
+
+        # Corridas en el orden en que se ejecutan
+        corridas_frame = ttk.LabelFrame(main_frame, text="Corridas (subrecetas primero)", padding=10)
+        corridas_frame.grid(row=3, column=0, sticky="nsew", pady=(0, 10))
+        self.tree_corridas = self._crear_tabla(corridas_frame, [
+            ('orden', 'Orden', 60, 'center'),
+            ('receta', 'Receta', 220, 'w'),
+            ('objetivo', 'Objetivo', 100, 'e'),
+            ('subrecetas', 'Para Otras Recetas', 130, 'e'),
+            ('unidades', 'A Producir', 100, 'e')
+        ])
+
+        # Materias primas que no alcanzan
+        faltantes_frame = ttk.LabelFrame(main_frame, text="Faltantes de Materias Primas", padding=10)
+        faltantes_frame.grid(row=4, column=0, sticky="nsew")
+        self.tree_faltantes = self._crear_tabla(faltantes_frame, [
+            ('producto', 'Producto', 220, 'w'),
+            ('requerido', 'Requerido', 120, 'e'),
+            ('disponible', 'Disponible', 120, 'e'),
+            ('faltante', 'Faltante', 120, 'e')
+        ])
+        self.tree_faltantes.tag_configure('faltante', foreground='#D32F2F')
+
+    def _crear_tabla(self, parent, columnas):
+        tree = ttk.Treeview(parent, columns=[c[0] for c in columnas], show='headings', style="Modern.Treeview", height=6)
+        for col_id, texto, ancho, anchor in columnas:
+            tree.heading(col_id, text=texto)
+            tree.column(col_id, width=ancho, anchor=anchor)
+        tree.pack(fill="both", expand=True, side="left")
+
+        scrollbar = ttk.Scrollbar(parent, orient="vertical", command=tree.yview)
+        scrollbar.pack(side="right", fill="y")
+        tree.configure(yscrollcommand=scrollbar.set)
+        return tree
+
+    def load_recetas(self):
+        """Carga las recetas que se pueden planificar"""
+        try:
+            recetas = self.recetas_manager.obtener_todas_las_recetas()
+            self.nombres_recetas = {r.id: r.nombre for r in recetas}
+            self.combo_receta['values'] = [f"{r.id} - {r.nombre}" for r in recetas]
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudieron cargar las recetas: {str(e)}")
+
+    def agregar_objetivo(self):
+        """Agrega (o reemplaza) las unidades a producir de la receta seleccionada"""
+        seleccionado = self.combo_receta.get()
+        if not seleccionado:
+            messagebox.showwarning("Advertencia", "Seleccione una receta.")
+            return
+        try:
+            unidades = int(self.entry_unidades.get().strip())
+            if unidades <= 0:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Error de Entrada", "Las unidades deben ser un entero positivo.")
+            return
+
+        self.objetivos[int(seleccionado.split(" - ")[0])] = unidades
+        self.entry_unidades.delete(0, tk.END)
+        self._mostrar_objetivos()
+
+    def quitar_objetivos(self):
+        self.objetivos = {}
+        self._mostrar_objetivos()
+
+    def _mostrar_objetivos(self):
+        self._limpiar_plan()
+        if not self.objetivos:
+            self.label_objetivos.config(text="Sin objetivos.")
+            return
+        texto = ", ".join(f"{self.nombres_recetas.get(rid, rid)} × {unidades}" for rid, unidades in self.objetivos.items())
+        self.label_objetivos.config(text=f"Objetivos: {texto}")
+
+    def _limpiar_plan(self):
+        self.plan = None
+        self.boton_ejecutar.config(state="disabled")
+        for tree in (self.tree_corridas, self.tree_faltantes):
+            for item in tree.get_children():
+                tree.delete(item)
+
+    def calcular_plan(self):
+        """Calcula el plan completo sin modificar el inventario"""
+        if not self.objetivos:
+            messagebox.showwarning("Advertencia", "Agregue al menos un objetivo.")
+            return
+        try:
+            plan = self.planificador.planificar(self.objetivos)
+        except ValueError as e:
+            messagebox.showerror("Error de Validación", str(e))
+            return
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudo calcular el plan: {str(e)}")
+            return
+
+        self._limpiar_plan()
+        for orden, corrida in enumerate(plan.corridas, start=1):
+            self.tree_corridas.insert("", "end", values=(
+                orden, corrida.nombre_receta, corrida.objetivo, corrida.unidades - corrida.objetivo, corrida.unidades
+            ))
+        for faltante in plan.faltantes:
+            unidad = f" {faltante.unidad}" if faltante.unidad else ""
+            self.tree_faltantes.insert("", "end", values=(
+                faltante.nombre_producto,
+                f"{faltante.requerido:.4f}{unidad}",
+                f"{faltante.disponible:.4f}{unidad}",
+                f"{faltante.faltante:.4f}{unidad}"
+            ), tags=('faltante',))
+
+        self.plan = plan
+        if plan.factible:
+            self.boton_ejecutar.config(state="normal")
+        else:
+            messagebox.showwarning("Stock Insuficiente", "No alcanza el stock para el plan. Revise los faltantes.")
+
+    def ejecutar_plan(self):
+        """Ejecuta todas las corridas del plan calculado en una sola transacción"""
+        if not self.plan or not self.plan.factible:
+            return
+        if not messagebox.askyesno("Confirmar", f"¿Ejecutar las {len(self.plan.corridas)} corridas del plan?"):
+            return
+        try:
+            self.planificador.ejecutar(self.plan)
+            messagebox.showinfo("Éxito", "Plan de producción ejecutado correctamente.")
+            self.quitar_objetivos()
+        except ValueError as e:
+            messagebox.showerror("Error de Validación", str(e))
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudo ejecutar el plan: {str(e)}")
@@ -1,7 +1,8 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime, date
-from decimal import Decimal
+from Core.fixed_point import Dinero
+from Core.modelos import Venta
 from Core.reportes import Reportes
 from Core.recetas import RecetasManager
 from Core.ventas import Ventas
@@ -126,11 +127,12 @@ class ResumenVentasPage(tk.Frame):
                 self.tree_pagos.delete(item)
             
             # Variables para cálculos
-            total_ventas = Decimal('0.00')
+            # Los importes se acumulan en centavos (enteros) y se convierten a Decimal solo al mostrarlos
+            total_ventas = 0
             total_clientes = set()
             total_productos = 0
-            total_ingresos = Decimal('0.00')
-            total_pagos = Decimal('0.00')
+            total_ingresos = 0
+            total_pagos = 0
             
             # Diccionario para agrupar productos
             productos_agrupados = {}
@@ -138,12 +140,10 @@ class ResumenVentasPage(tk.Frame):
             # Procesar ventas
             for venta in ventas_hoy:
                 # Extraer datos de la venta
-                venta_id = venta[0]
-                nombre_receta = venta[1]
-                cantidad_vendida = venta[2]
-                precio_venta = Decimal(str(venta[3]))
-                cliente_nombre = venta[4]
-                fecha_venta = venta[5]
+                nombre_receta = venta.nombre_receta
+                cantidad_vendida = venta.cantidad_vendida
+                precio_venta = Dinero.desde_decimal(venta.precio_venta)
+                cliente_nombre = venta.cliente_nombre
                 
                 # Acumular datos
                 total_ventas += 1
@@ -152,7 +152,7 @@ class ResumenVentasPage(tk.Frame):
                     total_clientes.add(cliente_nombre)
                 
                 # Calcular totales
-                subtotal = precio_venta * Decimal(str(cantidad_vendida))
+                subtotal = precio_venta * int(cantidad_vendida)
                 total_ingresos += subtotal
                 
                 # Agrupar productos
@@ -171,18 +171,18 @@ class ResumenVentasPage(tk.Frame):
                 self.tree_productos.insert("", "end", values=(
                     nombre,
                     datos['cantidad'],
-                    f"${datos['precio_unitario']:.2f}",
-                    f"${datos['total']:.2f}"
+                    f"${datos['precio_unitario'].a_decimal():.2f}",
+                    f"${Dinero(datos['total']).a_decimal():.2f}"
                 ))
             
             # Obtener pagos a trabajadores
             recetas = self.recetas_manager.obtener_todas_las_recetas()
             for receta in recetas:
-                pago_trabajadores = Decimal(str(receta.get('costo_mano_obra_total', 0)))
+                pago_trabajadores = Dinero.desde_decimal(receta.costo_mano_obra_total or 0)
                 if pago_trabajadores > 0:
                     self.tree_pagos.insert("", "end", values=(
-                        receta['nombre'],
-                        f"${pago_trabajadores:.2f}"
+                        receta.nombre,
+                        f"${pago_trabajadores.a_decimal():.2f}"
                     ))
                     total_pagos += pago_trabajadores
             
@@ -190,12 +190,12 @@ class ResumenVentasPage(tk.Frame):
             self.total_ventas_label.config(text=f"Total Ventas: {total_ventas}")
             self.total_clientes_label.config(text=f"Total Clientes: {len(total_clientes)}")
             self.total_productos_label.config(text=f"Total Productos Vendidos: {total_productos}")
-            self.total_ingresos_label.config(text=f"Ingresos Totales: ${total_ingresos:.2f}")
-            self.total_pagos_label.config(text=f"Pagos a Trabajadores: ${total_pagos:.2f}")
+            self.total_ingresos_label.config(text=f"Ingresos Totales: ${Dinero(total_ingresos).a_decimal():.2f}")
+            self.total_pagos_label.config(text=f"Pagos a Trabajadores: ${Dinero(total_pagos).a_decimal():.2f}")
             
             # Calcular y mostrar ganancia neta
-            ganancia_neta = total_ingresos - total_pagos
-            self.ganancia_neta_label.config(text=f"Ganancia Neta: ${ganancia_neta:.2f}")
+            ganancia_neta = Dinero(total_ingresos - total_pagos)
+            self.ganancia_neta_label.config(text=f"Ganancia Neta: ${ganancia_neta.a_decimal():.2f}")
             
         except Exception as e:
             messagebox.showerror("Error", f"No se pudieron cargar los datos del día: {str(e)}")
@@ -216,6 +216,6 @@ class ResumenVentasPage(tk.Frame):
                 ORDER BY v.fecha_venta DESC
             """
             
-            return self.reportes_manager.db_connection.fetch_all(query, (hoy,))
+            return self.reportes_manager.db_connection.fetch_all(query, (hoy,), modelo=Venta)
         except Exception as e:
             raise Exception(f"Error al obtener ventas del día: {str(e)}")
@@ -0,0 +1,163 @@
+import tkinter as tk
+from tkinter import ttk, messagebox
+from Core.simulador import SimuladorMargenes
+
+class SimuladorPreciosPage(tk.Frame):
+    """Análisis de márgenes de las recetas ante cambios en los precios de los proveedores."""
+
+    def __init__(self, parent, recetas_manager, productos_manager):
+        super().__init__(parent)
+        self.recetas_manager = recetas_manager
+        self.productos_manager = productos_manager
+        self.simulador = SimuladorMargenes(recetas_manager)
+        self.cambios = {} # producto_id -> fracción de cambio propuesto (0.25 = +25 %)
+        self.nombres_productos = {} # producto_id -> nombre
+
+        self.create_widgets()
+        self.load_productos()
+
+    def create_widgets(self):
+        """Crea todos los widgets de la interfaz"""
+        main_frame = tk.Frame(self, padx=20, pady=20)
+        main_frame.pack(fill="both", expand=True)
+        main_frame.columnconfigure(0, weight=1)
+        main_frame.rowconfigure(3, weight=1)
+
+        tk.Label(
+            main_frame,
+            text="Simulador de Márgenes",
+            font=("Helvetica", 16, "bold"),
+            fg="#1E88E5"
+        ).grid(row=0, column=0, columnspan=2, pady=(0, 20), sticky="w")
+
+        # Parámetros de la simulación
+        parametros_frame = ttk.LabelFrame(main_frame, text="Escenarios", padding=10)
+        parametros_frame.grid(row=1, column=0, sticky="ew", pady=(0, 10))
+
+        ttk.Label(parametros_frame, text="Cantidad de escenarios:").grid(row=0, column=0, sticky="w", padx=5, pady=5)
+        self.entry_escenarios = ttk.Entry(parametros_frame, width=10)
+        self.entry_escenarios.insert(0, "500")
+        self.entry_escenarios.grid(row=0, column=1, sticky="w", padx=5, pady=5)
+
+        ttk.Label(parametros_frame, text="Variación aleatoria de precios (± %):").grid(row=0, column=2, sticky="w", padx=5, pady=5)
+        self.entry_variacion = ttk.Entry(parametros_frame, width=10)
+        self.entry_variacion.insert(0, "10")
+        self.entry_variacion.grid(row=0, column=3, sticky="w", padx=5, pady=5)
+
+        # Cambios propuestos por proveedor
+        ttk.Label(parametros_frame, text="Ingrediente:").grid(row=1, column=0, sticky="w", padx=5, pady=5)
+        self.combo_producto = ttk.Combobox(parametros_frame, state="readonly", width=35)
+        self.combo_producto.grid(row=1, column=1, sticky="w", padx=5, pady=5)
+
+        ttk.Label(parametros_frame, text="Cambio propuesto (%):").grid(row=1, column=2, sticky="w", padx=5, pady=5)
+        self.entry_cambio = ttk.Entry(parametros_frame, width=10)
+        self.entry_cambio.grid(row=1, column=3, sticky="w", padx=5, pady=5)
+
+        ttk.Button(parametros_frame, text="Agregar Cambio", command=self.agregar_cambio).grid(row=1, column=4, padx=5, pady=5)
+        ttk.Button(parametros_frame, text="Quitar Cambios", command=self.quitar_cambios).grid(row=1, column=5, padx=5, pady=5)
+
+        self.label_cambios = ttk.Label(parametros_frame, text="Sin cambios propuestos.")
+        self.label_cambios.grid(row=2, column=0, columnspan=6, sticky="w", padx=5, pady=5)
+
+        ttk.Button(main_frame, text="Simular", command=self.simular, style="Accent.TButton").grid(
+            row=2, column=0, sticky="w", pady=(0, 10)
+        )
+
+        # Resultados por receta
+        resultados_frame = ttk.LabelFrame(main_frame, text="Margen por Unidad", padding=10)
+        resultados_frame.grid(row=3, column=0, sticky="nsew")
+
+        columnas = [
+            ('receta', 'Receta', 180, 'w'),
+            ('precio', 'Precio Venta', 100, 'e'),
+            ('actual', 'Margen Actual', 100, 'e'),
+            ('medio', 'Margen Medio', 100, 'e'),
+            ('p5', 'Peor 5 %', 90, 'e'),
+            ('p50', 'Mediana', 90, 'e'),
+            ('p95', 'Mejor 5 %', 90, 'e'),
+            ('perdida', 'Escenarios con Pérdida', 150, 'center')
+        ]
+        self.tree_resultados = ttk.Treeview(resultados_frame, columns=[c[0] for c in columnas],
+                                            show='headings', style="Modern.Treeview")
+        for col_id, texto, ancho, anchor in columnas:
+            self.tree_resultados.heading(col_id, text=texto)
+            self.tree_resultados.column(col_id, width=ancho, anchor=anchor)
+        self.tree_resultados.tag_configure('riesgo', foreground='#D32F2F')
+        self.tree_resultados.pack(fill="both", expand=True, side="left")
+
+        scrollbar = ttk.Scrollbar(resultados_frame, orient="vertical", command=self.tree_resultados.yview)
+        scrollbar.pack(side="right", fill="y")
+        self.tree_resultados.configure(yscrollcommand=scrollbar.set)
+
+    def load_productos(self):
+        """Carga los ingredientes que se pueden usar en los cambios propuestos"""
+        try:
+            productos = self.productos_manager.obtener_todos_los_productos()
+            self.nombres_productos = {p.id: p.nombre_producto for p in productos}
+            self.combo_producto['values'] = [f"{p.id} - {p.nombre_producto}" for p in productos]
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudieron cargar los productos: {str(e)}")
+
+    def agregar_cambio(self):
+        """Agrega (o reemplaza) el cambio de precio propuesto para el ingrediente seleccionado"""
+        seleccionado = self.combo_producto.get()
+        if not seleccionado:
+            messagebox.showwarning("Advertencia", "Seleccione un ingrediente.")
+            return
+        try:
+            cambio = float(self.entry_cambio.get().strip()) / 100
+            if cambio <= -1:
+                raise ValueError("El cambio debe ser mayor que -100 %.")
+        except ValueError as e:
+            messagebox.showerror("Error de Entrada", f"Cambio inválido: {str(e)}")
+            return
+
+        self.cambios[int(seleccionado.split(" - ")[0])] = cambio
+        self.entry_cambio.delete(0, tk.END)
+        self._mostrar_cambios()
+
+    def quitar_cambios(self):
+        self.cambios = {}
+        self._mostrar_cambios()
+
+    def _mostrar_cambios(self):
+        if not self.cambios:
+            self.label_cambios.config(text="Sin cambios propuestos.")
+            return
+        texto = ", ".join(f"{self.nombres_productos.get(pid, pid)} {cambio:+.0%}" for pid, cambio in self.cambios.items())
+        self.label_cambios.config(text=f"Cambios propuestos: {texto}")
+
+    def simular(self):
+        """Evalúa todos los escenarios de una vez y muestra la distribución de márgenes por receta"""
+        try:
+            cantidad = int(self.entry_escenarios.get().strip())
+            variacion = float(self.entry_variacion.get().strip()) / 100
+        except ValueError:
+            messagebox.showerror("Error de Entrada", "Ingrese valores numéricos válidos para los escenarios y la variación.")
+            return
+
+        try:
+            self.simulador.preparar()
+            factores = self.simulador.escenarios_aleatorios(cantidad, variacion=variacion, cambios=self.cambios)
+            resumen = self.simulador.resumir(self.simulador.simular(factores))
+        except ValueError as e:
+            messagebox.showerror("Error de Validación", str(e))
+            return
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudo ejecutar la simulación: {str(e)}")
+            return
+
+        for item in self.tree_resultados.get_children():
+            self.tree_resultados.delete(item)
+        for fila in resumen:
+            tags = ('riesgo',) if fila.probabilidad_perdida > 0 else ()
+            self.tree_resultados.insert("", "end", values=(
+                fila.nombre,
+                f"${fila.precio_venta:.2f}",
+                f"${fila.margen_actual:.2f}",
+                f"${fila.margen_medio:.2f}",
+                f"${fila.margen_p5:.2f}",
+                f"${fila.margen_p50:.2f}",
+                f"${fila.margen_p95:.2f}",
+                f"{fila.probabilidad_perdida:.0%}"
+            ), tags=tags)
@@ -0,0 +1,169 @@
+import queue
+import threading
+import tkinter as tk
+from Core.eventos import bus_eventos
+
+
+class Debouncer:
+    """
+    Agrupa eventos rápidos (p. ej. cada tecla en un Entry) y ejecuta la acción
+    una sola vez cuando el usuario deja de escribir durante `retraso_ms`.
+    """
+
+    def __init__(self, widget, accion, retraso_ms: int = 150):
+        self.widget = widget
+        self.accion = accion
+        self.retraso_ms = retraso_ms
+        self._pendiente = None
+
+    def __call__(self, event=None):
+        """Reprograma la acción; pensado para usarse directamente en bind()."""
+        self.cancelar()
+        self._pendiente = self.widget.after(self.retraso_ms, self._ejecutar)
+
+    def _ejecutar(self):
+        self._pendiente = None
+        self.accion()
+
+    def cancelar(self):
+        """Descarta la ejecución pendiente, si la hay."""
+        if self._pendiente is not None:
+            self.widget.after_cancel(self._pendiente)
+            self._pendiente = None
+
+    def ejecutar_ahora(self):
+        """Ejecuta inmediatamente la acción pendiente (p. ej. al pulsar Enter)."""
+        if self._pendiente is not None:
+            self.cancelar()
+            self.accion()
+
+
+class FiltroTreeview:
+    """
+    Filtra las filas de un Treeview ocultándolas (detach) en lugar de borrarlas y
+    volver a insertarlas. En cada filtrado solo se tocan las filas cuyo estado
+    visible cambia, conservando el orden original de carga.
+    """
+
+    def __init__(self, tree):
+        self.tree = tree
+        self._orden = []      # claves en el orden en que se cargaron
+        self._iids = {}       # clave -> iid del Treeview
+        self._visibles = set()
+
+    def registrar(self, clave, iid):
+        """Registra una fila recién insertada en el Treeview."""
+        self._orden.append(clave)
+        self._iids[clave] = iid
+        self._visibles.add(clave)
+
+    def iid(self, clave):
+        """Devuelve el iid de la fila asociada a una clave, o None."""
+        return self._iids.get(clave)
+
+    def quitar(self, clave):
+        """Elimina la fila asociada a una clave (si existe)."""
+        iid = self._iids.pop(clave, None)
+        if iid is None:
+            return
+        self._orden.remove(clave)
+        self._visibles.discard(clave)
+        self.tree.delete(iid)
+
+    def limpiar(self):
+        """Elimina todas las filas registradas, incluidas las ocultas."""
+        if self._iids:
+            self.tree.delete(*self._iids.values())
+        self._orden = []
+        self._iids = {}
+        self._visibles = set()
+
+    def aplicar(self, claves_visibles=None):
+        """
+        Deja visibles solo las filas cuyas claves estén en `claves_visibles`
+        (todas si es None).
+        """
+        if claves_visibles is None:
+            nuevas = set(self._iids)
+        else:
+            nuevas = set(claves_visibles).intersection(self._iids)
+
+        ocultar = self._visibles - nuevas
+        if ocultar:
+            self.tree.detach(*(self._iids[clave] for clave in ocultar))
+
+        mostrar = nuevas - self._visibles
+        if mostrar:
+            posicion = 0
+            for clave in self._orden:
+                if clave in nuevas:
+                    if clave in mostrar:
+                        self.tree.move(self._iids[clave], '', posicion)
+                    posicion += 1
+
+        self._visibles = nuevas
+
+
+class SuscripcionEventos:
+    """
+    Suscribe un widget a eventos del bus (ver Core.eventos) mientras exista.
+
+    Los eventos pueden publicarse desde cualquier hilo (p. ej. el MonitorCambios con cambios
+    de otras terminales): se encolan y el hilo de Tk revisa la cola con `after` cada
+    `intervalo_ms`; los publicados desde el propio hilo de Tk se entregan en cuanto queda
+    libre. Los eventos acumulados se entregan juntos a `accion(eventos)`, así una ráfaga
+    (p. ej. una venta que descuenta varios ingredientes) produce un solo refresco. La
+    suscripción se cancela al destruirse el widget.
+    """
+
+    def __init__(self, widget, tipos_evento, accion, bus=None, intervalo_ms: int = 250):
+        self.widget = widget
+        self.accion = accion
+        self.intervalo_ms = intervalo_ms
+        self._cola = queue.SimpleQueue()
+        self._entrega_inmediata = None
+        bus = bus or bus_eventos
+        self._cancelaciones = [bus.suscribir(tipo, self._recibir) for tipo in tipos_evento]
+        widget.bind("<Destroy>", self._al_destruir, add="+")
+        self._sondeo = widget.after(self.intervalo_ms, self._sondear)
+
+    def _recibir(self, evento):
+        self._cola.put(evento)
+        # Solo el hilo de Tk puede programar callbacks; los demás esperan al próximo sondeo
+        if threading.current_thread() is threading.main_thread() and self._entrega_inmediata is None:
+            self._entrega_inmediata = self.widget.after_idle(self._entregar)
+
+    def _sondear(self):
+        try:
+            self._entregar()
+        finally:
+            if self._cancelaciones: # Sigue suscrito
+                self._sondeo = self.widget.after(self.intervalo_ms, self._sondear)
+
+    def _entregar(self):
+        self._entrega_inmediata = None
+        eventos = []
+        while True:
+            try:
+                eventos.append(self._cola.get_nowait())
+            except queue.Empty:
+                break
+        if eventos:
+            self.accion(eventos)
+
+    def _al_destruir(self, event):
+        if event.widget is self.widget:
+            self.cancelar()
+
+    def cancelar(self):
+        """Deja de recibir eventos."""
+        for cancelar in self._cancelaciones:
+            cancelar()
+        self._cancelaciones = []
+        for pendiente in (self._sondeo, self._entrega_inmediata):
+            if pendiente is not None:
+                try:
+                    self.widget.after_cancel(pendiente)
+                except tk.TclError:
+                    pass # El widget ya fue destruido
+        self._sondeo = self._entrega_inmediata = None
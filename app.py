@@ -8,14 +8,9 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent))
 
 from Core.database import Database
-from Core.productos import Productos
-from Core.compras import Compras
-from Core.produccion import Produccion
-from Core.recetas import RecetasManager
-from Core.ventas import Ventas
-from Core.clientes import Clientes
-from Core.autoconsumo import Autoconsumo
+from Core.service_registry import ServiceRegistry
 from Core.cache_manager import cache_manager
+from Core.eventos import AlertaStockBajo, StockRepuesto
 from Gui.pages.gestion_productos_page import GestionProductos
 from Gui.pages.gestion_compras_page import GestionCompras
 from Gui.pages.gestion_produccion_page import GestionProduccion
@@ -25,7 +20,10 @@ from Gui.pages.gestion_clientes_page import GestionClientes
 from Gui.pages.gestion_autoconsumo_page import GestionAutoconsumo
 from Gui.pages.cash_flow_page import CashFlowPage
 from Gui.pages.resumen_ventas_page import ResumenVentasPage
+from Gui.pages.simulador_precios_page import SimuladorPreciosPage
+from Gui.pages.plan_produccion_page import PlanProduccionPage
 from Gui.styles import configure_styles
+from Gui.widgets import SuscripcionEventos
 
 # Configure logging
 logging.basicConfig(
@@ -48,7 +46,7 @@ class App:
         
         # Application state
         self.current_page = None
-        self.managers = {}
+        self.managers = None
         self.pages = {}
         
         # Setup
@@ -70,15 +68,11 @@ class App:
     def _initialize_managers(self):
         """Initialize all business managers with caching support"""
         try:
-            self.managers = {
-                'productos': Productos(self.db),
-                'compras': Compras(self.db, self.managers.get('productos')),
-                'produccion': Produccion(self.db),
-                'recetas': RecetasManager(self.db),
-                'ventas': Ventas(self.db),
-                'clientes': Clientes(self.db),
-                'autoconsumo': Autoconsumo(self.db)
-            }
+            # Un único registro: cada manager y el UnitConverter se comparten entre todas las páginas
+            self.managers = ServiceRegistry(self.db)
+            self.managers.inicializar()
+            # Cambios hechos en otras terminales: llegan al bus de eventos local
+            self.managers['monitor_cambios'].iniciar()
             logger.info("All managers initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize managers: {e}")
@@ -129,12 +123,14 @@ class App:
             ("📦 Productos", "gestion_productos", self.show_gestion_productos),
             ("🛒 Compras", "gestion_compras", self.show_gestion_compras),
             ("🏭 Producción", "gestion_produccion", self.show_gestion_produccion),
+            ("🗓️ Plan de Producción", "plan_produccion", self.show_plan_produccion),
             ("📋 Recetas", "gestion_recetas", self.show_gestion_recetas),
             ("💰 Ventas", "gestion_ventas", self.show_gestion_ventas),
             ("👥 Clientes", "gestion_clientes", self.show_gestion_clientes),
             ("🏠 Autoconsumo", "gestion_autoconsumo", self.show_gestion_autoconsumo),
             ("💳 Flujo de Caja", "cash_flow", self.show_cash_flow),
             ("📊 Resumen Ventas", "resumen_ventas", self.show_resumen_ventas),
+            ("📈 Simulador de Márgenes", "simulador_precios", self.show_simulador_precios),
             ("❌ Salir", "exit", self.exit_application)
         ]
         
@@ -169,6 +165,52 @@ class App:
         self.db_status_label = ttk.Label(self.status_bar, text="DB: Connected")
         self.db_status_label.pack(side=tk.RIGHT, padx=5)
         
+        # Alertas de stock bajo: llegan del bus de eventos cuando un producto cruza su mínimo
+        self.alertas_stock = {}  # producto_id -> AlertaStockBajo vigente
+        self.stock_alert_label = ttk.Label(self.status_bar, text="", foreground="#D32F2F", cursor="hand2")
+        self.stock_alert_label.pack(side=tk.RIGHT, padx=15)
+        self.stock_alert_label.bind("<Button-1>", lambda event: self._show_stock_alerts())
+        self.suscripcion_alertas = SuscripcionEventos(self.root, (AlertaStockBajo, StockRepuesto), self._apply_stock_events)
+        self._load_stock_alerts()
+        
+    def _load_stock_alerts(self):
+        """Seed the low-stock indicator with the products already below their minimum (events only report crossings)"""
+        productos = self.managers['reportes'].obtener_productos_bajo_stock() if self.managers else None
+        for nombre_producto, stock_minimo, cantidad, producto_id in productos or ():
+            self.alertas_stock[producto_id] = AlertaStockBajo(producto_id, nombre_producto, cantidad, stock_minimo)
+        self._refresh_stock_alert_label()
+        
+    def _apply_stock_events(self, eventos):
+        """Update the low-stock indicator with alerts and recoveries (in publication order)"""
+        for evento in eventos:
+            if isinstance(evento, AlertaStockBajo):
+                self.alertas_stock[evento.producto_id] = evento
+                logger.warning(f"Low stock: {evento.nombre_producto} ({evento.cantidad} < {evento.stock_minimo})")
+            else:
+                self.alertas_stock.pop(evento.producto_id, None)
+        self._refresh_stock_alert_label()
+        
+    def _refresh_stock_alert_label(self):
+        """Show the most recent alert and how many more are active"""
+        if not self.alertas_stock:
+            self.stock_alert_label.config(text="")
+            return
+        ultima = self.alertas_stock[next(reversed(self.alertas_stock))]
+        texto = f"⚠ Stock bajo: {ultima.nombre_producto} ({ultima.cantidad:.2f} / mín. {ultima.stock_minimo:.2f})"
+        if len(self.alertas_stock) > 1:
+            texto += f" y {len(self.alertas_stock) - 1} más"
+        self.stock_alert_label.config(text=texto)
+        
+    def _show_stock_alerts(self):
+        """Show every product currently flagged as low on stock"""
+        if not self.alertas_stock:
+            return
+        lineas = [
+            f"• {alerta.nombre_producto}: {alerta.cantidad:.4f} (mínimo {alerta.stock_minimo:.4f})"
+            for alerta in sorted(self.alertas_stock.values(), key=lambda a: a.nombre_producto.lower())
+        ]
+        messagebox.showwarning("Stock Bajo", "Productos debajo de su stock mínimo:\n\n" + "\n".join(lineas))
+        
     def _safe_navigate(self, command):
         """Safe navigation with error handling"""
         try:
@@ -188,19 +230,18 @@ class App:
         for widget in self.content_area.winfo_children():
             widget.destroy()
             
-    def _show_page(self, page_class, manager_key=None, *additional_args):
-        """Generic method to show pages with caching"""
+    def _show_page(self, page_class, *manager_keys, **kwargs):
+        """
+        Generic method to show pages.
+        Los managers se piden al registro por clave, en el orden de los parámetros de la página.
+        """
         self._clear_content_area()
         
         try:
-            manager = self.managers.get(manager_key) if manager_key else None
             args = [self.content_area]
+            args.extend(self.managers[key] for key in manager_keys)
             
-            if manager:
-                args.append(manager)
-            args.extend(additional_args)
-            
-            page = page_class(*args)
+            page = page_class(*args, **kwargs)
             page.grid(row=0, column=0, sticky="nsew")
             
             self.current_page = page
@@ -212,23 +253,28 @@ class App:
             
     def show_gestion_productos(self):
         """Show products management page"""
-        self._show_page(GestionProductos, 'productos')
+        self._show_page(GestionProductos, 'productos', unit_converter=self.managers.unit_converter)
         
     def show_gestion_compras(self):
         """Show purchases management page"""
-        self._show_page(GestionCompras, 'compras', self.managers['productos'])
+        self._show_page(GestionCompras, 'compras', 'productos', unit_converter=self.managers.unit_converter,
+                        reabastecimiento=self.managers['reabastecimiento'])
         
     def show_gestion_produccion(self):
         """Show production management page"""
-        self._show_page(GestionProduccion, 'produccion', self.managers['productos'])
+        self._show_page(GestionProduccion, 'produccion', 'productos', unit_converter=self.managers.unit_converter)
+        
+    def show_plan_produccion(self):
+        """Show production planning page"""
+        self._show_page(PlanProduccionPage, 'planificacion', 'recetas')
         
     def show_gestion_recetas(self):
         """Show recipes management page"""
-        self._show_page(RecetasEditor, 'recetas', self.managers['productos'])
+        self._show_page(RecetasEditor, 'productos', 'recetas', unit_converter=self.managers.unit_converter)
         
     def show_gestion_ventas(self):
         """Show sales management page"""
-        self._show_page(GestionVentas, 'ventas', self.managers['productos'], self.managers['recetas'])
+        self._show_page(GestionVentas, 'ventas', 'productos', 'recetas', unit_converter=self.managers.unit_converter)
         
     def show_gestion_clientes(self):
         """Show clients management page"""
@@ -236,23 +282,19 @@ class App:
         
     def show_gestion_autoconsumo(self):
         """Show autoconsumo management page"""
-        self._show_page(GestionAutoconsumo, 'autoconsumo', self.managers['productos'])
+        self._show_page(GestionAutoconsumo, 'autoconsumo', 'productos')
         
     def show_cash_flow(self):
         """Show cash flow page"""
-        if 'reportes' not in self.managers:
-            from Core.reportes import Reportes
-            self.managers['reportes'] = Reportes(self.db)
-            
-        self._show_page(CashFlowPage, None, self.managers['reportes'], self.managers['ventas'], self.managers['productos'], self.managers['autoconsumo'])
+        self._show_page(CashFlowPage, 'reportes', 'ventas', 'productos', 'autoconsumo')
         
     def show_resumen_ventas(self):
         """Show sales summary page"""
-        if 'reportes' not in self.managers:
-            from Core.reportes import Reportes
-            self.managers['reportes'] = Reportes(self.db)
-            
-        self._show_page(ResumenVentasPage, None, self.managers['reportes'], self.managers['recetas'], self.managers['ventas'])
+        self._show_page(ResumenVentasPage, 'reportes', 'recetas', 'ventas')
+
+    def show_simulador_precios(self):
+        """Show pricing what-if simulator page"""
+        self._show_page(SimuladorPreciosPage, 'recetas', 'productos')
         
     def _setup_protocols(self):
         """Setup application protocols"""
@@ -262,6 +304,9 @@ class App:
         """Enhanced exit with proper cleanup"""
         if messagebox.askyesno("Salir", "¿Está seguro de que desea salir de la aplicación?"):
             try:
+                self.suscripcion_alertas.cancelar()
+                self.managers['monitor_cambios'].detener()
+                    
                 # Clear cache
                 self.cache.clear_pattern("*")
                 
@@ -37,6 +37,24 @@ CREATE TABLE `autoconsumo` (
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
 
+--
+-- Table structure for table `cambios`
+--
+
+DROP TABLE IF EXISTS `cambios`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8mb4 */;
+CREATE TABLE `cambios` (
+  `id` bigint(20) NOT NULL AUTO_INCREMENT,
+  `terminal` varchar(64) NOT NULL,
+  `tipo_evento` varchar(40) NOT NULL,
+  `datos` text NOT NULL,
+  `fecha` datetime NOT NULL DEFAULT current_timestamp(),
+  PRIMARY KEY (`id`),
+  KEY `fecha` (`fecha`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
 --
 -- Table structure for table `clientes`
 --
@@ -80,6 +98,41 @@ CREATE TABLE `compras` (
 ) ENGINE=InnoDB AUTO_INCREMENT=21 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
 
+--
+-- Table structure for table `cortes_inventario`
+--
+
+DROP TABLE IF EXISTS `cortes_inventario`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8mb4 */;
+CREATE TABLE `cortes_inventario` (
+  `id` int(11) NOT NULL AUTO_INCREMENT,
+  `fecha_corte` datetime NOT NULL,
+  `fecha_creacion` datetime NOT NULL DEFAULT current_timestamp(),
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `fecha_corte` (`fecha_corte`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Table structure for table `cortes_inventario_detalle`
+--
+
+DROP TABLE IF EXISTS `cortes_inventario_detalle`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8mb4 */;
+CREATE TABLE `cortes_inventario_detalle` (
+  `corte_id` int(11) NOT NULL,
+  `producto_id` int(11) NOT NULL,
+  `cantidad` decimal(14,4) NOT NULL,
+  `valor` decimal(12,2) NOT NULL,
+  PRIMARY KEY (`corte_id`,`producto_id`),
+  KEY `producto_id` (`producto_id`),
+  CONSTRAINT `cortes_inventario_detalle_ibfk_1` FOREIGN KEY (`corte_id`) REFERENCES `cortes_inventario` (`id`) ON DELETE CASCADE,
+  CONSTRAINT `cortes_inventario_detalle_ibfk_2` FOREIGN KEY (`producto_id`) REFERENCES `productos` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
 --
 -- Table structure for table `inversiones`
 --
@@ -94,6 +147,28 @@ CREATE TABLE `inversiones` (
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
 
+--
+-- Table structure for table `movimientos_inventario`
+--
+
+DROP TABLE IF EXISTS `movimientos_inventario`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8mb4 */;
+CREATE TABLE `movimientos_inventario` (
+  `id` bigint(20) NOT NULL AUTO_INCREMENT,
+  `producto_id` int(11) NOT NULL,
+  `tipo` enum('compra','venta','produccion','consumo','autoconsumo','ajuste') NOT NULL,
+  `cantidad` decimal(14,4) NOT NULL,
+  `valor` decimal(12,2) NOT NULL DEFAULT 0.00,
+  `referencia_id` int(11) DEFAULT NULL,
+  `fecha` datetime NOT NULL DEFAULT current_timestamp(),
+  PRIMARY KEY (`id`),
+  KEY `producto_fecha` (`producto_id`,`fecha`),
+  KEY `fecha` (`fecha`),
+  CONSTRAINT `movimientos_inventario_ibfk_1` FOREIGN KEY (`producto_id`) REFERENCES `productos` (`id`) ON DELETE RESTRICT
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
 --
 -- Table structure for table `produccion_registro`
 --
@@ -157,6 +232,27 @@ CREATE TABLE `receta_ingredientes` (
 ) ENGINE=InnoDB AUTO_INCREMENT=4 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
 
+--
+-- Table structure for table `receta_subrecetas`
+--
+
+DROP TABLE IF EXISTS `receta_subrecetas`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8mb4 */;
+CREATE TABLE `receta_subrecetas` (
+  `id` int(11) NOT NULL AUTO_INCREMENT,
+  `receta_id` int(11) NOT NULL,
+  `subreceta_id` int(11) NOT NULL,
+  `cantidad` decimal(10,4) NOT NULL,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `receta_subreceta` (`receta_id`,`subreceta_id`),
+  KEY `subreceta_id` (`subreceta_id`),
+  CONSTRAINT `receta_subrecetas_ibfk_1` FOREIGN KEY (`receta_id`) REFERENCES `recetas` (`id`) ON DELETE CASCADE,
+  CONSTRAINT `receta_subrecetas_ibfk_2` FOREIGN KEY (`subreceta_id`) REFERENCES `recetas` (`id`),
+  CONSTRAINT `receta_subrecetas_distinta` CHECK (`receta_id` <> `subreceta_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
 --
 -- Table structure for table `receta_trabajadores`
 --
@@ -210,6 +306,7 @@ CREATE TABLE `ventas` (
   `fecha_venta` datetime DEFAULT current_timestamp(),
   PRIMARY KEY (`id`),
   KEY `producto_id` (`producto_id`),
+  KEY `fecha_venta_producto` (`fecha_venta`,`producto_id`,`cantidad_vendida`),
   CONSTRAINT `ventas_ibfk_1` FOREIGN KEY (`producto_id`) REFERENCES `recetas` (`id`) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;